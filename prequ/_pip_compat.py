@@ -2,6 +2,7 @@ from contextlib import contextmanager
 
 from pip import __version__ as pip_version
 from pip._vendor.pkg_resources import Requirement, parse_version
+from pip._vendor.six.moves.urllib import parse as urllib_parse
 
 PIP_9_OR_NEWER = (parse_version(pip_version) >= parse_version('9.0'))
 PIP_10_OR_NEWER = (parse_version(pip_version) >= parse_version('10.0'))
@@ -48,6 +49,7 @@ if PIP_10_OR_NEWER:
     from pip._internal.wheel import Wheel
     from pip._internal.utils.misc import get_installed_distributions
     from pip._internal.models.index import PyPI
+    from pip._internal.pep425tags import get_supported as get_supported_tags
 else:
     from pip.exceptions import InstallationError
     from pip.req.req_install import InstallRequirement
@@ -60,11 +62,29 @@ else:
     from pip.wheel import Wheel, WheelCache
     from pip.utils import get_installed_distributions
     from pip.models.index import PyPI
+    from pip.pep425tags import get_supported as get_supported_tags
 
     DEV_PKGS = ('pip', 'setuptools', 'distribute', 'wheel')
     RequirementPreparer = None
 
 
+try:
+    from pip._internal.models.link import Link
+except ImportError:
+    if PIP_10_OR_NEWER:
+        from pip._internal.index import Link
+    else:
+        from pip.index import Link
+
+try:
+    from pip._internal.models.candidate import InstallationCandidate
+except ImportError:
+    if PIP_10_OR_NEWER:
+        from pip._internal.index import InstallationCandidate
+    else:
+        from pip.index import InstallationCandidate
+
+
 if PIP_10_OR_NEWER:
     try:
         from pip._internal.resolve import Resolver
@@ -94,6 +114,23 @@ except ImportError:
     install_req_from_line = InstallRequirement.from_line
 
 
+try:
+    from pip._internal.utils.logging import _log_state as _pip_log_state
+except ImportError:
+    from pip.utils.logging import _log_state as _pip_log_state
+
+
+def init_pip_log_state():
+    """
+    Initialize the thread local log state of pip in the current thread.
+
+    Pip initializes the state only in the main thread, so this must be
+    called in other threads before running pip code which logs.
+    """
+    if not hasattr(_pip_log_state, 'indentation'):
+        _pip_log_state.indentation = 0
+
+
 if not hasattr(PackageFinder, 'create'):
     create_package_finder = PackageFinder
 else:
@@ -127,7 +164,9 @@ __all__ = [
     'FAVORITE_HASH',
     'FormatControl',
     'InstallRequirement',
+    'InstallationCandidate',
     'InstallationError',
+    'Link',
     'PIP_10_OR_NEWER',
     'PIP_18_OR_NEWER',
     'PIP_9_OR_NEWER',
@@ -143,6 +182,8 @@ __all__ = [
     'cmdoptions',
     'create_package_finder',
     'get_installed_distributions',
+    'get_supported_tags',
+    'init_pip_log_state',
     'install_req_from_editable',
     'install_req_from_line',
     'is_file_url',
@@ -150,5 +191,6 @@ __all__ = [
     'path_to_url',
     'stdlib_pkgs',
     'url_to_path',
+    'urllib_parse',
     'user_cache_dir',
 ]
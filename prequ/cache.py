@@ -4,12 +4,27 @@ from __future__ import (
 
 import json
 import os
+import shutil
+import sqlite3
 import sys
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
+from functools import wraps
 
 from ._pip_compat import Requirement
 from .exceptions import PrequError
+from .file_replacer import FileReplacer
 from .locations import CACHE_DIR
-from .utils import as_tuple, key_from_req, lookup_table, name_from_ireq
+from .utils import (
+    as_tuple, key_from_req, lookup_table, name_from_ireq, normalize_req_name)
+
+try:
+    from abc import ABC
+except ImportError:
+    class ABC(object):
+        __metaclass__ = ABCMeta
 
 
 class CorruptCacheError(PrequError):
@@ -37,36 +52,45 @@ def read_cache_file(cache_file_path):
         return doc['dependencies']
 
 
-class DependencyCache(object):
+def _get_cache_file_path(cache_dir, extension):
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    py_version = '.'.join(str(digit) for digit in sys.version_info[:2])
+    cache_filename = 'depcache-py{}.{}'.format(py_version, extension)
+    return os.path.join(cache_dir, cache_filename)
+
+
+def _synchronized(method):
     """
-    Creates a new persistent dependency cache for the current Python version.
-    The cache file is written to the appropriate user cache dir for the
-    current platform, i.e.
+    Make a method of a dependency cache hold the lock of the cache.
+    """
+    @wraps(method)
+    def synchronized_method(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return synchronized_method
 
-        ~/.cache/prequ/depcache-pyX.Y.json
 
-    Where X.Y indicates the Python version.
+def _is_persistable(pkgversion_and_extras):
+    return (':UNPINNED:' not in pkgversion_and_extras and
+            ':EDITABLE:' not in pkgversion_and_extras)
+
+
+class BaseDependencyCache(ABC):
     """
-    def __init__(self, cache_dir=None):
-        if cache_dir is None:
-            cache_dir = CACHE_DIR
-        if not os.path.isdir(cache_dir):
-            os.makedirs(cache_dir)
-        py_version = '.'.join(str(digit) for digit in sys.version_info[:2])
-        cache_filename = 'depcache-py{}.json'.format(py_version)
-
-        self._cache_file = os.path.join(cache_dir, cache_filename)
-        self._cache = None
+    Base class for the dependency caches.
 
-    @property
-    def cache(self):
-        """
-        The dictionary that is the actual in-memory cache.  This property
-        lazily loads the cache from disk.
-        """
-        if self._cache is None:
-            self.read_cache()
-        return self._cache
+    Maps pinned or editable requirements to lists of their dependencies
+    as requirement strings.  Subclasses implement the storage by
+    overriding _get_entry, _set_entries and clear.
+
+    The caches can be shared by several threads: The public methods
+    hold a reentrant lock of the cache.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
 
     def as_cache_key(self, ireq):
         """
@@ -97,44 +121,61 @@ class DependencyCache(object):
             extras_string += ':EDITABLE:{}'.format(ireq.link)
         return name, "{}{}".format(version, extras_string)
 
-    def read_cache(self):
-        """Reads the cached contents into memory."""
-        if os.path.exists(self._cache_file):
-            self._cache = read_cache_file(self._cache_file)
-        else:
-            self._cache = {}
+    @abstractmethod
+    def _get_entry(self, pkgname, pkgversion_and_extras):
+        """
+        Get the dependencies stored for a cache key or None.
 
-    def write_cache(self):
-        """Writes the cache to disk as JSON."""
-        doc = {
-            '__format__': 1,
-            'dependencies': self._strip_unpinned_and_editables(self._cache),
-        }
-        with open(self._cache_file, 'w') as f:
-            json.dump(doc, f, sort_keys=True)
+        :rtype: list[str]|None
+        """
 
+    @abstractmethod
+    def _set_entries(self, entries):
+        """
+        Store dependencies for several cache keys.
+
+        :type entries: list[(str, str, list[str])]
+        :param entries: (pkgname, pkgversion_and_extras, dependencies)
+        """
+
+    @abstractmethod
     def clear(self):
-        self._cache = {}
-        self.write_cache()
+        """Remove all the entries from the cache."""
+
+    def flush(self):
+        """Writes the pending entries, if any, to disk."""
 
+    @_synchronized
     def __contains__(self, ireq):
-        pkgname, pkgversion_and_extras = self.as_cache_key(ireq)
-        return pkgversion_and_extras in self.cache.get(pkgname, {})
+        return self._get_entry(*self.as_cache_key(ireq)) is not None
 
+    @_synchronized
     def __getitem__(self, ireq):
-        pkgname, pkgversion_and_extras = self.as_cache_key(ireq)
-        return self.cache[pkgname][pkgversion_and_extras]
+        values = self._get_entry(*self.as_cache_key(ireq))
+        if values is None:
+            raise KeyError(ireq)
+        return values
 
     def __setitem__(self, ireq, values):
-        pkgname, pkgversion_and_extras = self.as_cache_key(ireq)
-        self.cache.setdefault(pkgname, {})
-        self.cache[pkgname][pkgversion_and_extras] = values
-        self.write_cache()
+        self.update([(ireq, values)])
+
+    @_synchronized
+    def update(self, items):
+        """
+        Set dependencies of several requirements as a single batch.
 
+        :type items: Iterable[(pip.req.InstallRequirement, list[str])]
+        """
+        self._set_entries([
+            self.as_cache_key(ireq) + (values,)
+            for (ireq, values) in items])
+
+    @_synchronized
     def get(self, ireq, default=None):
-        pkgname, pkgversion_and_extras = self.as_cache_key(ireq)
-        return self.cache.get(pkgname, {}).get(pkgversion_and_extras, default)
+        values = self._get_entry(*self.as_cache_key(ireq))
+        return default if values is None else values
 
+    @_synchronized
     def reverse_dependencies(self, ireqs):
         """
         Returns a lookup table of reverse dependencies for all the given ireqs.
@@ -172,7 +213,92 @@ class DependencyCache(object):
         return lookup_table(
             (key_from_req(Requirement.parse(dep_name)), req_name)
             for (cache_key, req_name) in cache_key_names.items()
-            for dep_name in self.cache[cache_key[0]][cache_key[1]])
+            for dep_name in self._get_entry(*cache_key))
+
+
+class DependencyCache(BaseDependencyCache):
+    """
+    Creates a new persistent dependency cache for the current Python version.
+    The cache file is written to the appropriate user cache dir for the
+    current platform, i.e.
+
+        ~/.cache/prequ/depcache-pyX.Y.json
+
+    Where X.Y indicates the Python version.
+
+    New entries are kept in memory and written to the file in batches:
+    when batch_size entries are pending, when flush_interval seconds
+    have passed since the oldest pending entry, or when flush is called
+    explicitly.  The file is replaced atomically on each write.
+    """
+    def __init__(self, cache_dir=None, batch_size=100, flush_interval=30.0):
+        super(DependencyCache, self).__init__()
+        self._cache_file = _get_cache_file_path(cache_dir, 'json')
+        self._cache = None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending_count = 0
+        self._pending_since = None
+
+    @property
+    def cache(self):
+        """
+        The dictionary that is the actual in-memory cache.  This property
+        lazily loads the cache from disk.
+        """
+        if self._cache is None:
+            self.read_cache()
+        return self._cache
+
+    def read_cache(self):
+        """Reads the cached contents into memory."""
+        if os.path.exists(self._cache_file):
+            self._cache = read_cache_file(self._cache_file)
+        else:
+            self._cache = {}
+
+    def write_cache(self):
+        """Writes the cache to disk as JSON."""
+        doc = {
+            '__format__': 1,
+            'dependencies': self._strip_unpinned_and_editables(self._cache),
+        }
+        _write_cache_file(self._cache_file, doc)
+        self._clear_pending()
+
+    @_synchronized
+    def flush(self):
+        """Writes the pending entries, if any, to disk."""
+        if self._pending_count:
+            self.write_cache()
+
+    def _clear_pending(self):
+        self._pending_count = 0
+        self._pending_since = None
+
+    def _add_pending(self, count):
+        now = time.time()
+        if self._pending_since is None:
+            self._pending_since = now
+        self._pending_count += count
+        if self._pending_count >= self.batch_size or (
+                self.flush_interval is not None and
+                now - self._pending_since >= self.flush_interval):
+            self.flush()
+
+    @_synchronized
+    def clear(self):
+        self._cache = {}
+        self.write_cache()
+
+    def _get_entry(self, pkgname, pkgversion_and_extras):
+        return self.cache.get(pkgname, {}).get(pkgversion_and_extras)
+
+    def _set_entries(self, entries):
+        for (pkgname, pkgversion_and_extras, values) in entries:
+            self.cache.setdefault(pkgname, {})
+            self.cache[pkgname][pkgversion_and_extras] = values
+        self._add_pending(len(entries))
 
     @classmethod
     def _strip_unpinned_and_editables(cls, cache):
@@ -183,7 +309,208 @@ class DependencyCache(object):
         for (name, dep_map) in cache.items():
             stripped_dep_map = type(dep_map)()
             for (version, deps) in dep_map.items():
-                if ':UNPINNED:' not in version and ':EDITABLE:' not in version:
+                if _is_persistable(version):
                     stripped_dep_map[version] = deps
             stripped[name] = stripped_dep_map
         return stripped
+
+
+class ShardedDependencyCache(DependencyCache):
+    """
+    Dependency cache stored as one JSON file per package.
+
+    The files are written to a directory in the user cache dir, i.e.
+
+        ~/.cache/prequ/depcache-pyX.Y/{normalized-package-name}.json
+
+    The file of a package is read when the package is looked up for the
+    first time and only the files of the changed packages are written,
+    so the cost of using the cache scales with the number of packages
+    used rather than with the size of the cache.  New entries are
+    written in batches like in DependencyCache.
+    """
+    def __init__(self, cache_dir=None, batch_size=100, flush_interval=30.0):
+        super(ShardedDependencyCache, self).__init__(
+            cache_dir, batch_size, flush_interval)
+        self._shard_dir = os.path.splitext(self._cache_file)[0]
+        self._loaded_shards = set()
+        self._dirty_shards = set()
+
+    def read_cache(self):
+        """Starts with no packages loaded to memory."""
+        self._cache = {}
+        self._loaded_shards = set()
+
+    def write_cache(self):
+        """Writes the changed packages to disk as JSON."""
+        if not os.path.isdir(self._shard_dir):
+            os.makedirs(self._shard_dir)
+        shards = {}
+        for (name, dep_map) in self.cache.items():
+            shard = normalize_req_name(name)
+            if shard in self._dirty_shards:
+                shards.setdefault(shard, {})[name] = dep_map
+        for (shard, dependencies) in shards.items():
+            doc = {
+                '__format__': 1,
+                'dependencies': self._strip_unpinned_and_editables(dependencies),
+            }
+            _write_cache_file(self._get_shard_path(shard), doc)
+        self._dirty_shards = set()
+        self._clear_pending()
+
+    @_synchronized
+    def clear(self):
+        shutil.rmtree(self._shard_dir, ignore_errors=True)
+        self.read_cache()
+        self._dirty_shards = set()
+        self._clear_pending()
+
+    def _get_shard_path(self, shard):
+        return os.path.join(self._shard_dir, shard + '.json')
+
+    def _load_shard(self, pkgname):
+        shard = normalize_req_name(pkgname)
+        if shard in self._loaded_shards:
+            return shard
+        shard_path = self._get_shard_path(shard)
+        if os.path.exists(shard_path):
+            self.cache.update(read_cache_file(shard_path))
+        self._loaded_shards.add(shard)
+        return shard
+
+    def _get_entry(self, pkgname, pkgversion_and_extras):
+        self._load_shard(pkgname)
+        return super(ShardedDependencyCache, self)._get_entry(
+            pkgname, pkgversion_and_extras)
+
+    def _set_entries(self, entries):
+        for (pkgname, _, _) in entries:
+            self._dirty_shards.add(self._load_shard(pkgname))
+        super(ShardedDependencyCache, self)._set_entries(entries)
+
+
+class SqliteDependencyCache(BaseDependencyCache):
+    """
+    Dependency cache stored in an SQLite database.
+
+    The database is written to the same directory as the JSON cache
+    file of DependencyCache, i.e.
+
+        ~/.cache/prequ/depcache-pyX.Y.sqlite3
+
+    Each new entry is written immediately with an upsert in its own
+    transaction and the database uses write-ahead logging, so several
+    processes can use the same cache concurrently.  Entries of unpinned
+    and editable requirements are only kept in memory.
+
+    When the database is used for the first time, the entries of the
+    JSON cache file, if it exists, are imported to it.
+    """
+    def __init__(self, cache_dir=None):
+        super(SqliteDependencyCache, self).__init__()
+        self._db_file = _get_cache_file_path(cache_dir, 'sqlite3')
+        self._json_cache_file = _get_cache_file_path(cache_dir, 'json')
+        self._connection = None
+        self._volatile = {}
+
+    @property
+    def connection(self):
+        """
+        The database connection.  Lazily connects to the database and
+        creates the tables, if needed.
+        """
+        if self._connection is None:
+            self._connection = self._connect()
+        return self._connection
+
+    def _connect(self):
+        # The lock of the cache serializes the use of the connection
+        connection = sqlite3.connect(
+            self._db_file, timeout=60, check_same_thread=False)
+        connection.isolation_level = None  # Manage transactions explicitly
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS dependencies ('
+            ' name TEXT NOT NULL,'
+            ' version TEXT NOT NULL,'
+            ' dependencies TEXT NOT NULL,'
+            ' PRIMARY KEY (name, version))')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS metadata ('
+            ' key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        with _transaction(connection):
+            imported = connection.execute(
+                "SELECT value FROM metadata WHERE key = 'json_imported'"
+            ).fetchone()
+            if not imported:
+                self._import_json_cache(connection)
+                connection.execute(
+                    "INSERT INTO metadata (key, value)"
+                    " VALUES ('json_imported', '1')")
+        return connection
+
+    def _import_json_cache(self, connection):
+        if not os.path.exists(self._json_cache_file):
+            return
+        connection.executemany(
+            'INSERT OR IGNORE INTO dependencies'
+            ' (name, version, dependencies) VALUES (?, ?, ?)',
+            (
+                (pkgname, pkgversion_and_extras, json.dumps(values))
+                for (pkgname, dep_map) in read_cache_file(
+                    self._json_cache_file).items()
+                for (pkgversion_and_extras, values) in dep_map.items()
+                if _is_persistable(pkgversion_and_extras)))
+
+    @_synchronized
+    def clear(self):
+        self._volatile = {}
+        with _transaction(self.connection):
+            self.connection.execute('DELETE FROM dependencies')
+
+    def _get_entry(self, pkgname, pkgversion_and_extras):
+        if not _is_persistable(pkgversion_and_extras):
+            return self._volatile.get((pkgname, pkgversion_and_extras))
+        row = self.connection.execute(
+            'SELECT dependencies FROM dependencies'
+            ' WHERE name = ? AND version = ?',
+            (pkgname, pkgversion_and_extras)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set_entries(self, entries):
+        rows = []
+        for (pkgname, pkgversion_and_extras, values) in entries:
+            if _is_persistable(pkgversion_and_extras):
+                rows.append((pkgname, pkgversion_and_extras, json.dumps(values)))
+            else:
+                self._volatile[(pkgname, pkgversion_and_extras)] = values
+        if rows:
+            with _transaction(self.connection):
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO dependencies'
+                    ' (name, version, dependencies) VALUES (?, ?, ?)', rows)
+
+
+def _write_cache_file(path, doc):
+    with FileReplacer(path) as f:
+        f.write(json.dumps(doc, sort_keys=True).encode('utf-8'))
+
+
+@contextmanager
+def _transaction(connection):
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+#: Dependency cache classes by the backend names
+DEPENDENCY_CACHE_BACKENDS = {
+    'json': DependencyCache,
+    'sharded': ShardedDependencyCache,
+    'sqlite': SqliteDependencyCache,
+}
@@ -0,0 +1,218 @@
+# coding: utf-8
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import hashlib
+import json
+import os
+import posixpath
+import sys
+import time
+
+from ._pip_compat import (
+    PIP_9_OR_NEWER, PIP_192_OR_NEWER, InstallationCandidate, Link,
+    urllib_parse)
+from .file_replacer import FileReplacer
+from .locations import CACHE_DIR
+from .logging import log
+from .utils import normalize_req_name
+
+
+class CandidateCache(object):
+    """
+    Persistent cache of the candidates of projects in package indexes.
+
+    The candidates found from an index page of a project are stored in
+    a compact form (version, file name, URL, hash fragment, required
+    Python version, metadata file attribute) to a JSON file per index URL and project in the
+    user cache dir, i.e.
+
+        ~/.cache/prequ/candidates-pyX.Y/{key-hash}.json
+
+    Where X.Y indicates the Python version.  Stored candidates are used
+    without any requests for ttl seconds since they were last checked.
+    After that the candidates are fetched again with the finder.  The
+    cache relies on pip's HTTP cache for revalidating the page: it makes
+    the request conditional with the If-None-Match and If-Modified-Since
+    headers and serves the cached page on a 304 Not Modified.  The state
+    of the page (ETag and digest) is recorded from the response by
+    a response hook of the session, so detecting an unchanged page needs
+    no requests of its own.
+    """
+    def __init__(self, session, ttl=0, cache_dir=None, format_control=None):
+        if cache_dir is None:
+            py_version = '.'.join(str(digit) for digit in sys.version_info[:2])
+            cache_dir = os.path.join(CACHE_DIR, 'candidates-py{}'.format(py_version))
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.session = session
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.format_control = format_control
+
+        # States of the fetched index pages by page key, see
+        # _record_page_state
+        self._page_states = {}
+        session.hooks['response'].append(self._record_page_state)
+
+    def get_candidates(self, index_url, project_name, find_all_candidates):
+        """
+        Get the candidates of a project in an index.
+
+        :type index_url: str
+        :type project_name: str
+        :param find_all_candidates:
+          Function to find the candidates of a project from the index,
+          called if the stored candidates are missing or outdated
+        :rtype: list[InstallationCandidate]
+        """
+        path = self._get_path(index_url, project_name)
+        entry = _read_entry(path)
+        now = time.time()
+        if entry and now - entry['checked'] < self.ttl:
+            return _load_candidates(project_name, entry['candidates'])
+
+        page_key = get_page_key(get_project_page_url(index_url, project_name))
+        self._page_states.pop(page_key, None)
+        candidates = find_all_candidates(project_name)
+        page_state = self._page_states.pop(page_key, None)
+        if entry and _is_unchanged(entry, page_state):
+            log.debug('  {} not changed in {}'.format(project_name, index_url))
+            candidates = _load_candidates(project_name, entry['candidates'])
+        else:
+            entry = {'candidates': [_dump_candidate(x) for x in candidates]}
+        entry.update(page_state or {}, checked=now)
+        _write_entry(path, entry)
+        return candidates
+
+    def get_stored_candidates(self, index_url, project_name):
+        """
+        Get the stored candidates of a project without checking the index.
+
+        :rtype: list[InstallationCandidate]|None
+        :return: the candidates or None, if there are none stored
+        """
+        entry = _read_entry(self._get_path(index_url, project_name))
+        if entry is None:
+            return None
+        return _load_candidates(project_name, entry['candidates'])
+
+    def _get_path(self, index_url, project_name):
+        format_control = self.format_control
+        key = [index_url, normalize_req_name(project_name)]
+        if format_control is not None:
+            key.append(sorted(format_control.no_binary))
+            key.append(sorted(format_control.only_binary))
+        key_hash = hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key_hash + '.json')
+
+    def _record_page_state(self, response, **kwargs):
+        """
+        Record the state of an index page response for detecting changes.
+
+        This is a response hook of the session, since the finder does
+        not expose the responses it gets.
+        """
+        content_type = response.headers.get('Content-Type', '')
+        if response.status_code != 200 or 'text/html' not in content_type:
+            return
+        self._page_states[get_page_key(response.url)] = {
+            'etag': response.headers.get('ETag'),
+            'digest': hashlib.sha256(response.content).hexdigest(),
+        }
+
+
+def get_project_page_url(index_url, project_name):
+    """
+    Get URL of the page of a project in a simple index.
+
+    >>> str(get_project_page_url('https://pypi.org/simple/', 'Foo_Bar'))
+    'https://pypi.org/simple/foo-bar/'
+    >>> str(get_project_page_url('https://example.com/simple', 'x'))
+    'https://example.com/simple/x/'
+    """
+    quoted_name = urllib_parse.quote(normalize_req_name(project_name))
+    return posixpath.join(index_url, quoted_name) + '/'
+
+
+def get_page_key(page_url):
+    """
+    Get a key of a project page URL with a normalized project name.
+
+    >>> str(get_page_key('https://example.com/simple/Foo_Bar'))
+    'https://example.com/simple/foo-bar/'
+    >>> str(get_page_key('https://example.com/simple/foo-bar/'))
+    'https://example.com/simple/foo-bar/'
+    """
+    (scheme, netloc, path, _query, _fragment) = urllib_parse.urlsplit(page_url)
+    (parent, name) = posixpath.split(path.rstrip('/'))
+    name = normalize_req_name(urllib_parse.unquote(name))
+    path = posixpath.join(parent, urllib_parse.quote(name)) + '/'
+    return urllib_parse.urlunsplit((scheme, netloc, path, '', ''))
+
+
+def _is_unchanged(entry, page_state):
+    if page_state is None:
+        return False
+    if page_state['etag'] and page_state['etag'] == entry.get('etag'):
+        return True
+    return page_state['digest'] == entry.get('digest')
+
+
+def _read_entry(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as fp:
+        try:
+            doc = json.loads(fp.read().decode('utf-8'))
+        except ValueError:
+            return None
+    if doc.get('__format__') != 1:
+        return None
+    return doc['entry']
+
+
+def _write_entry(path, entry):
+    doc = {'__format__': 1, 'entry': entry}
+    with FileReplacer(path) as fp:
+        fp.write(json.dumps(doc, sort_keys=True).encode('utf-8'))
+
+
+def _dump_candidate(candidate):
+    link = getattr(candidate, 'link', None) or candidate.location
+    data = {
+        'version': str(candidate.version),
+        'filename': link.filename,
+        'url': link.url_without_fragment,
+    }
+    fragment = urllib_parse.urlsplit(link.url).fragment
+    if fragment:
+        data['hash'] = fragment
+    if getattr(link, 'requires_python', None):
+        data['requires_python'] = link.requires_python
+    if getattr(link, 'yanked_reason', None) is not None:
+        data['yanked_reason'] = link.yanked_reason
+    if getattr(link, 'dist_info_metadata', None):
+        data['dist_info_metadata'] = link.dist_info_metadata
+    return data
+
+
+def _load_candidates(project_name, data_list):
+    return [_load_candidate(project_name, data) for data in data_list]
+
+
+def _load_candidate(project_name, data):
+    url = data['url']
+    if data.get('hash'):
+        url += '#' + data['hash']
+    link_kwargs = {}
+    # The entries are shared by the pip versions, so pass only the
+    # attributes the Link of this pip version accepts
+    if 'requires_python' in data and PIP_9_OR_NEWER:
+        link_kwargs['requires_python'] = data['requires_python']
+    if 'yanked_reason' in data and PIP_192_OR_NEWER:
+        link_kwargs['yanked_reason'] = data['yanked_reason']
+    link = Link(url, **link_kwargs)
+    if data.get('dist_info_metadata'):
+        link.dist_info_metadata = data['dist_info_metadata']
+    return InstallationCandidate(project_name, data['version'], link)
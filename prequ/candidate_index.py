@@ -0,0 +1,71 @@
+# coding: utf-8
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+from .utils import dedup, lookup_table
+
+
+class CandidateIndex(object):
+    """
+    Index of the candidates of a project for finding the best matches.
+
+    The candidates are grouped by version and the candidates used for
+    the best matches (the last candidate of each version) are sorted to
+    the order of preference once, on first use, so that finding the
+    best match of a specifier is just a walk from the most preferred
+    candidate to the first one matching the specifier.  The result is the same as
+    filtering the versions with the specifier and picking the best of
+    the matching candidates with the sort key.
+    """
+    def __init__(self, candidates, sort_key):
+        """
+        Initialize the index.
+
+        :type candidates: list[InstallationCandidate]
+        :param sort_key:
+          Function giving the sort key of a candidate, greater being
+          more preferred, e.g. the sort key of pip's candidate evaluator
+        """
+        #: The versions of the candidates in their original order
+        self.versions = list(dedup(candidate.version for candidate in candidates))
+
+        #: Lists of the candidates by version
+        self.candidates_by_version = lookup_table(
+            candidates, key=lambda c: c.version, use_lists=True)
+
+        self._candidates = candidates
+        self._sort_key = sort_key
+        self._preferred = None
+
+    def get_best_candidate(self, specifier, prereleases=None):
+        """
+        Get the most preferred candidate matching a specifier.
+
+        The prereleases are handled like in SpecifierSet.filter: If
+        prereleases is None and the specifier does not tell whether to
+        allow them, they are only used when no final release matches.
+
+        :type specifier: SpecifierSet
+        :type prereleases: bool|None
+        :rtype: InstallationCandidate|None
+        """
+        if prereleases is None:
+            prereleases = specifier.prereleases
+        best_candidate = self._get_first_match(specifier, bool(prereleases))
+        if best_candidate is None and prereleases is None:
+            best_candidate = self._get_first_match(specifier, True)
+        return best_candidate
+
+    def _get_first_match(self, specifier, prereleases):
+        for candidate in self._get_preferred():
+            if specifier.contains(candidate.version, prereleases=prereleases):
+                return candidate
+        return None
+
+    def _get_preferred(self):
+        if self._preferred is None:
+            best_of_versions = lookup_table(
+                self._candidates, key=lambda c: c.version, unique=True)
+            self._preferred = sorted(
+                best_of_versions.values(), key=self._sort_key, reverse=True)
+        return self._preferred
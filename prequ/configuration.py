@@ -3,7 +3,9 @@ Prequ configuration file definition and parsing.
 """
 from __future__ import unicode_literals
 
+import hashlib
 import io
+import json
 import os
 import re
 from collections import defaultdict
@@ -12,11 +14,25 @@ from glob import glob
 
 from .ini_parser import bool_or_auto, parse_ini
 from .repositories.pypi import PyPIRepository
+from .writer import INPUT_DIGEST_PREFIX
 
 DEFAULT_INDEX_URL = PyPIRepository.DEFAULT_INDEX_URL
 
 text = type('')
 
+#: Options passed to compile as is, if they are set
+_PLAIN_COMPILE_OPTIONS = [
+    'build_jobs', 'fetch_jobs', 'hash_jobs', 'cache_backend', 'json_api_url',
+    'result_cache']
+
+#: Compile options passed as is, if set (0 is a valid value for them)
+_TTL_COMPILE_OPTIONS = ['candidate_ttl', 'not_found_ttl']
+
+#: Compile options affecting the generated files, see get_input_digest
+_INPUT_DIGEST_OPTIONS = [
+    'annotate', 'header', 'generate_hashes', 'index_url', 'extra_index_url',
+    'trusted_host', 'find_links']
+
 
 class PrequConfiguration(object):
     """
@@ -40,6 +56,15 @@ class PrequConfiguration(object):
         ('options.header', bool_or_auto),
         ('options.index_url', text),
         ('options.extra_index_urls', [text]),
+        ('options.build_jobs', int),
+        ('options.cache_backend', text),
+        ('options.candidate_ttl', int),
+        ('options.fetch_jobs', int),
+        ('options.hash_jobs', int),
+        ('options.input_digest', bool_or_auto),
+        ('options.json_api_url', text),
+        ('options.not_found_ttl', int),
+        ('options.result_cache', bool),
         ('options.trusted_hosts', [text]),
         ('options.wheel_dir', text),
         ('options.wheel_sources', {text: text}),
@@ -153,6 +178,15 @@ class PrequConfiguration(object):
         self.header = kwargs.pop('header', 'auto')
         self.index_url = kwargs.pop('index_url', DEFAULT_INDEX_URL)
         self.extra_index_urls = kwargs.pop('extra_index_urls', [])
+        self.build_jobs = kwargs.pop('build_jobs', None)
+        self.cache_backend = kwargs.pop('cache_backend', None)
+        self.candidate_ttl = kwargs.pop('candidate_ttl', None)
+        self.fetch_jobs = kwargs.pop('fetch_jobs', None)
+        self.hash_jobs = kwargs.pop('hash_jobs', None)
+        self.input_digest = kwargs.pop('input_digest', 'auto')
+        self.json_api_url = kwargs.pop('json_api_url', None)
+        self.not_found_ttl = kwargs.pop('not_found_ttl', None)
+        self.result_cache = kwargs.pop('result_cache', False)
         self.trusted_hosts = kwargs.pop('trusted_hosts', [])
         self.wheel_dir = kwargs.pop('wheel_dir', None)
 
@@ -214,8 +248,57 @@ class PrequConfiguration(object):
             options['trusted_host'] = self.trusted_hosts
         if self.wheel_dir:
             options['find_links'] = [self.wheel_dir]
+        for name in _PLAIN_COMPILE_OPTIONS:
+            if getattr(self, name):
+                options[name] = getattr(self, name)
+        for name in _TTL_COMPILE_OPTIONS:
+            if getattr(self, name) is not None:
+                options[name] = getattr(self, name)
         return options
 
+    def uses_input_digest(self):
+        """
+        Check if the input digests should be added to the output files.
+
+        :rtype: bool
+        """
+        return self._detect(self.input_digest, INPUT_DIGEST_PREFIX)
+
+    def get_input_digest(self, label, compile_options=None):
+        """
+        Get digest of the input of a requirement set.
+
+        The digest covers the source requirements of the set, the
+        output file of the base requirements constraining it and the
+        compile options affecting the output, i.e. everything affecting
+        the output file except the contents of the package indexes.
+
+        :type label: text
+        :param compile_options:
+          the options of the compilation, defaults to the options given
+          by get_prequ_compile_options
+        :type compile_options: dict|None
+        :rtype: text
+        """
+        if compile_options is None:
+            compile_options = self.get_prequ_compile_options()
+        base_file = self.get_output_file_for('base')
+        base_hash = None
+        if label != 'base' and 'base' in self.requirement_sets:
+            if os.path.exists(base_file):
+                with open(base_file, 'rb') as fp:
+                    content = fp.read().replace(b'\r\n', b'\n')
+                base_hash = hashlib.sha256(content).hexdigest()
+        data = {
+            'requirements': self.requirement_sets[label],
+            'base': base_hash,
+            'options': {
+                key: value for (key, value) in compile_options.items()
+                if key in _INPUT_DIGEST_OPTIONS},
+        }
+        key = json.dumps(data, sort_keys=True)
+        return 'sha256:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
     def _detect(self, value, detector_text, default_if_no_files=False):
         """
         Detect value for bool_or_auto variable.
@@ -103,3 +103,19 @@ class FileOutdated(PrequError):
 
 class WheelMissing(PrequError):
     pass
+
+
+class OfflineCacheMiss(PrequError):
+    def __init__(self, missing):
+        """
+        Initialize "offline cache miss" error.
+
+        :param missing: descriptions of the missing cache entries
+        :type missing: list[str]
+        """
+        self.missing = missing
+
+    def __str__(self):
+        return '\n'.join(
+            ['Cannot work offline, since these are not cached:'] +
+            ['  - {}'.format(x) for x in self.missing])
@@ -0,0 +1,147 @@
+# coding: utf-8
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import hashlib
+import json
+import os
+import time
+
+from ._pip_compat import url_to_path
+from .file_replacer import FileReplacer
+from .locations import CACHE_DIR
+from .logging import log
+from .utils import dedup, normalize_req_name
+
+#: Seconds for which a directory modification time is considered too
+#: fresh for storing the index, since the directory could still change
+#: within the resolution of the modification time
+_RACY_MTIME_PERIOD = 2
+
+
+class FindLinksIndex(object):
+    """
+    Persistent index of the files in find links directories.
+
+    Pip lists and parses the names of all the files in a find links
+    directory for every project it looks up.  This index maps the
+    (normalized) project names to the file names of a directory, so
+    that only the files of the looked up project have to be passed to
+    pip.  The index of each directory is stored to a JSON file in the
+    user cache dir, i.e.
+
+        ~/.cache/prequ/find-links/{key-hash}.json
+
+    and rebuilt whenever the modification time of the directory
+    changes, i.e. when files are added, removed or renamed.
+    """
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.path.join(CACHE_DIR, 'find-links')
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_dir = cache_dir
+        self._entries = {}
+
+    def get_paths(self, directory, project_name):
+        """
+        Get paths of the files of a project in a directory.
+
+        The result may also contain files of other projects whose name
+        starts with the same words, since the name and the version of
+        a source distribution cannot be told apart from its file name.
+        Pip filters those out.
+
+        :type directory: str
+        :type project_name: str
+        :rtype: list[str]
+        """
+        directory = os.path.abspath(directory)
+        entry = self._get_entry(directory)
+        filenames = entry['projects'].get(normalize_req_name(project_name), [])
+        return [os.path.join(directory, filename) for filename in filenames]
+
+    def _get_entry(self, directory):
+        mtime = os.stat(directory).st_mtime
+        entry = self._entries.get(directory)
+        if entry is None or entry['mtime'] != mtime:
+            path = self._get_path(directory)
+            entry = _read_entry(path)
+            if entry is None or entry['mtime'] != mtime:
+                entry = _build_entry(directory, mtime)
+                if time.time() - mtime >= _RACY_MTIME_PERIOD:
+                    _write_entry(path, entry)
+            self._entries[directory] = entry
+        return entry
+
+    def _get_path(self, directory):
+        key = json.dumps(directory)
+        key_hash = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key_hash + '.json')
+
+
+def get_local_directory(location):
+    """
+    Get the local directory of a find links location.
+
+    :type location: str
+    :return: path of the directory, or None if it is not a directory
+    :rtype: str|None
+    """
+    if location.startswith('file:'):
+        location = url_to_path(location)
+    elif '://' in location:
+        return None
+    return location if os.path.isdir(location) else None
+
+
+def get_project_names(filename):
+    """
+    Get the project names a distribution file name may refer to.
+
+    >>> [str(x) for x in get_project_names('Foo_Bar-1.0-py2.py3-none-any.whl')]
+    ['foo-bar']
+    >>> [str(x) for x in get_project_names('foo-bar-1.0.tar.gz')]
+    ['foo', 'foo-bar']
+    >>> [str(x) for x in get_project_names('README')]
+    []
+
+    :rtype: list[str]
+    """
+    parts = filename.split('-')
+    if filename.endswith('.whl'):
+        return [normalize_req_name(parts[0])]
+    return list(dedup(
+        normalize_req_name('-'.join(parts[:i]))
+        for i in range(1, len(parts))))
+
+
+def _build_entry(directory, mtime):
+    start_time = time.time()
+    projects = {}
+    filenames = sorted(os.listdir(directory))
+    for filename in filenames:
+        for name in get_project_names(filename):
+            projects.setdefault(name, []).append(filename)
+    log.debug('Indexed {} files of {} in {:.2f} seconds'.format(
+        len(filenames), directory, time.time() - start_time))
+    return {'mtime': mtime, 'projects': projects}
+
+
+def _read_entry(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as fp:
+        try:
+            doc = json.loads(fp.read().decode('utf-8'))
+        except ValueError:
+            return None
+    if doc.get('__format__') != 1:
+        return None
+    return doc['entry']
+
+
+def _write_entry(path, entry):
+    doc = {'__format__': 1, 'entry': entry}
+    with FileReplacer(path) as fp:
+        fp.write(json.dumps(doc, sort_keys=True).encode('utf-8'))
@@ -0,0 +1,140 @@
+# coding: utf-8
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import json
+import os
+import threading
+
+from ._pip_compat import FAVORITE_HASH, is_file_url, url_to_path
+from .file_replacer import FileReplacer
+from .locations import CACHE_DIR
+from .logging import log
+
+
+class HashCache(object):
+    """
+    Persistent cache of file hashes by the URLs of the files.
+
+    The hashes are stored to a JSON file in the user cache dir, i.e.
+
+        ~/.cache/prequ/hashes.json
+
+    Each hash is stored with the size and the ETag of the file (or the
+    modification time for local files) and it is used only if those
+    still match the file.  Remote files are checked with a HEAD request.
+    Files without an ETag are not cached.
+
+    New hashes are written to the file by flush.
+    """
+    def __init__(self, session, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = CACHE_DIR
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.session = session
+        self._cache_file = os.path.join(cache_dir, 'hashes.json')
+        self._cache = None
+        self._new_entries = {}
+        self._flush_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        """
+        The dictionary of the cached entries by URL.  This property
+        lazily loads the cache from disk.
+        """
+        if self._cache is None:
+            self._cache = self._read_cache()
+        return self._cache
+
+    def get_hash(self, link, compute_hash):
+        """
+        Get hash of the file of a link.
+
+        :type link: pip.index.Link
+        :param compute_hash:
+          Function to compute the hash of the file of a link, called if
+          there is no valid cached hash
+        :rtype: str
+        """
+        url = link.url_without_fragment
+        validators = self._get_validators(link)
+        entry = self.cache.get(url)
+        if validators and entry and _is_valid(entry, validators):
+            return entry['hash']
+        file_hash = compute_hash(link)
+        if validators:
+            entry = dict(validators, hash=file_hash)
+            self._new_entries[url] = entry
+            self.cache[url] = entry
+        return file_hash
+
+    def get_stored_hash(self, link):
+        """
+        Get the stored hash of the file of a link without validating it.
+
+        :type link: pip.index.Link
+        :rtype: str|None
+        """
+        entry = self.cache.get(link.url_without_fragment)
+        if entry and entry.get('hash', '').startswith(FAVORITE_HASH + ':'):
+            return entry['hash']
+        return None
+
+    def flush(self):
+        """Writes the new hashes, if any, to disk."""
+        with self._flush_lock:
+            (new_entries, self._new_entries) = (self._new_entries, {})
+            if not new_entries:
+                return
+            entries = self._read_cache()  # Merge with other writers
+            entries.update(new_entries)
+            doc = {'__format__': 1, 'hashes': entries}
+            with FileReplacer(self._cache_file) as fp:
+                fp.write(json.dumps(doc, sort_keys=True).encode('utf-8'))
+
+    def _read_cache(self):
+        if not os.path.exists(self._cache_file):
+            return {}
+        with open(self._cache_file, 'rb') as fp:
+            try:
+                doc = json.loads(fp.read().decode('utf-8'))
+            except ValueError:
+                return {}
+        if doc.get('__format__') != 1:
+            return {}
+        return doc['hashes']
+
+    def _get_validators(self, link):
+        """
+        Get the size and the ETag of the file of a link.
+
+        :return: dict with size and etag, or None if not available
+        :rtype: dict|None
+        """
+        url = link.url_without_fragment
+        if is_file_url(link):
+            try:
+                stat = os.stat(url_to_path(url))
+            except OSError:
+                return None
+            return {'size': stat.st_size, 'etag': 'mtime:{}'.format(stat.st_mtime)}
+        try:
+            response = self.session.head(url, allow_redirects=True)
+            response.raise_for_status()
+        except Exception as error:
+            log.debug('  Cannot check {}: {}'.format(url, error))
+            return None
+        size = response.headers.get('Content-Length')
+        etag = response.headers.get('ETag')
+        if etag is None:
+            return None
+        return {'size': int(size) if size is not None else None, 'etag': etag}
+
+
+def _is_valid(entry, validators):
+    return (
+        entry.get('size') == validators['size'] and
+        entry.get('etag') == validators['etag'] and
+        entry.get('hash', '').startswith(FAVORITE_HASH + ':'))
@@ -28,14 +28,10 @@ def parse_ini(fileobj, field_specs, section_name):
 
 
 def _parse_value(parser, section_name, key, value, spec):
-    if spec in (bool, bool_or_auto):
+    if spec in (bool, bool_or_auto, int):
         if spec == bool_or_auto and value == 'auto':
             return 'auto'
-        try:
-            return parser.getboolean(section_name, key)
-        except ValueError:
-            raise ParseError(
-                'Unknown bool value for option "{}": {!r}'.format(key, value))
+        return _get_typed_value(parser, section_name, key, value, spec)
     elif spec == text:
         return value
     elif isinstance(spec, list):
@@ -45,3 +41,14 @@ def _parse_value(parser, section_name, key, value, spec):
         if spec == {text: text}:
             return dict(x.split(' = ', 1) for x in value.splitlines() if x)
     raise NotImplementedError("Type spec not implemented: {!r}".format(spec))
+
+
+def _get_typed_value(parser, section_name, key, value, spec):
+    (getter, type_name) = (
+        (parser.getint, 'int') if spec == int else
+        (parser.getboolean, 'bool'))
+    try:
+        return getter(section_name, key)
+    except ValueError:
+        raise ParseError('Unknown {} value for option "{}": {!r}'.format(
+            type_name, key, value))
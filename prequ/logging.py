@@ -3,6 +3,8 @@ from __future__ import (
     absolute_import, division, print_function, unicode_literals)
 
 import sys
+import threading
+from contextlib import contextmanager
 
 import click
 
@@ -10,9 +12,35 @@ import click
 class LogContext(object):
     def __init__(self, verbose=False):
         self.verbose = verbose
+        self._local = threading.local()
 
     def log(self, *args, **kwargs):
-        click.secho(*args, **kwargs)
+        messages = getattr(self._local, 'messages', None)
+        if messages is not None:
+            messages.append((args, kwargs))
+        else:
+            click.secho(*args, **kwargs)
+
+    @contextmanager
+    def buffered(self):
+        """
+        Buffer the messages logged by the current thread.
+
+        Yields a list to which the messages are collected instead of
+        outputting them.  They can be output later with output.
+        """
+        self._local.messages = messages = []
+        try:
+            yield messages
+        finally:
+            self._local.messages = None
+
+    def output(self, messages):
+        """
+        Output messages collected by buffered.
+        """
+        for (args, kwargs) in messages:
+            self.log(*args, **kwargs)
 
     def debug(self, *args, **kwargs):
         if self.verbose:
@@ -0,0 +1,110 @@
+# coding: utf-8
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import json
+import os
+import threading
+import time
+
+from .candidate_cache import get_page_key, get_project_page_url
+from .file_replacer import FileReplacer
+from .locations import CACHE_DIR
+
+
+class NotFoundCache(object):
+    """
+    Persistent cache of the projects missing from package indexes.
+
+    The URLs of the project pages, which an index responded with
+    "404 Not Found", are stored with the time of the response to a JSON
+    file in the user cache dir, i.e.
+
+        ~/.cache/prequ/not-found.json
+
+    A project is considered missing from the index for ttl seconds
+    after that, so that its page is not requested again.  This avoids
+    most of the requests to private indexes, which have only a few of
+    the projects of a public index.
+
+    New entries are written to the file by flush.
+    """
+    def __init__(self, ttl, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = CACHE_DIR
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.ttl = ttl
+        self._cache_file = os.path.join(cache_dir, 'not-found.json')
+        self._cache = None
+        self._new_entries = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        #: Number of page requests avoided with the cache
+        self.skipped_count = 0
+
+    @property
+    def cache(self):
+        """
+        The dictionary of the response times by page URL.  This
+        property lazily loads the cache from disk.
+        """
+        if self._cache is None:
+            self._cache = self._read_cache()
+        return self._cache
+
+    def is_missing(self, index_url, project_name):
+        """
+        Check if a project is known to be missing from an index.
+
+        :rtype: bool
+        """
+        url = get_page_key(get_project_page_url(index_url, project_name))
+        not_found_time = self.cache.get(url)
+        if not_found_time is None:
+            return False
+        if time.time() - not_found_time >= self.ttl:
+            return False
+        with self._lock:
+            self.skipped_count += 1
+        return True
+
+    def add(self, page_url):
+        """
+        Add a project page, which was not found.
+
+        :type page_url: str
+        """
+        url = get_page_key(page_url)
+        not_found_time = time.time()
+        self._new_entries[url] = not_found_time
+        self.cache[url] = not_found_time
+
+    def flush(self):
+        """Writes the new entries, if any, to disk."""
+        with self._flush_lock:
+            (new_entries, self._new_entries) = (self._new_entries, {})
+            if not new_entries:
+                return
+            now = time.time()
+            entries = {  # Merge with other writers and drop expired entries
+                url: not_found_time
+                for (url, not_found_time) in self._read_cache().items()
+                if now - not_found_time < self.ttl}
+            entries.update(new_entries)
+            doc = {'__format__': 1, 'pages': entries}
+            with FileReplacer(self._cache_file) as fp:
+                fp.write(json.dumps(doc, sort_keys=True).encode('utf-8'))
+
+    def _read_cache(self):
+        if not os.path.exists(self._cache_file):
+            return {}
+        with open(self._cache_file, 'rb') as fp:
+            try:
+                doc = json.loads(fp.read().decode('utf-8'))
+            except ValueError:
+                return {}
+        if doc.get('__format__') != 1:
+            return {}
+        return doc['pages']
@@ -1,3 +1,4 @@
 # flake8: noqa
+from .json_api import JsonApiRepository
 from .local import LocalRequirementsRepository
 from .pypi import PyPIRepository
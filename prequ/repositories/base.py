@@ -21,6 +21,17 @@ class BaseRepository(ABC):
     def freshen_build_caches(self):
         """Should start with fresh build/source caches."""
 
+    def prefetch_candidates(self, ireqs):
+        """
+        Should prepare for finding the best matches of given requirements.
+
+        Called with all the requirements of a resolver round before
+        find_best_match is called for them one by one.  Implementations
+        may use this for fetching the candidates concurrently.
+
+        :type ireqs: list[pip.req.InstallRequirement]
+        """
+
     @abstractmethod
     def find_best_match(self, ireq):
         """
@@ -38,6 +49,20 @@ class BaseRepository(ABC):
             raise TypeError('Expected pinned or editable InstallRequirement, got {}'.format(ireq))
         return self._get_dependencies(ireq)
 
+    def get_many_dependencies(self, ireqs):
+        """
+        Get dependencies of several pinned InstallRequirements at once.
+
+        Returns a list of dependency sets in the same order as the given
+        requirements.  The default implementation just calls
+        get_dependencies for each of them, but implementations may
+        e.g. prepare the requirements in parallel.
+
+        :type ireqs: list[pip.req.InstallRequirement]
+        :rtype: list[set[pip.req.InstallRequirement]]
+        """
+        return [self.get_dependencies(ireq) for ireq in ireqs]
+
     def prepare_ireq(self, ireq):
         """
         Prepare install requirement for requirement analysis.
@@ -61,3 +86,17 @@ class BaseRepository(ABC):
         all of the files for a given requirement. It is not acceptable for an
         editable or unpinned requirement to be passed to this function.
         """
+
+    def get_many_hashes(self, ireqs):
+        """
+        Get hashes of several pinned InstallRequirements at once.
+
+        Returns a dictionary from the given requirements to their sets
+        of hashes.  The default implementation just calls get_hashes
+        for each of them, but implementations may e.g. download and
+        hash the files concurrently.
+
+        :type ireqs: Iterable[pip.req.InstallRequirement]
+        :rtype: dict[pip.req.InstallRequirement,set[str]]
+        """
+        return {ireq: self.get_hashes(ireq) for ireq in ireqs}
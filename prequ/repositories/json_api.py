@@ -0,0 +1,285 @@
+# coding: utf-8
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import posixpath
+import sys
+from multiprocessing.pool import ThreadPool
+
+from pip._vendor.packaging.specifiers import InvalidSpecifier, SpecifierSet
+
+from .._pip_compat import (
+    InstallationCandidate, Link, Wheel, get_supported_tags, init_pip_log_state,
+    install_req_from_line, urllib_parse)
+from ..logging import log
+from ..utils import (
+    as_tuple, check_is_hashable, dedup, is_vcs_link, make_install_requirement,
+    normalize_req_name)
+from ..wheel_metadata import get_metadata_requirements
+from .base import BaseRepository
+
+#: Package types of the JSON API usable as candidates
+_PACKAGE_TYPES = {'bdist_wheel': 'binary', 'sdist': 'source'}
+
+
+class JsonApiRepository(BaseRepository):
+    """
+    Repository which uses the JSON API of a package index.
+
+    Warehouse compatible indexes (like PyPI) and e.g. devpi serve JSON
+    documents of the projects and their releases, i.e.
+
+        {json_api_url}/{project}/json
+        {json_api_url}/{project}/{version}/json
+
+    The candidates, the dependencies and the hashes of the packages are
+    taken from these documents.  The JSON API stands in for the first
+    index of the finder, so the candidates of the find links and the
+    extra indexes are still fetched with the proxied repository and
+    merged to the ones of the API.  The proxied repository is used for
+    projects not found from the JSON API, for editable and URL
+    requirements and for getting the dependencies of releases without
+    the requires_dist information, since that means the information
+    is not known to the index.
+
+    The requests are sent with the session of the proxied repository,
+    so its keep-alive connection pools are reused.
+    """
+    def __init__(self, json_api_url, proxied_repository):
+        self.json_api_url = json_api_url.rstrip('/')
+        self.repository = proxied_repository
+        self._project_cache = {}
+        self._release_cache = {}
+        self._candidates_cache = {}
+
+    @property
+    def finder(self):
+        return self.repository.finder
+
+    @property
+    def session(self):
+        return self.repository.session
+
+    @property
+    def DEFAULT_INDEX_URL(self):  # noqa (N802)
+        return self.repository.DEFAULT_INDEX_URL
+
+    def clear_caches(self):
+        self.repository.clear_caches()
+
+    def freshen_build_caches(self):
+        self.repository.freshen_build_caches()
+
+    def prefetch_candidates(self, ireqs):
+        """
+        Fetch the project documents of the given requirements
+        concurrently with fetch_jobs threads of the proxied repository.
+        """
+        names = list(dedup(
+            normalize_req_name(ireq.name) for ireq in ireqs
+            if not (ireq.editable or is_vcs_link(ireq))
+            and normalize_req_name(ireq.name) not in self._project_cache))
+        jobs = getattr(self.repository, 'fetch_jobs', 1)
+        if jobs <= 1 or len(names) <= 1:
+            return
+        pool = ThreadPool(min(jobs, len(names)), initializer=init_pip_log_state)
+        try:
+            pool.map(self._get_project, names)
+        finally:
+            pool.close()
+            pool.join()
+
+    def find_all_candidates(self, req_name):
+        """
+        Find all candidates of a project from its JSON document.
+
+        Only wheels supported by the current platform and sdists, which
+        are allowed by the format control of the finder and whose
+        Python requirement matches the current Python, are included.
+        Yanked files are skipped.  The candidates of the find links and
+        the extra indexes are included too.
+
+        :rtype: list[InstallationCandidate]
+        """
+        name = normalize_req_name(req_name)
+        if name not in self._candidates_cache:
+            project = self._get_project(name)
+            if project is None:
+                candidates = self.repository.find_all_candidates(req_name)
+            else:
+                candidates = self.repository._fetch_candidates(
+                    req_name, self._get_candidates(req_name, project))
+            self._candidates_cache[name] = candidates
+        return self._candidates_cache[name]
+
+    def _get_candidates(self, req_name, project):
+        allowed_formats = _get_allowed_formats(
+            self.finder.format_control, normalize_req_name(req_name))
+        supported_tags = get_supported_tags()
+        candidates = []
+        for (version, files) in sorted(project.get('releases', {}).items()):
+            for file_info in files:
+                package_format = _PACKAGE_TYPES.get(file_info.get('packagetype'))
+                if package_format not in allowed_formats:
+                    continue
+                if file_info.get('yanked'):
+                    continue
+                if not _matches_python(file_info.get('requires_python')):
+                    continue
+                if package_format == 'binary':
+                    wheel = Wheel(file_info['filename'])
+                    if not wheel.supported(supported_tags):
+                        continue
+                candidates.append(InstallationCandidate(
+                    req_name, version, _get_file_link(file_info)))
+        return candidates
+
+    def find_best_match(self, ireq, prereleases=None):
+        if ireq.editable or is_vcs_link(ireq):
+            return ireq  # return itself as the best match
+        all_candidates = self.find_all_candidates(ireq.name)
+        best_candidate = self.repository._select_best_candidate(
+            ireq, all_candidates, prereleases)
+        return make_install_requirement(
+            best_candidate.project, best_candidate.version, ireq.extras,
+            constraint=ireq.constraint)
+
+    def get_many_dependencies(self, ireqs):
+        """
+        Get dependencies of several pinned InstallRequirements at once.
+
+        The requirements, which have no requires_dist in the JSON API,
+        are passed to get_many_dependencies of the proxied repository.
+        """
+        results = [self._get_json_dependencies(ireq) for ireq in ireqs]
+        missing = [i for (i, result) in enumerate(results) if result is None]
+        fetched = self.repository.get_many_dependencies(
+            [ireqs[i] for i in missing])
+        for (i, dependencies) in zip(missing, fetched):
+            results[i] = dependencies
+        return results
+
+    def _get_dependencies(self, ireq):
+        dependencies = self._get_json_dependencies(ireq)
+        if dependencies is None:
+            return self.repository._get_dependencies(ireq)
+        return dependencies
+
+    def _get_json_dependencies(self, ireq):
+        """
+        Get dependencies of a pinned requirement from the JSON API.
+
+        :return: the dependencies or None if not known by the JSON API
+        :rtype: set[pip.req.InstallRequirement]|None
+        """
+        if ireq.editable or ireq.link:
+            return None
+        (name, version) = as_tuple(ireq)[:2]
+        release = self._get_release(name, version)
+        info = (release or {}).get('info') or {}
+        requires_dist = info.get('requires_dist')
+        if requires_dist is None:
+            return None
+        provides_extra = info.get('provides_extra')
+        if provides_extra is None:
+            provides_extra = ireq.extras
+        metadata = ''.join(
+            ['Provides-Extra: {}\n'.format(x) for x in provides_extra] +
+            ['Requires-Dist: {}\n'.format(x) for x in requires_dist])
+        requirements = get_metadata_requirements(metadata, ireq.extras)
+        return {install_req_from_line(str(req)) for req in requirements}
+
+    def get_hashes(self, ireq):
+        """
+        Get hashes of the files of a pinned requirement.
+
+        The hashes are the SHA256 digests of the matching candidates
+        from the JSON API.  If the project is not in the JSON API, the
+        hashes are asked from the proxied repository.
+        """
+        if ireq.editable:
+            return set()
+        check_is_hashable(ireq)
+        if ireq.link or self._get_project(ireq.name) is None:
+            return self.repository.get_hashes(ireq)
+        all_candidates = self.find_all_candidates(ireq.name)
+        matching_versions = list(
+            ireq.specifier.filter(candidate.version for candidate in all_candidates))
+        links = [
+            candidate.link for candidate in all_candidates
+            if matching_versions and candidate.version == matching_versions[0]]
+        if not links or any(link.hash_name != 'sha256' for link in links):
+            return self.repository.get_hashes(ireq)
+        return {'sha256:' + link.hash for link in links}
+
+    def _get_project(self, name):
+        name = normalize_req_name(name)
+        if name not in self._project_cache:
+            url = posixpath.join(self.json_api_url, name, 'json')
+            self._project_cache[name] = self._get_document(url)
+        return self._project_cache[name]
+
+    def _get_release(self, name, version):
+        key = (normalize_req_name(name), version)
+        if key not in self._release_cache:
+            url = posixpath.join(self.json_api_url, key[0], version, 'json')
+            self._release_cache[key] = self._get_document(url)
+        return self._release_cache[key]
+
+    def _get_document(self, url):
+        """
+        Get a JSON document from the JSON API.
+
+        :return: the parsed document or None if not available
+        :rtype: dict|None
+        """
+        try:
+            response = self.session.get(
+                url, headers={'Accept': 'application/json'})
+            if response.status_code == 404:
+                log.debug('  Not found from JSON API: {}'.format(url))
+                return None
+            response.raise_for_status()
+            return response.json()
+        except Exception as error:
+            log.debug('  Cannot get {}: {}'.format(url, error))
+            return None
+
+
+def _get_file_link(file_info):
+    url = urllib_parse.urldefrag(file_info['url'])[0]
+    sha256 = (file_info.get('digests') or {}).get('sha256')
+    if sha256:
+        url += '#sha256=' + sha256
+    return Link(url)
+
+
+def _get_allowed_formats(format_control, canonical_name):
+    """
+    Get the allowed package formats of a project.
+
+    Same as FormatControl.get_allowed_formats of newer pip versions.
+
+    :rtype: set[str]
+    """
+    result = {'binary', 'source'}
+    if canonical_name in format_control.only_binary:
+        result.discard('source')
+    elif canonical_name in format_control.no_binary:
+        result.discard('binary')
+    elif ':all:' in format_control.only_binary:
+        result.discard('source')
+    elif ':all:' in format_control.no_binary:
+        result.discard('binary')
+    return result
+
+
+def _matches_python(requires_python):
+    if not requires_python:
+        return True
+    try:
+        specifier = SpecifierSet(requires_python)
+    except InvalidSpecifier:
+        return True  # Ignored like pip does
+    python_version = '.'.join(str(x) for x in sys.version_info[:3])
+    return specifier.contains(python_version)
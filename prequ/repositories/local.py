@@ -48,10 +48,20 @@ class LocalRequirementsRepository(BaseRepository):
     def freshen_build_caches(self):
         self.repository.freshen_build_caches()
 
-    def find_best_match(self, ireq, prereleases=None):
-        key = key_from_ireq(ireq)
-        existing_pin = self.existing_pins.get(key)
+    def prefetch_candidates(self, ireqs):
+        self.repository.prefetch_candidates([
+            ireq for ireq in ireqs
+            if not self._get_satisfying_pin(ireq)])
+
+    def _get_satisfying_pin(self, ireq):
+        existing_pin = self.existing_pins.get(key_from_ireq(ireq))
         if existing_pin and ireq_satisfied_by_existing_pin(ireq, existing_pin):
+            return existing_pin
+        return None
+
+    def find_best_match(self, ireq, prereleases=None):
+        existing_pin = self._get_satisfying_pin(ireq)
+        if existing_pin:
             version = as_tuple(existing_pin)[1]
             return make_install_requirement(
                 existing_pin.name, version,
@@ -59,16 +69,37 @@ class LocalRequirementsRepository(BaseRepository):
         else:
             return self.repository.find_best_match(ireq, prereleases)
 
+    def get_many_dependencies(self, ireqs):
+        return self.repository.get_many_dependencies(ireqs)
+
     def _get_dependencies(self, ireq):
         return self.repository._get_dependencies(ireq)
 
     def get_hashes(self, ireq):
+        existing_hashes = self._get_existing_hashes(ireq)
+        if existing_hashes is not None:
+            return existing_hashes
+        return self.repository.get_hashes(ireq)
+
+    def get_many_hashes(self, ireqs):
+        result = {}
+        missing = []
+        for ireq in ireqs:
+            existing_hashes = self._get_existing_hashes(ireq)
+            if existing_hashes is not None:
+                result[ireq] = existing_hashes
+            else:
+                missing.append(ireq)
+        result.update(self.repository.get_many_hashes(missing))
+        return result
+
+    def _get_existing_hashes(self, ireq):
         check_is_hashable(ireq)
         pinned_ireq = self.existing_pins.get(key_from_ireq(ireq))
         if pinned_ireq and ireq_satisfied_by_existing_pin(ireq, pinned_ireq):
             if pinned_ireq.has_hash_options:
                 return set(_get_hashes_from_ireq(pinned_ireq))
-        return self.repository.get_hashes(ireq)
+        return None
 
 
 def _get_hashes_from_ireq(ireq):
@@ -2,9 +2,17 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals)
 
+import copy
 import hashlib
+import json
+import mmap
+import multiprocessing
 import os
+import threading
+import time
 from contextlib import contextmanager
+from functools import partial
+from multiprocessing.pool import ThreadPool
 from shutil import rmtree
 
 import pip
@@ -13,29 +21,79 @@ import pkg_resources
 from .._compat import TemporaryDirectory
 from .._log_utils import collect_logs
 from .._pip_compat import (
-    FAVORITE_HASH, InstallationError, PackageFinder, PyPI, RequirementPreparer,
-    RequirementSet, RequirementTracker, Resolver, WheelCache,
-    create_package_finder, is_file_url, url_to_path)
+    FAVORITE_HASH, InstallationError, Link, PackageFinder, PyPI,
+    RequirementPreparer, RequirementSet, RequirementTracker, Resolver,
+    WheelCache, create_package_finder, init_pip_log_state,
+    install_req_from_line, is_file_url, path_to_url, url_to_path, urllib_parse)
 from ..cache import CACHE_DIR
-from ..exceptions import DependencyResolutionFailed, NoCandidateFound
+from ..candidate_cache import (
+    CandidateCache, get_page_key, get_project_page_url)
+from ..candidate_index import CandidateIndex
+from ..exceptions import (
+    DependencyResolutionFailed, NoCandidateFound, OfflineCacheMiss)
+from ..find_links_index import FindLinksIndex, get_local_directory
+from ..hash_cache import HashCache
+from ..logging import log
+from ..not_found_cache import NotFoundCache
+from ..sdist_metadata_cache import (
+    SDIST_EXTENSIONS, SdistMetadataCache, get_distribution_metadata)
 from ..utils import (
-    check_is_hashable, fs_str, is_vcs_link, lookup_table,
-    make_install_requirement)
+    check_is_hashable, dedup, format_requirement, fs_str, get_ireq_version,
+    is_pinned_requirement, is_vcs_link, make_install_requirement,
+    normalize_req_name)
+from ..wheel_metadata import (
+    get_metadata_file_requirements, get_metadata_requirements,
+    get_wheel_requirements, parse_metadata_file_attributes)
 from .base import BaseRepository
 
+#: Size of the buffer used for reading files for hashing
+HASH_BUFFER_SIZE = 1024 * 1024
 
-class PyPIRepository(BaseRepository):
-    DEFAULT_INDEX_URL = PyPI.simple_url
 
+class PyPIRepository(BaseRepository):
     """
     The PyPIRepository will use the provided Finder instance to lookup
     packages.  Typically, it looks up packages on PyPI (the default implicit
     config), but any other PyPI mirror can be used if index_urls is
     changed/configured on the Finder.
+
+    The candidates of several projects can be fetched concurrently with
+    prefetch_candidates, if fetch_jobs is greater than one.  Similarly
+    get_many_dependencies prepares the requirements in a pool of
+    build_jobs processes and get_many_hashes downloads and hashes the
+    files in a pool of hash_jobs threads.
+
+    If candidate_ttl is not None, the candidates found from the indexes
+    are stored to a persistent CandidateCache and revalidated after
+    candidate_ttl seconds.  Similarly, if not_found_ttl is not None,
+    the projects which an index responded 404 for are stored to
+    a persistent NotFoundCache and not requested from that index again
+    for not_found_ttl seconds.
+
+    In the offline mode the candidates and the hashes are taken only
+    from the persistent caches and local find links and indexes, and
+    only local requirements are prepared for getting their
+    dependencies.  Anything else raises OfflineCacheMiss.
+
+    The dependencies of pinned requirements are read from the core
+    metadata files advertised by the index (PEP 658), when available,
+    or from remote wheels with range requests, before falling back to
+    preparing the requirements with pip.
     """
-    def __init__(self, pip_options, session):
+    DEFAULT_INDEX_URL = PyPI.simple_url
+
+    #: Maximum number of concurrent downloads from a single host
+    max_downloads_per_host = 4
+
+    def __init__(self, pip_options, session, fetch_jobs=1, build_jobs=1,
+                 candidate_ttl=None, hash_jobs=1, offline=False,
+                 not_found_ttl=None):
         self.session = session
         self.pip_options = pip_options
+        self.offline = offline
+        self.fetch_jobs = fetch_jobs
+        self.build_jobs = build_jobs
+        self.hash_jobs = hash_jobs
 
         index_urls = [pip_options.index_url] + pip_options.extra_index_urls
         if pip_options.no_index:
@@ -53,32 +111,79 @@ class PyPIRepository(BaseRepository):
         if pkg_resources.parse_version(pip.__version__) < pkg_resources.parse_version('19.0'):
             finder_kwargs["process_dependency_links"] = pip_options.process_dependency_links
 
+        self._finder_kwargs = finder_kwargs
         self.finder = create_package_finder(**finder_kwargs)
         assert isinstance(self.finder, PackageFinder)
 
+        self.candidate_cache = None
+        if candidate_ttl is not None or offline:
+            self.candidate_cache = CandidateCache(
+                session, ttl=candidate_ttl or 0,
+                format_control=self.finder.format_control)
+        self.not_found_cache = None
+        if not_found_ttl is not None:
+            self.not_found_cache = NotFoundCache(ttl=not_found_ttl)
+        self._index_finders = None
+        self.find_links_index = FindLinksIndex()
+        self.hash_cache = HashCache(session)
+        self.sdist_metadata_cache = SdistMetadataCache()
+        _ensure_connection_pool_size(session, max(
+            fetch_jobs * (len(index_urls) + 1), hash_jobs))
+        self._host_semaphores = {}
+        self._host_semaphores_lock = threading.Lock()
+
+        # Pip is not thread-safe, e.g. it uses environment variables
+        # and global log handlers, so prepare one requirement at a time
+        self._prepare_lock = threading.Lock()
+
+        # Metadata file attributes of the links in the fetched index
+        # pages by link URL, see _record_metadata_file_attributes
+        self._metadata_file_attributes = {}
+        session.hooks['response'].append(self._record_metadata_file_attributes)
+
+        # URLs of the pages responded with 404, see _record_not_found_page
+        self._not_found_pages = set()
+        session.hooks['response'].append(self._record_not_found_page)
+
         # Caches
         # stores project_name => InstallationCandidate mappings for all
         # versions reported by PyPI, so we only have to ask once for each
         # project
         self._available_candidates_cache = {}
 
-        # stores InstallRequirement => list(InstallRequirement) mappings
-        # of all secondary dependencies for the given requirement, so we
-        # only have to go to disk once for each requirement
+        # stores id(candidate list) => (candidate list, CandidateIndex)
+        # mappings, so that the candidates are sorted once per project
+        self._candidate_indexes = {}
+        self._candidate_evaluators = {}
+
+        # stores prepare key => list(InstallRequirement) mappings of all
+        # secondary dependencies for the given requirement, so we only
+        # have to prepare each requirement once, see _get_prepare_key
         self._dependencies_cache = {}
 
+        # URLs of links given to requirements by get_many_dependencies,
+        # which are known to be links of the best candidates
+        self._candidate_link_urls = set()
+
         # Setup file paths
         self.freshen_build_caches()
         self._download_dir = fs_str(os.path.join(CACHE_DIR, 'pkgs'))
         self._wheel_download_dir = fs_str(os.path.join(CACHE_DIR, 'wheels'))
 
-    def freshen_build_caches(self):
+    def freshen_build_caches(self, root_dir=None):
         """
         Start with fresh build/source caches.  Will remove any old build
         caches from disk automatically.
+
+        Each requirement is prepared in its own subdirectory of the
+        caches, see _get_build_dirs, so different versions of a package
+        can be prepared without starting with fresh caches.
+
+        :param root_dir: Directory to create the caches in, or None for
+          the default temporary directory
         """
-        self._build_dir = TemporaryDirectory(fs_str('build'))
-        self._source_dir = TemporaryDirectory(fs_str('source'))
+        self._build_dir = TemporaryDirectory(fs_str('build'), dir=root_dir)
+        self._source_dir = TemporaryDirectory(fs_str('source'), dir=root_dir)
 
     @property
     def build_dir(self):
@@ -94,10 +199,240 @@ class PyPIRepository(BaseRepository):
 
     def find_all_candidates(self, req_name):
         if req_name not in self._available_candidates_cache:
-            candidates = self.finder.find_all_candidates(req_name)
-            self._available_candidates_cache[req_name] = candidates
+            if self.offline:
+                self._available_candidates_cache.update(
+                    self._get_offline_candidates([req_name]))
+            else:
+                candidates = self._fetch_candidates(req_name)
+                self._available_candidates_cache[req_name] = candidates
+                self._flush_not_found_cache()
         return self._available_candidates_cache[req_name]
 
+    def _get_offline_candidates(self, names):
+        """
+        Get candidates of projects without network access.
+
+        The candidates are found from the local find links and indexes,
+        which need no network access, and from the stored candidates of
+        the remote indexes.
+
+        :raises OfflineCacheMiss:
+          if the candidates of any of the projects are not stored for
+          some remote index, which is not known to miss the project, or
+          they would be in a remote find links page
+        :rtype: dict[str,list[InstallationCandidate]]
+        """
+        index_finders = self._get_index_finders()
+        remote_find_links = [
+            x for x in self.finder.find_links if not _is_local_location(x)]
+        result = {}
+        missing = []
+        for name in names:
+            candidates = self._find_find_links_candidates(name)
+            missing.extend(
+                'candidates of {} from {}'.format(name, url)
+                for url in remote_find_links)
+            for (index_url, finder) in index_finders:
+                if _is_local_location(index_url):
+                    candidates.extend(self._find_candidates_with(finder, name))
+                    continue
+                if self.not_found_cache and self.not_found_cache.is_missing(index_url, name):
+                    continue
+                stored = self.candidate_cache.get_stored_candidates(index_url, name)
+                if stored is None:
+                    missing.append('candidates of {} from {}'.format(name, index_url))
+                else:
+                    candidates.extend(stored)
+            result[name] = candidates
+        if missing:
+            raise OfflineCacheMiss(missing)
+        return result
+
+    def _fetch_candidates(self, req_name, primary_candidates=None):
+        """
+        Fetch candidates of a project from the find links and indexes.
+
+        If there are several sources and fetch_jobs is greater than one,
+        the sources are queried concurrently.  The candidates are
+        merged in the order of the sources (find links first, then the
+        indexes in their configured order) as pip would do.
+
+        :param primary_candidates:
+          candidates to use instead of the ones of the first index,
+          e.g. as found from a JSON API of the index
+        """
+        find_links = self.finder.find_links
+        source_count = bool(find_links) + len(set(self.finder.index_urls))
+        has_directories = any(get_local_directory(x) for x in find_links)
+        has_caches = self.candidate_cache or self.not_found_cache
+        if (primary_candidates is None and
+                not has_caches and not has_directories and
+                (self.fetch_jobs <= 1 or source_count <= 1)):
+            return self._find_candidates_with(self.finder, req_name)
+        fetchers = []
+        if find_links:
+            fetchers.append(self._find_find_links_candidates)
+        index_finders = self._get_index_finders()
+        if primary_candidates is not None:
+            fetchers.append(lambda name: primary_candidates)
+            index_finders = index_finders[1:]
+        for (index_url, finder) in index_finders:
+            fetchers.append(partial(self._fetch_index_candidates, index_url, finder))
+        if self.fetch_jobs <= 1 or len(fetchers) <= 1:
+            results = [fetch(req_name) for fetch in fetchers]
+        else:
+            pool = ThreadPool(
+                min(self.fetch_jobs, len(fetchers)), initializer=init_pip_log_state)
+            try:
+                results = pool.map(lambda fetch: fetch(req_name), fetchers)
+            finally:
+                pool.close()
+                pool.join()
+        return [candidate for result in results for candidate in result]
+
+    def _fetch_index_candidates(self, index_url, finder, req_name):
+        not_found_cache = self.not_found_cache
+        if not_found_cache and not_found_cache.is_missing(index_url, req_name):
+            return []
+        if self.candidate_cache is None:
+            candidates = self._find_candidates_with(finder, req_name)
+        else:
+            candidates = self.candidate_cache.get_candidates(
+                index_url, req_name, partial(self._find_candidates_with, finder))
+        page_url = get_project_page_url(index_url, req_name)
+        if not_found_cache and not candidates and (
+                get_page_key(page_url) in self._not_found_pages):
+            not_found_cache.add(page_url)
+        return candidates
+
+    def _find_candidates_with(self, finder, req_name):
+        """
+        Find candidates with a finder and mark their metadata files.
+
+        Sets the dist_info_metadata attribute of the candidate links,
+        which have a metadata file attribute in their index page.
+        """
+        candidates = finder.find_all_candidates(req_name)
+        if not self._metadata_file_attributes:
+            return candidates
+        for candidate in candidates:
+            link = _get_candidate_link(candidate)
+            attribute = self._metadata_file_attributes.get(link.url_without_fragment)
+            if attribute:
+                link.dist_info_metadata = attribute
+        return candidates
+
+    def _record_metadata_file_attributes(self, response, **kwargs):
+        """
+        Record the metadata file attributes of an index page response.
+
+        This is a response hook of the session, since the finder does
+        not keep the attributes of the links it parses.
+        """
+        content_type = response.headers.get('Content-Type', '')
+        if response.status_code != 200 or 'text/html' not in content_type:
+            return
+        content = response.content
+        if b'-metadata' not in content:
+            return
+        html = content.decode(response.encoding or 'utf-8', 'replace')
+        self._metadata_file_attributes.update(
+            parse_metadata_file_attributes(html, response.url))
+
+    def _find_find_links_candidates(self, req_name):
+        """
+        Find candidates of a project from the find links.
+
+        The local find links directories are replaced with the files
+        of the project in them, as found from the find links index, so
+        that pip does not have to list and parse all their files.
+        """
+        locations = []
+        for location in self.finder.find_links:
+            directory = get_local_directory(location)
+            if directory:
+                locations.extend(
+                    path_to_url(path) for path in
+                    self.find_links_index.get_paths(directory, req_name))
+            elif not self.offline or _is_local_location(location):
+                locations.append(location)
+        if not locations:
+            return []
+        finder = self._create_finder(find_links=locations, index_urls=[])
+        # Pip finds the file links both as files and as find links
+        return _dedup_candidates(self._find_candidates_with(finder, req_name))
+
+    def _record_not_found_page(self, response, **kwargs):
+        """
+        Record the URL of a response with status 404 Not Found.
+
+        This is a response hook of the session, since the finder just
+        skips the pages it cannot get.
+        """
+        if response.status_code == 404:
+            self._not_found_pages.add(get_page_key(response.url))
+
+    def _flush_not_found_cache(self):
+        if not self.not_found_cache:
+            return
+        self.not_found_cache.flush()
+        if self.not_found_cache.skipped_count:
+            log.debug('Skipped {} requests to indexes not having the packages'.format(
+                self.not_found_cache.skipped_count))
+            self.not_found_cache.skipped_count = 0
+
+    def _get_index_finders(self):
+        """
+        Get a separate finder for each index.
+
+        The finders follow the index URLs of the main finder, since
+        parsing a requirements file may add new ones.
+
+        :return: (index URL, finder) pairs
+        """
+        index_urls = list(dedup(self.finder.index_urls))
+        if self._index_finders and self._index_finders[0] == index_urls:
+            return self._index_finders[1]
+        result = [
+            (index_url, self._create_finder(find_links=[], index_urls=[index_url]))
+            for index_url in index_urls]
+        self._index_finders = (index_urls, result)
+        return result
+
+    def _create_finder(self, **kwargs):
+        finder = create_package_finder(**dict(self._finder_kwargs, **kwargs))
+        finder.format_control = self.finder.format_control
+        return finder
+
+    def prefetch_candidates(self, ireqs):
+        """
+        Fetch candidates of the given requirements concurrently.
+
+        Finds the candidates of all the projects, which are not yet in
+        the candidate cache, with a pool of fetch_jobs threads and
+        stores the results to the cache.
+        """
+        names = list(dedup(
+            ireq.name for ireq in ireqs
+            if not (ireq.editable or is_vcs_link(ireq))
+            and ireq.name not in self._available_candidates_cache))
+        if self.offline:
+            # Reports all the missing candidates at once
+            self._available_candidates_cache.update(
+                self._get_offline_candidates(names))
+            return
+        if self.fetch_jobs <= 1 or len(names) <= 1:
+            return
+        pool = ThreadPool(
+            min(self.fetch_jobs, len(names)), initializer=init_pip_log_state)
+        try:
+            results = pool.map(self._fetch_candidates, names)
+        finally:
+            pool.close()
+            pool.join()
+        self._available_candidates_cache.update(zip(names, results))
+        self._flush_not_found_cache()
+
     def find_best_match(self, ireq, prereleases=None):
         """
         Returns a Version object that indicates the best match for the given
@@ -106,36 +441,168 @@ class PyPIRepository(BaseRepository):
         if ireq.editable or is_vcs_link(ireq):
             return ireq  # return itself as the best match
 
+        best_candidate = self._get_best_candidate(ireq, prereleases)
+
+        # Turn the candidate into a pinned InstallRequirement
+        return make_install_requirement(
+            best_candidate.project, best_candidate.version, ireq.extras, constraint=ireq.constraint
+        )
+
+    def _get_best_candidate(self, ireq, prereleases=None):
         all_candidates = self.find_all_candidates(ireq.name)
-        candidates_by_version = lookup_table(all_candidates, key=lambda c: c.version, unique=True)
-        matching_versions = ireq.specifier.filter((candidate.version for candidate in all_candidates),
-                                                  prereleases=prereleases)
+        return self._select_best_candidate(ireq, all_candidates, prereleases)
 
-        # Reuses pip's internal candidate sort key to sort
-        matching_candidates = [candidates_by_version[ver] for ver in matching_versions]
-        if not matching_candidates:
+    def _select_best_candidate(self, ireq, all_candidates, prereleases=None):
+        candidate_index = self._get_candidate_index(ireq.name, all_candidates)
+        best_candidate = candidate_index.get_best_candidate(ireq.specifier, prereleases)
+        if best_candidate is None:
             raise NoCandidateFound(ireq, all_candidates, self.finder)
+        evaluator = self._get_candidate_evaluator(ireq.name)
+        if evaluator:
+            # Lets pip warn about a yanked candidate
+            return evaluator.get_best_candidate([best_candidate])
+        return best_candidate
 
+    def _get_candidate_index(self, req_name, all_candidates):
+        """
+        Get the candidate index of a list of candidates of a project.
+
+        The indexes are cached by the identity of the candidate list,
+        since the lists are cached too.
+
+        :rtype: CandidateIndex
+        """
+        key = id(all_candidates)
+        cached = self._candidate_indexes.get(key)
+        if cached and cached[0] is all_candidates:
+            return cached[1]
+        # Reuses pip's internal candidate sort key to sort
+        evaluator = self._get_candidate_evaluator(req_name)
+        sort_key = evaluator._sort_key if evaluator else self.finder._candidate_sort_key
+        candidate_index = CandidateIndex(all_candidates, sort_key)
+        # Keeps the list alive, so that its id is not reused
+        self._candidate_indexes[key] = (all_candidates, candidate_index)
+        return candidate_index
+
+    def _get_candidate_evaluator(self, req_name):
+        """
+        Get pip's candidate evaluator for a project.
+
+        :return: the evaluator or None with pip 19.0.3 and older
+        """
         # pip <= 19.0.3
         if hasattr(self.finder, "_candidate_sort_key"):
-            best_candidate = max(
-                matching_candidates, key=self.finder._candidate_sort_key
-            )
+            return None
         # pip == 19.1.*
-        elif hasattr(self.finder, "candidate_evaluator"):
-            evaluator = self.finder.candidate_evaluator
-            best_candidate = evaluator.get_best_candidate(matching_candidates)
+        if hasattr(self.finder, "candidate_evaluator"):
+            return self.finder.candidate_evaluator
         # pip >= 19.2
-        else:
-            evaluator = self.finder.make_candidate_evaluator(ireq.name)
-            best_candidate = evaluator.get_best_candidate(matching_candidates)
+        if req_name not in self._candidate_evaluators:
+            self._candidate_evaluators[req_name] = (
+                self.finder.make_candidate_evaluator(req_name))
+        return self._candidate_evaluators[req_name]
 
-        # Turn the candidate into a pinned InstallRequirement
-        return make_install_requirement(
-            best_candidate.project, best_candidate.version, ireq.extras, constraint=ireq.constraint
-        )
+    def get_many_dependencies(self, ireqs):
+        """
+        Get dependencies of several pinned InstallRequirements at once.
+
+        The requirements without a link are prepared in a pool of
+        build_jobs processes.  The links of their best candidates are
+        looked up in this process, so that the workers need not fetch
+        the index pages again.  Each worker process has its own
+        repository with its own build and source directories and the
+        current indexes and find links of the finder.  If a worker fails
+        to get the dependencies, they are fetched again in this process
+        to report the error properly.
+        """
+        if self.offline:
+            # The workers would look up the links from the network
+            self._check_offline_preparable(ireqs)
+            return super(PyPIRepository, self).get_many_dependencies(ireqs)
+        jobs = []
+        for (i, ireq) in enumerate(ireqs):
+            if ireq.link or _get_prepare_key(ireq) in self._dependencies_cache:
+                continue
+            link = self._get_worker_link(ireq)
+            if link:
+                jobs.append((i, (
+                    str(ireq.req), link.url,
+                    getattr(link, 'dist_info_metadata', None))))
+        if self.build_jobs <= 1 or len(jobs) <= 1:
+            return super(PyPIRepository, self).get_many_dependencies(ireqs)
+        with TemporaryDirectory(fs_str('build-jobs')) as root_dir:
+            pool = multiprocessing.Pool(
+                min(self.build_jobs, len(jobs)),
+                initializer=_init_dependency_worker,
+                initargs=(self._get_worker_pip_options(), root_dir))
+            try:
+                results = pool.map(
+                    _get_dependency_lines_in_worker, [job for (_, job) in jobs])
+            finally:
+                pool.close()
+                pool.join()
+        for ((i, _job), lines) in zip(jobs, results):
+            if lines is None:
+                log.debug('  Preparing {} in a worker failed'.format(ireqs[i]))
+                continue
+            self._dependencies_cache[_get_prepare_key(ireqs[i])] = {
+                install_req_from_line(line) for line in lines}
+        return [self.get_dependencies(ireq) for ireq in ireqs]
+
+    def _get_worker_link(self, ireq):
+        """
+        Get link of the best candidate of a requirement for a worker.
+
+        :return: the link, or None if there is no candidate
+        :rtype: pip.index.Link|None
+        """
+        try:
+            return _get_candidate_link(self._get_best_candidate(ireq))
+        except NoCandidateFound:
+            return None  # Reported when preparing in this process
+
+    def _get_worker_pip_options(self):
+        """
+        Get pip options for the repositories of the worker processes.
+
+        The indexes and the find links are taken from the finder, since
+        parsing a requirements file may have added new ones.
+        """
+        pip_options = copy.copy(self.pip_options)
+        index_urls = list(self.finder.index_urls)
+        pip_options.no_index = not index_urls
+        if index_urls:
+            pip_options.index_url = index_urls[0]
+            pip_options.extra_index_urls = index_urls[1:]
+        pip_options.find_links = list(self.finder.find_links)
+        return pip_options
 
     def _get_dependencies(self, ireq):
+        """
+        Get dependencies of a requirement, preparing it at most once.
+        """
+        key = _get_prepare_key(ireq)
+        if key not in self._dependencies_cache:
+            dependencies = self._find_dependencies(ireq)
+            self._dependencies_cache[key] = dependencies
+            # Preparing may have set the name and the link of ireq
+            self._dependencies_cache.setdefault(_get_prepare_key(ireq), dependencies)
+        return set(self._dependencies_cache[key])
+
+    def _find_dependencies(self, ireq):
+        dependencies = self._get_sdist_cache_dependencies(ireq)
+        if dependencies is not None:
+            return dependencies
+        if self.offline:
+            ireq = self._get_offline_preparable(ireq)
+        else:
+            dependencies = self._get_metadata_dependencies(ireq)
+            if dependencies is not None:
+                return dependencies
+        with self._prepare_lock:
+            return self._prepare_dependencies(ireq)
+
+    def _prepare_dependencies(self, ireq):
         wheel_cache = WheelCache(CACHE_DIR, self.pip_options.format_control)
         with collect_logs() as log_collector:
             try:
@@ -148,6 +615,159 @@ class PyPIRepository(BaseRepository):
                 if callable(getattr(wheel_cache, 'cleanup', None)):
                     wheel_cache.cleanup()
 
+    def _check_offline_preparable(self, ireqs):
+        """
+        Check that requirements can be prepared without network access.
+
+        A requirement can be prepared, if it or its best candidate is
+        a local file.  Requirements with cached sdist metadata need not
+        be prepared.
+
+        :raises OfflineCacheMiss: if some of them are not local
+        """
+        missing = [
+            'dependencies of {}'.format(format_requirement(ireq))
+            for ireq in ireqs
+            if not is_file_url(self._get_local_link(ireq)) and
+            self._get_sdist_metadata(ireq) is None]
+        if missing:
+            raise OfflineCacheMiss(missing)
+
+    def _get_offline_preparable(self, ireq):
+        """
+        Get a requirement which pip can prepare without network access.
+
+        Pip would look up the link of a requirement without one from
+        the indexes, so return a copy linked to the best candidate.
+        """
+        self._check_offline_preparable([ireq])
+        if ireq.editable or ireq.link:
+            return ireq
+        linked_ireq = copy.copy(ireq)
+        linked_ireq.link = self._get_local_link(ireq)
+        return linked_ireq
+
+    def _get_local_link(self, ireq):
+        if ireq.editable or ireq.link:
+            return ireq.link
+        return _get_candidate_link(self._get_best_candidate(ireq))
+
+    def _get_metadata_dependencies(self, ireq):
+        """
+        Get dependencies of a pinned requirement without preparing it.
+
+        If the best candidate of the requirement has a metadata file
+        in the index, reads the dependencies from it.  Otherwise, if
+        the candidate is a wheel on an HTTP server, reads its metadata
+        with range requests instead of downloading the whole wheel.
+
+        :return: the dependencies or None if not available this way
+        :rtype: set[pip.req.InstallRequirement]|None
+        """
+        if ireq.editable:
+            return None
+        if ireq.link:
+            if ireq.link.url not in self._candidate_link_urls:
+                return None
+            link = ireq.link
+        else:
+            try:
+                link = _get_candidate_link(self._get_best_candidate(ireq))
+            except NoCandidateFound:
+                return None
+        requirements = self._get_link_requirements(link, ireq.extras)
+        if requirements is None:
+            return None
+        return {install_req_from_line(str(req)) for req in requirements}
+
+    def _get_sdist_cache_dependencies(self, ireq):
+        """
+        Get dependencies of a requirement from the sdist metadata cache.
+
+        :return: the dependencies or None if the metadata is not cached
+        :rtype: set[pip.req.InstallRequirement]|None
+        """
+        metadata = self._get_sdist_metadata(ireq)
+        if metadata is None:
+            return None
+        return {
+            install_req_from_line(str(req))
+            for req in get_metadata_requirements(metadata, ireq.extras)}
+
+    def _get_sdist_metadata(self, ireq):
+        """
+        Get the cached metadata of the sdist of a requirement.
+
+        :rtype: str|None
+        """
+        if ireq.editable:
+            return None
+        link = ireq.link
+        if not link:
+            try:
+                link = _get_candidate_link(self._get_best_candidate(ireq))
+            except NoCandidateFound:
+                return None
+        sha256 = self._get_sdist_hash(link)
+        return self.sdist_metadata_cache.get(sha256) if sha256 else None
+
+    def _store_sdist_metadata(self, ireq):
+        """
+        Store the metadata of a prepared sdist to the sdist metadata cache.
+        """
+        if ireq.editable or not ireq.link:
+            return
+        try:
+            sha256 = self._get_sdist_hash(ireq.link)
+            if sha256:
+                self.sdist_metadata_cache.store(
+                    sha256, get_distribution_metadata(ireq.get_dist()))
+        except Exception as error:
+            log.debug('  Cannot store metadata of {}: {}'.format(
+                ireq.link.filename, error))
+
+    def _get_sdist_hash(self, link):
+        """
+        Get SHA256 hash of an sdist without downloading it.
+
+        The hash is taken from the link fragment or the hash cache, or
+        computed from the local file of the link or its downloaded copy.
+
+        :type link: pip.index.Link
+        :return: hex digest of the hash, or None if not an sdist or unknown
+        :rtype: str|None
+        """
+        link = Link(link.url)  # Use only the URL of the given link object
+        if not link.is_artifact or not link.filename.endswith(SDIST_EXTENSIONS):
+            return None
+        file_hash = _get_fragment_hash(link)
+        if not file_hash and not is_file_url(link):
+            file_hash = self.hash_cache.get_stored_hash(link)
+            downloaded = os.path.join(self._download_dir, link.filename)
+            if not file_hash and os.path.exists(downloaded):
+                link = Link(path_to_url(downloaded))
+        if not file_hash and is_file_url(link):
+            file_hash = self.hash_cache.get_hash(link, self._get_file_hash)
+        return file_hash.split(':', 1)[1] if file_hash else None
+
+    def _get_link_requirements(self, link, extras):
+        url = link.url_without_fragment
+        if getattr(link, 'dist_info_metadata', None):
+            try:
+                return get_metadata_file_requirements(
+                    self.session, url, link.dist_info_metadata, extras)
+            except Exception as error:
+                log.debug('  Cannot use metadata file of {}: {}'.format(
+                    link.filename, error))
+        scheme = urllib_parse.urlsplit(url).scheme
+        if scheme in ('http', 'https') and link.ext == '.whl':
+            try:
+                return get_wheel_requirements(self.session, url, extras)
+            except Exception as error:
+                log.debug('  Cannot read metadata of {} with ranges: {}'.format(
+                    link.filename, error))
+        return None
+
     def _get_dependencies_with_wheel_cache(self, ireq, wheel_cache):
         """
         :type ireq: pip.req.InstallRequirement
@@ -164,116 +784,296 @@ class PyPIRepository(BaseRepository):
                 os.environ['PIP_REQ_TRACKER'] = old_env
 
     def _get_dependencies_with_req_tracker(self, ireq, wheel_cache, req_tracker):
-        deps = self._dependencies_cache.get(getattr(ireq.link, 'url', None))
-        if not deps:
-            if ireq.editable and (ireq.source_dir and os.path.exists(ireq.source_dir)):
-                # No download_dir for locally available editable requirements.
-                # If a download_dir is passed, pip will  unnecessarely
-                # archive the entire source directory
-                download_dir = None
-            elif ireq.link and not ireq.link.is_artifact:
-                # No download_dir for VCS sources.  This also works around pip
-                # using git-checkout-index, which gets rid of the .git dir.
-                download_dir = None
-            else:
-                download_dir = self._download_dir
-                if not os.path.isdir(download_dir):
-                    os.makedirs(download_dir)
-            if not os.path.isdir(self._wheel_download_dir):
-                os.makedirs(self._wheel_download_dir)
-
-            if not RequirementPreparer:
-                # Pip < 9 and below
-                reqset = RequirementSet(
-                    self.build_dir,
-                    self.source_dir,
-                    download_dir=download_dir,
-                    wheel_download_dir=self._wheel_download_dir,
-                    session=self.session,
-                    ignore_installed=True,
-                    wheel_cache=wheel_cache,
-                )
-                deps = reqset._prepare_file(
-                    self.finder,
-                    ireq
-                )
-            else:
-                # Pip >= 10 (new resolver!)
-                preparer_kwargs = dict(
-                    build_dir=self.build_dir,
-                    src_dir=self.source_dir,
-                    download_dir=download_dir,
-                    wheel_download_dir=self._wheel_download_dir,
-                    progress_bar='off',
-                    build_isolation=False
-                )
-                if req_tracker:
-                    preparer_kwargs['req_tracker'] = req_tracker
-                preparer = RequirementPreparer(**preparer_kwargs)
-                reqset = RequirementSet()
-                ireq.is_direct = True
-                reqset.add_requirement(ireq)
-                self.resolver = Resolver(
-                    preparer=preparer,
-                    finder=self.finder,
-                    session=self.session,
-                    upgrade_strategy="to-satisfy-only",
-                    force_reinstall=False,
-                    ignore_dependencies=False,
-                    ignore_requires_python=False,
-                    ignore_installed=True,
-                    isolated=False,
-                    wheel_cache=wheel_cache,
-                    use_user_site=False,
-                )
-                self.resolver.require_hashes = False
-                deps = self.resolver._resolve_one(reqset, ireq)
-            assert ireq.link.url
-            self._dependencies_cache[ireq.link.url] = deps
-            reqset.cleanup_files()
+        (build_dir, source_dir) = self._get_build_dirs(ireq)
+        if ireq.editable and (ireq.source_dir and os.path.exists(ireq.source_dir)):
+            # No download_dir for locally available editable requirements.
+            # If a download_dir is passed, pip will  unnecessarely
+            # archive the entire source directory
+            download_dir = None
+        elif ireq.link and not ireq.link.is_artifact:
+            # No download_dir for VCS sources.  This also works around pip
+            # using git-checkout-index, which gets rid of the .git dir.
+            download_dir = None
+        else:
+            download_dir = self._download_dir
+            if not os.path.isdir(download_dir):
+                os.makedirs(download_dir)
+        if not os.path.isdir(self._wheel_download_dir):
+            os.makedirs(self._wheel_download_dir)
+
+        if not RequirementPreparer:
+            # Pip < 9 and below
+            reqset = RequirementSet(
+                build_dir,
+                source_dir,
+                download_dir=download_dir,
+                wheel_download_dir=self._wheel_download_dir,
+                session=self.session,
+                ignore_installed=True,
+                wheel_cache=wheel_cache,
+            )
+            deps = reqset._prepare_file(
+                self.finder,
+                ireq
+            )
+        else:
+            # Pip >= 10 (new resolver!)
+            preparer_kwargs = dict(
+                build_dir=build_dir,
+                src_dir=source_dir,
+                download_dir=download_dir,
+                wheel_download_dir=self._wheel_download_dir,
+                progress_bar='off',
+                build_isolation=False
+            )
+            if req_tracker:
+                preparer_kwargs['req_tracker'] = req_tracker
+            preparer = RequirementPreparer(**preparer_kwargs)
+            reqset = RequirementSet()
+            ireq.is_direct = True
+            reqset.add_requirement(ireq)
+            self.resolver = Resolver(
+                preparer=preparer,
+                finder=self.finder,
+                session=self.session,
+                upgrade_strategy="to-satisfy-only",
+                force_reinstall=False,
+                ignore_dependencies=False,
+                ignore_requires_python=False,
+                ignore_installed=True,
+                isolated=False,
+                wheel_cache=wheel_cache,
+                use_user_site=False,
+            )
+            self.resolver.require_hashes = False
+            deps = self.resolver._resolve_one(reqset, ireq)
+        self._store_sdist_metadata(ireq)
+        reqset.cleanup_files()
         return set(deps)
 
+    def _get_build_dirs(self, ireq):
+        """
+        Get the build and source directories for preparing a requirement.
+
+        The directories are subdirectories of the build/source caches
+        named by the prepare key of the requirement, so that preparing
+        another version of the same package never finds an existing
+        build directory of the package.
+
+        :return: build and source directory paths
+        :rtype: (str, str)
+        """
+        key = _get_prepare_key(ireq)
+        key_hash = hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+        name = '{}-{}'.format(key[0] or 'unnamed', key_hash[:16])
+        return (fs_str(os.path.join(self.build_dir, name)),
+                fs_str(os.path.join(self.source_dir, name)))
+
     def get_hashes(self, ireq):
         """
         Given an InstallRequirement, return a set of hashes that represent all
         of the files for a given requirement. Editable requirements return an
         empty set. Unpinned requirements raise a TypeError.
         """
-        if ireq.editable:
-            return set()
+        return self.get_many_hashes([ireq])[ireq]
 
-        check_is_hashable(ireq)
+    def get_many_hashes(self, ireqs):
+        """
+        Get hashes of several pinned InstallRequirements at once.
 
-        if ireq.link and ireq.link.is_artifact:
-            return {self._get_file_hash(ireq.link)}
+        The hashes are taken from the link fragments or from the hash
+        cache when possible.  Otherwise the files are downloaded and
+        hashed in a pool of hash_jobs threads, with at most
+        max_downloads_per_host concurrent downloads from each host.
+        """
+        start_time = time.time()
+        links_by_ireq = {}
+        for ireq in ireqs:
+            if ireq.editable:
+                links_by_ireq[ireq] = []
+                continue
+            check_is_hashable(ireq)
+            if ireq.link and ireq.link.is_artifact:
+                links_by_ireq[ireq] = [ireq.link]
+            else:
+                links_by_ireq[ireq] = self._get_matching_links(ireq)
 
-        # We need to get all of the candidates that match our current version
-        # pin, these will represent all of the files that could possibly
-        # satisfy this constraint.
-        all_candidates = self.find_all_candidates(ireq.name)
-        candidates_by_version = lookup_table(all_candidates, key=lambda c: c.version)
-        matching_versions = list(
-            ireq.specifier.filter((candidate.version for candidate in all_candidates)))
-        matching_candidates = candidates_by_version[matching_versions[0]]
+        links = list(dedup(
+            link for ireq_links in links_by_ireq.values() for link in ireq_links))
+        downloaded = []
 
-        def get_candidate_link(candidate):
-            if hasattr(candidate, "link"):
-                return candidate.link
-            return candidate.location
+        def get_link_hash(link):
+            if self.offline and not is_file_url(link):
+                return _get_fragment_hash(link) or self.hash_cache.get_stored_hash(link)
+            return _get_fragment_hash(link) or self._get_cached_hash(link, downloaded)
 
+        if self.hash_jobs <= 1 or len(links) <= 1:
+            link_hashes = [get_link_hash(link) for link in links]
+        else:
+            pool = ThreadPool(min(self.hash_jobs, len(links)))
+            try:
+                link_hashes = pool.map(get_link_hash, links)
+            finally:
+                pool.close()
+                pool.join()
+        self.hash_cache.flush()
+        missing = [
+            'hash of {}'.format(link.url_without_fragment)
+            for (link, link_hash) in zip(links, link_hashes) if not link_hash]
+        if missing:
+            raise OfflineCacheMiss(missing)
+
+        hash_by_url = {link.url: link_hash for (link, link_hash) in zip(links, link_hashes)}
+        log.debug('Got {} hashes of {} packages in {:.2f} seconds ({} files downloaded)'.format(
+            len(links), len(links_by_ireq), time.time() - start_time, len(downloaded)))
         return {
-            self._get_file_hash(get_candidate_link(candidate))
-            for candidate in matching_candidates
+            ireq: {hash_by_url[link.url] for link in ireq_links}
+            for (ireq, ireq_links) in links_by_ireq.items()
         }
 
+    def _get_cached_hash(self, link, downloaded):
+        def download_and_hash(link):
+            downloaded.append(link)
+            return self._get_file_hash(link)
+
+        host = urllib_parse.urlsplit(link.url).netloc
+        with self._get_host_semaphore(host):
+            return self.hash_cache.get_hash(link, download_and_hash)
+
+    def _get_host_semaphore(self, host):
+        with self._host_semaphores_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(
+                    self.max_downloads_per_host)
+            return self._host_semaphores[host]
+
+    def _get_matching_links(self, ireq):
+        # We need to get all of the candidates that match our current version
+        # pin, these will represent all of the files that could possibly
+        # satisfy this constraint.
+        all_candidates = self.find_all_candidates(ireq.name)
+        candidate_index = self._get_candidate_index(ireq.name, all_candidates)
+        matching_versions = list(ireq.specifier.filter(candidate_index.versions))
+        matching_candidates = candidate_index.candidates_by_version[matching_versions[0]]
+        return [_get_candidate_link(candidate) for candidate in matching_candidates]
+
     def _get_file_hash(self, location):
         h = hashlib.new(FAVORITE_HASH)
         with open_local_or_remote_file(location, self.session) as fp:
-            for chunk in iter(lambda: fp.read(8096), b""):
-                h.update(chunk)
+            if is_file_url(location) and os.fstat(fp.fileno()).st_size:
+                mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    h.update(mapped)
+                finally:
+                    mapped.close()
+            else:
+                for chunk in iter(lambda: fp.read(HASH_BUFFER_SIZE), b""):
+                    h.update(chunk)
         return ":".join([FAVORITE_HASH, h.hexdigest()])
 
 
+def _is_local_location(location):
+    return urllib_parse.urlsplit(location).scheme not in ('http', 'https')
+
+
+def _ensure_connection_pool_size(session, size):
+    """
+    Make the connection pools of the session hold at least size
+    connections per host.
+
+    Otherwise connections of concurrent requests to the same host are
+    discarded instead of kept alive for reuse.
+    """
+    for adapter in set(session.adapters.values()):
+        if getattr(adapter, '_pool_maxsize', size) < size:
+            adapter.init_poolmanager(
+                adapter._pool_connections, size, block=adapter._pool_block)
+
+
+def _get_prepare_key(ireq):
+    """
+    Get key identifying the prepared form of a requirement.
+
+    The key consists of the name and the version of the requirement,
+    when known, a hash of its link, if it has one, and its extras, since
+    they affect the dependencies.
+
+    :rtype: tuple
+    """
+    name = normalize_req_name(ireq.name) if ireq.name else ''
+    version = get_ireq_version(ireq) if is_pinned_requirement(ireq) else ''
+    link_hash = (
+        hashlib.sha256(ireq.link.url.encode('utf-8')).hexdigest()
+        if ireq.link else '')
+    return (name, version, link_hash, tuple(sorted(ireq.extras)))
+
+
+def _dedup_candidates(candidates):
+    seen_urls = set()
+    result = []
+    for candidate in candidates:
+        url = _get_candidate_link(candidate).url
+        if url not in seen_urls:
+            seen_urls.add(url)
+            result.append(candidate)
+    return result
+
+
+def _get_candidate_link(candidate):
+    if hasattr(candidate, "link"):
+        return candidate.link
+    return candidate.location
+
+
+def _get_fragment_hash(link):
+    """
+    Get hash of the favorite algorithm from the fragment of a link.
+
+    :type link: pip.index.Link
+    :rtype: str|None
+    """
+    if link.hash_name == FAVORITE_HASH and link.hash:
+        return ':'.join([FAVORITE_HASH, link.hash])
+    return None
+
+
+#: Repository of a dependency worker process, see get_many_dependencies
+_worker_repository = None
+
+
+def _init_dependency_worker(pip_options, root_dir):
+    global _worker_repository
+    # Imported here, since the scripts package imports the repositories
+    from ..scripts._repo import get_pip_command
+    session = get_pip_command()._build_session(pip_options)
+    _worker_repository = PyPIRepository(pip_options, session)
+    _worker_repository.freshen_build_caches(root_dir)
+
+
+def _get_dependency_lines_in_worker(job):
+    """
+    Get dependencies of a requirement in a worker process.
+
+    :param job:
+      the requirement line, the URL of its best candidate and the
+      metadata file attribute of the candidate link
+    :type job: (str, str, str|None)
+    :return: the dependencies as requirement lines or None on failure
+    :rtype: list[str]|None
+    """
+    (line, url, dist_info_metadata) = job
+    try:
+        ireq = install_req_from_line(line)
+        ireq.link = Link(url)
+        if dist_info_metadata:
+            ireq.link.dist_info_metadata = dist_info_metadata
+        _worker_repository._candidate_link_urls.add(url)
+        dependencies = _worker_repository.get_dependencies(ireq)
+    except Exception:
+        return None
+    return [str(dependency.req) for dependency in dependencies]
+
+
 @contextmanager
 def open_local_or_remote_file(link, session):
     """
@@ -4,6 +4,8 @@ from __future__ import (
 
 import copy
 import os
+import threading
+from contextlib import contextmanager
 from functools import partial
 from itertools import chain, count
 
@@ -19,6 +21,30 @@ from .utils import (
 green = partial(click.style, fg='green')
 magenta = partial(click.style, fg='magenta')
 
+_exists_action_lock = threading.Lock()
+_exists_action_users = [0]
+
+
+@contextmanager
+def _ignoring_existing_packages():
+    """
+    Make pip ignore existing packages within the context.
+
+    Pip is told this with an environment variable, which is shared by
+    all threads, so it is kept set while any thread is in the context.
+    """
+    with _exists_action_lock:
+        _exists_action_users[0] += 1
+        # NOTE: str() wrapping necessary for Python 2/3 compat
+        os.environ[str('PIP_EXISTS_ACTION')] = str('i')
+    try:
+        yield
+    finally:
+        with _exists_action_lock:
+            _exists_action_users[0] -= 1
+            if not _exists_action_users[0]:
+                del os.environ[str('PIP_EXISTS_ACTION')]
+
 
 class RequirementSummary(object):
     """
@@ -41,11 +67,25 @@ class RequirementSummary(object):
 
 
 class Resolver(object):
-    def __init__(self, constraints, repository, cache=None, prereleases=False, clear_caches=False, allow_unsafe=False):
+    def __init__(self, constraints, repository, cache=None, prereleases=False, clear_caches=False, allow_unsafe=False,
+                 incremental=False, settled_packages=None):
         """
         This class resolves a given set of constraints (a collection of
         InstallRequirement objects) by consulting the given Repository and the
         DependencyCache.
+
+        If incremental is true, the best match and dependencies of each
+        package are only re-evaluated in rounds where the combined
+        constraint of that package has changed.  The result is the same
+        as with the non-incremental resolving.
+
+        The settled_packages can be the result of get_settled_packages
+        of a previous resolution, e.g. of the base requirements, whose
+        result is used as constraints of this one.  Packages which are
+        pinned (or editable) to the same version as in there are taken
+        as settled: they are neither prepared nor looked up from the
+        repository or the cache, but their dependencies are taken from
+        settled_packages.
         """
         self.our_constraints = set(x for x in constraints if not x.constraint)
         self.limiters = set(x for x in constraints if x.constraint)
@@ -58,6 +98,17 @@ class Resolver(object):
         self.clear_caches = clear_caches
         self.allow_unsafe = allow_unsafe
         self.unsafe_constraints = set()
+        self.incremental = incremental
+        #: Number of package evaluations done in the rounds
+        self.evaluation_count = 0
+        #: Number of package evaluations skipped by the incremental mode
+        self.skipped_evaluation_count = 0
+        # Evaluated packages: key -> (signature, best_match, dependencies)
+        self._evaluated = {}
+        # Settled packages: key -> (signature, dependency strings)
+        self._settled = dict(settled_packages or {})
+        # Packages of the last round: key -> (signature, dependency strings)
+        self._round_packages = {}
         self._prepare_ireqs(self.our_constraints)
         self._prepare_ireqs(self.limiters)
 
@@ -68,10 +119,11 @@ class Resolver(object):
         :type constraints: Iterable[pip.req.InstallRequirement]
         """
         for constraint in constraints:
+            if constraint.req and self._get_settled_dependencies(constraint) is not None:
+                continue
             if constraint.link and not constraint.prepared:
-                os.environ[str('PIP_EXISTS_ACTION')] = str('i')
-                self.repository.prepare_ireq(constraint)
-                del os.environ[str('PIP_EXISTS_ACTION')]
+                with _ignoring_existing_packages():
+                    self.repository.prepare_ireq(constraint)
 
     @property
     def constraints(self):
@@ -83,7 +135,7 @@ class Resolver(object):
         """
         Finds acceptable hashes for all of the given InstallRequirements.
         """
-        return {ireq: self.repository.get_hashes(ireq) for ireq in ireqs}
+        return self.repository.get_many_hashes(ireqs)
 
     def resolve(self, max_rounds=10):
         """
@@ -107,31 +159,28 @@ class Resolver(object):
             log.debug('  {}'.format(constraint))
 
         # Ignore existing packages
-        os.environ[str('PIP_EXISTS_ACTION')] = str('i')  # NOTE: str() wrapping necessary for Python 2/3 compat
-        for current_round in count(start=1):
-            if current_round > max_rounds:
-                raise RuntimeError('No stable configuration of concrete packages '
-                                   'could be found for the given constraints after '
-                                   '%d rounds of resolving.\n'
-                                   'This is likely a bug.' % max_rounds)
-
-            log.debug('')
-            log.debug(magenta('{:^60}'.format('ROUND {}'.format(current_round))))
-            has_changed, best_matches = self._resolve_one_round()
-            log.debug('-' * 60)
-            log.debug('Result of round {}: {}'.format(current_round,
-                                                      'not stable' if has_changed else 'stable, done'))
-            if not has_changed:
-                break
-
-            # If a package version (foo==2.0) was built in a previous round,
-            # and in this round a different version of foo needs to be built
-            # (i.e. foo==1.0), the directory will exist already, which will
-            # cause a pip build failure.  The trick is to start with a new
-            # build cache dir for every round, so this can never happen.
-            self.repository.freshen_build_caches()
-
-        del os.environ['PIP_EXISTS_ACTION']
+        with _ignoring_existing_packages():
+            for current_round in count(start=1):
+                if current_round > max_rounds:
+                    raise RuntimeError('No stable configuration of concrete packages '
+                                       'could be found for the given constraints after '
+                                       '%d rounds of resolving.\n'
+                                       'This is likely a bug.' % max_rounds)
+
+                log.debug('')
+                log.debug(magenta('{:^60}'.format('ROUND {}'.format(current_round))))
+                has_changed, best_matches = self._resolve_one_round()
+                log.debug('-' * 60)
+                log.debug('Result of round {}: {}'.format(current_round,
+                                                          'not stable' if has_changed else 'stable, done'))
+                if not has_changed:
+                    break
+
+        self.dependency_cache.flush()
+        if self.incremental:
+            log.debug('Skipped {} of {} package evaluations'.format(
+                self.skipped_evaluation_count,
+                self.evaluation_count + self.skipped_evaluation_count))
         # Only include hard requirements and not pip constraints
         return {req for req in best_matches if not req.constraint}
 
@@ -207,15 +256,29 @@ class Resolver(object):
 
         log.debug('')
         log.debug('Finding the best candidates:')
-        best_matches = {self.get_best_match(ireq) for ireq in constraints}
+        self.repository.prefetch_candidates([
+            ireq for ireq in constraints
+            if not (ireq.editable or is_vcs_link(ireq) or is_pinned_requirement(ireq))])
+        evaluations = [self._evaluate(ireq) for ireq in constraints]
+        best_matches = {best_match for (_, best_match, _) in evaluations}
 
         # Find the new set of secondary dependencies
         log.debug('')
         log.debug('Finding secondary dependencies:')
+        self._cache_dependencies(
+            best_match for (_, best_match, dependencies) in evaluations
+            if dependencies is None)
 
         safe_constraints = list(self.limiters)
-        for best_match in best_matches:
-            for dep in self._iter_dependencies(best_match):
+        self._round_packages = {}
+        for (ireq, best_match, dependencies) in evaluations:
+            if dependencies is None:
+                dependencies = list(self._get_dependencies(ireq, best_match))
+            signature = self._get_settled_signature(best_match)
+            if signature is not None:
+                self._round_packages[key_from_ireq(best_match)] = (
+                    signature, sorted(str(dep.req) for dep in dependencies))
+            for dep in dependencies:
                 if self.allow_unsafe or dep.name not in UNSAFE_PACKAGES:
                     safe_constraints.append(dep)
                 else:
@@ -255,6 +318,143 @@ class Resolver(object):
         self.unsafe_constraints = unsafe_constraints
         return has_changed, best_matches
 
+    def get_settled_packages(self):
+        """
+        Get the packages settled by the resolution.
+
+        :return: settled packages for the settled_packages argument
+          of another Resolver
+        :rtype: dict
+        """
+        return dict(self._round_packages)
+
+    def _evaluate(self, ireq):
+        """
+        Get the best match and the dependencies of a combined constraint.
+
+        :type ireq: InstallRequirement
+        :rtype: (InstallRequirement, InstallRequirement,
+                 list[InstallRequirement]|None)
+        """
+        dependency_strings = self._get_settled_dependencies(ireq)
+        if dependency_strings is not None:
+            log.debug('  reusing settled {} (constraint was {})'.format(
+                format_requirement(ireq), format_specifier(ireq)))
+            if ireq not in self.dependency_cache:
+                self.dependency_cache[ireq] = dependency_strings
+            return (ireq, ireq, [
+                install_req_from_line(dependency_string, constraint=ireq.constraint)
+                for dependency_string in dependency_strings])
+        if self.incremental:
+            return self._evaluate_incrementally(ireq)
+        return (ireq, self.get_best_match(ireq), None)
+
+    def _get_settled_dependencies(self, ireq):
+        """
+        Get the dependencies of a settled package.
+
+        :type ireq: InstallRequirement
+        :return: dependency strings, or None if ireq is not settled
+        :rtype: list[str]|None
+        """
+        settled = self._settled.get(key_from_ireq(ireq))
+        if settled is None:
+            return None
+        (signature, dependency_strings) = settled
+        if self._get_settled_signature(ireq) != signature:
+            return None
+        return list(dependency_strings)
+
+    @staticmethod
+    def _get_settled_signature(ireq):
+        if ireq.editable or is_vcs_link(ireq):
+            return (str(ireq.link), bool(ireq.editable), sorted(ireq.extras))
+        if is_pinned_requirement(ireq):
+            return (get_pinned_version(ireq), False, sorted(ireq.extras))
+        return None
+
+    def _evaluate_incrementally(self, ireq):
+        """
+        Get the best match and the dependencies of a combined constraint.
+
+        The previous evaluation of the same package is reused, if its
+        combined constraint has not changed since.  Otherwise the best
+        match is searched again and None is returned as the
+        dependencies, which are then collected by _get_dependencies.
+
+        :type ireq: InstallRequirement
+        :rtype: (InstallRequirement, InstallRequirement,
+                 list[InstallRequirement]|None)
+        """
+        evaluated = self._evaluated.get(key_from_ireq(ireq))
+        if evaluated and evaluated[0] == self._get_signature(ireq):
+            (_, best_match, dependencies) = evaluated
+            self.skipped_evaluation_count += 1
+            log.debug('  reusing candidate {} (constraint was {})'.format(
+                format_requirement(best_match), format_specifier(ireq)))
+            return (ireq, best_match, dependencies)
+
+        self.evaluation_count += 1
+        return (ireq, self.get_best_match(ireq), None)
+
+    @staticmethod
+    def _get_signature(ireq):
+        return (str(RequirementSummary(ireq)), str(ireq.link), ireq.editable)
+
+    def _get_dependencies(self, ireq, best_match):
+        """
+        Get the dependencies of the best match of a combined constraint.
+
+        In the incremental mode the dependencies are collected to a list,
+        which is stored for the later rounds.
+
+        :type ireq: InstallRequirement
+        :type best_match: InstallRequirement
+        :rtype: Iterable[InstallRequirement]
+        """
+        if not self.incremental:
+            return self._iter_dependencies(best_match)
+
+        # Preparing a requirement sets its link.  Collect dependencies
+        # via a copy, so that the reused best match stays the same as
+        # a freshly found one would be.
+        is_exception = best_match.editable or is_vcs_link(best_match)
+        dependencies = list(self._iter_dependencies(
+            best_match if is_exception else copy.deepcopy(best_match)))
+        self._evaluated[key_from_ireq(ireq)] = (
+            self._get_signature(ireq), best_match, dependencies)
+        return dependencies
+
+    def _cache_dependencies(self, best_matches):
+        """
+        Get the dependencies of uncached best matches to the cache.
+
+        The dependencies of all pinned non-editable requirements, which
+        are missing from the dependency cache, are requested from the
+        repository at once and stored to the cache in one batch.  This
+        allows the repository to prepare the requirements in parallel.
+
+        :type best_matches: Iterable[InstallRequirement]
+        """
+        missing = {}
+        for ireq in best_matches:
+            if ireq.editable or not is_pinned_requirement(ireq):
+                continue
+            cache_key = self.dependency_cache.as_cache_key(ireq)
+            if cache_key not in missing and ireq not in self.dependency_cache:
+                missing[cache_key] = ireq
+        if len(missing) <= 1:
+            return
+
+        ireqs = sorted(missing.values(), key=key_from_ireq)
+        for ireq in ireqs:
+            log.debug('  {} not in cache, need to check index'.format(format_requirement(ireq)), fg='yellow')
+        dependency_sets = self.repository.get_many_dependencies([
+            copy.deepcopy(ireq) for ireq in ireqs])
+        self.dependency_cache.update(
+            (ireq, sorted(str(dep.req) for dep in dependencies))
+            for (ireq, dependencies) in zip(ireqs, dependency_sets))
+
     def get_best_match(self, ireq):
         """
         Returns a (pinned or editable) InstallRequirement, indicating the best
@@ -0,0 +1,155 @@
+# coding: utf-8
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import hashlib
+import json
+import os
+import time
+
+from ._pip_compat import install_req_from_line
+from .file_replacer import FileReplacer
+from .locations import CACHE_DIR
+
+#: Seconds after which an unused result is removed from the cache
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+
+
+class ResultCache(object):
+    """
+    Persistent cache of the results of compilations.
+
+    A compilation is identified by a fingerprint of everything affecting
+    its result except the contents of the package indexes, see
+    get_fingerprint.  The generated lines are stored with the names of
+    the packages in the result and a digest of their candidates to a
+    JSON file named by the fingerprint in the user cache dir, i.e.
+
+        ~/.cache/prequ/results/{fingerprint}.json
+
+    A stored result is used only while the candidates of its packages
+    stay the same, i.e. until a new version of any of them is released.
+    The results which have not been used for max_age seconds are
+    removed when storing a new result.
+    """
+    def __init__(self, cache_dir=None, max_age=DEFAULT_MAX_AGE):
+        if cache_dir is None:
+            cache_dir = os.path.join(CACHE_DIR, 'results')
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+
+    def get(self, fingerprint, get_candidates_digest):
+        """
+        Get the stored result of a compilation.
+
+        :type fingerprint: str
+        :param get_candidates_digest:
+          Function to get the current candidates digest of a list of
+          package names, e.g. a partial of get_candidates_digest
+        :return: the generated lines, or None if not stored or outdated
+        :rtype: list[str]|None
+        """
+        path = self._get_path(fingerprint)
+        entry = _read_entry(path)
+        if entry is None:
+            return None
+        if get_candidates_digest(entry['packages']) != entry['candidates']:
+            return None
+        os.utime(path, None)  # Mark as used for the pruning
+        return entry['lines']
+
+    def store(self, fingerprint, packages, candidates_digest, lines):
+        """
+        Store the result of a compilation.
+
+        :type fingerprint: str
+        :param packages: names of the packages in the result
+        :type packages: list[str]
+        :param candidates_digest: digest of the candidates of the packages
+        :type candidates_digest: str
+        :param lines: the generated lines
+        :type lines: list[str]
+        """
+        entry = {
+            'packages': sorted(packages),
+            'candidates': candidates_digest,
+            'lines': list(lines),
+        }
+        _write_entry(self._get_path(fingerprint), entry)
+        self.prune()
+
+    def prune(self):
+        """
+        Remove the results which have not been used for max_age seconds.
+        """
+        oldest_mtime = time.time() - self.max_age
+        for filename in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                if (filename.endswith('.json') and
+                        os.stat(path).st_mtime < oldest_mtime):
+                    os.remove(path)
+            except OSError:  # Removed by another process
+                pass
+
+    def _get_path(self, fingerprint):
+        return os.path.join(self.cache_dir, fingerprint + '.json')
+
+
+def get_fingerprint(data):
+    """
+    Get fingerprint of the data identifying a compilation.
+
+    >>> get_fingerprint({'a': 1, 'b': 2}) == get_fingerprint({'b': 2, 'a': 1})
+    True
+    >>> len(get_fingerprint({'a': 1}))
+    64
+
+    :param data: JSON serializable data
+    :rtype: str
+    """
+    key = json.dumps(data, sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def get_candidates_digest(repository, names):
+    """
+    Get digest of the candidates of packages in a repository.
+
+    :param repository: repository with find_all_candidates
+    :type names: list[str]
+    :rtype: str
+    """
+    repository.prefetch_candidates([install_req_from_line(x) for x in names])
+    candidates = {
+        name: sorted(
+            _get_candidate_url(candidate)
+            for candidate in repository.find_all_candidates(name))
+        for name in names}
+    return get_fingerprint(candidates)
+
+
+def _get_candidate_url(candidate):
+    link = getattr(candidate, 'link', None) or candidate.location
+    return link.url
+
+
+def _read_entry(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as fp:
+        try:
+            doc = json.loads(fp.read().decode('utf-8'))
+        except ValueError:
+            return None
+    if doc.get('__format__') != 1:
+        return None
+    return doc['entry']
+
+
+def _write_entry(path, entry):
+    doc = {'__format__': 1, 'entry': entry}
+    with FileReplacer(path) as fp:
+        fp.write(json.dumps(doc, sort_keys=True).encode('utf-8'))
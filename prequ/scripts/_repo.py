@@ -1,17 +1,69 @@
+import json
 import optparse
 
 from .._pip_compat import Command, cmdoptions
-from ..repositories import PyPIRepository
+from ..cache import DEPENDENCY_CACHE_BACKENDS
+from ..repositories import JsonApiRepository, PyPIRepository
 
 
 class PipCommand(Command):
     name = 'PipCommand'
 
 
+class SharedRepositories(object):
+    """
+    Repositories and dependency caches shared by several compilations.
+
+    Prequ compile invokes compile-in for each label.  Sharing the
+    repositories, with their pip sessions and in-memory caches, and the
+    dependency caches between the invocations avoids fetching the same
+    index pages and reading the same cache files again for each label.
+
+    The packages settled by each compilation are collected too, so that
+    the later compilations, which are constrained by the results of the
+    earlier ones, need not resolve the dependencies of those again.
+    """
+    def __init__(self):
+        self._repositories = {}
+        self._dependency_caches = {}
+
+        #: Packages settled by the compilations so far, see
+        #: prequ.resolver.Resolver.get_settled_packages
+        self.settled_packages = {}
+
+    def get_pip_options_and_pypi_repository(self, **kwargs):
+        """
+        Get pip options and repository for the given arguments.
+
+        The arguments are the same as for the module level function of
+        the same name.  The result is created once for each distinct
+        set of arguments.
+        """
+        key = json.dumps(kwargs, sort_keys=True)
+        if key not in self._repositories:
+            self._repositories[key] = get_pip_options_and_pypi_repository(
+                **kwargs)
+        return self._repositories[key]
+
+    def get_dependency_cache(self, backend):
+        """
+        Get dependency cache of the given backend.
+
+        :type backend: str
+        :rtype: prequ.cache.BaseDependencyCache
+        """
+        if backend not in self._dependency_caches:
+            self._dependency_caches[backend] = (
+                DEPENDENCY_CACHE_BACKENDS[backend]())
+        return self._dependency_caches[backend]
+
+
 def get_pip_options_and_pypi_repository(  # noqa: C901
         index_url=None, extra_index_url=None, no_index=None,
         find_links=None, cert=None, client_cert=None, pre=None,
-        trusted_host=None):
+        trusted_host=None, fetch_jobs=1, build_jobs=1,
+        candidate_ttl=None, hash_jobs=1, json_api_url=None, offline=False,
+        not_found_ttl=None):
     pip_command = get_pip_command()
 
     pip_args = []
@@ -38,7 +90,12 @@ def get_pip_options_and_pypi_repository(  # noqa: C901
     pip_options, _ = pip_command.parse_args(pip_args)
 
     session = pip_command._build_session(pip_options)
-    repository = PyPIRepository(pip_options, session)
+    repository = PyPIRepository(
+        pip_options, session, fetch_jobs=fetch_jobs, build_jobs=build_jobs,
+        candidate_ttl=candidate_ttl, hash_jobs=hash_jobs, offline=offline,
+        not_found_ttl=not_found_ttl)
+    if json_api_url and not offline:
+        repository = JsonApiRepository(json_api_url, repository)
     return (pip_options, repository)
 
 
@@ -1,6 +1,12 @@
+import os
+
 import click
 
-from . import build_wheels, compile
+from ..configuration import PrequConfiguration
+from ..exceptions import FileOutdated, PrequError
+from ..logging import log
+from ..scripts import build_wheels, compile
+from ..writer import read_input_digest
 
 click.disable_unicode_literals_warning = True
 
@@ -8,10 +14,51 @@ click.disable_unicode_literals_warning = True
 @click.command()
 @click.option('-v', '--verbose', is_flag=True, help="Show more output")
 @click.option('-s', '--silent', is_flag=True, help="Show no output")
+@click.option('-j', '--jobs', default=1, type=click.IntRange(min=1),
+              help="Number of requirement sets to compile concurrently")
+@click.option('--fast', is_flag=True,
+              help="Only compare the input digests of the generated files "
+                   "to their input, without compiling")
 @click.pass_context
-def main(ctx, verbose, silent):
+def main(ctx, verbose, silent, jobs, fast):
     """
     Check if generated requirements are up-to-date.
     """
     ctx.invoke(build_wheels.main, check=True, silent=silent)
-    ctx.invoke(compile.main, check=True, verbose=verbose, silent=silent)
+    if fast:
+        try:
+            check_input_digests(silent)
+        except PrequError as error:
+            if not silent:
+                log.error('{}'.format(error))
+            raise SystemExit(1)
+        return
+    ctx.invoke(compile.main, check=True, verbose=verbose, silent=silent,
+               jobs=jobs)
+
+
+def check_input_digests(silent=False):
+    """
+    Check the input digests of the generated requirements files.
+
+    Detects changes in the source requirements and the options since
+    the files were generated.  Does not access the package indexes, so
+    new versions of the packages are not detected.
+
+    :raises FileOutdated: if a file is missing, outdated or has no digest
+    """
+    info = log.info if not silent else (lambda x: None)
+    conf = PrequConfiguration.from_directory('.')
+    compile_opts = conf.get_prequ_compile_options()
+    for label in conf.labels:
+        output_file = conf.get_output_file_for(label)
+        if not os.path.exists(output_file):
+            raise FileOutdated('{} is missing'.format(output_file))
+        input_digest = read_input_digest(output_file)
+        if input_digest is None:
+            raise FileOutdated(
+                '{} has no input digest (set input_digest = true and '
+                'run prequ update)'.format(output_file))
+        if input_digest != conf.get_input_digest(label, compile_opts):
+            raise FileOutdated('{} is outdated'.format(output_file))
+        info('{} is OK'.format(output_file))
@@ -1,13 +1,19 @@
 import difflib
 import os
+import sys
+import threading
+from multiprocessing.pool import ThreadPool
 from tempfile import NamedTemporaryFile
 
 import click
+from pip._vendor.six import reraise
 
 from . import compile_in
+from .._pip_compat import init_pip_log_state
 from ..configuration import PrequConfiguration
 from ..exceptions import FileOutdated, PrequError
 from ..logging import log
+from ._repo import SharedRepositories
 
 click.disable_unicode_literals_warning = True
 
@@ -17,42 +23,111 @@ click.disable_unicode_literals_warning = True
 @click.option('-s', '--silent', is_flag=True, help="Show no output")
 @click.option('-c', '--check', is_flag=True,
               help="Check if the generated files are up-to-date")
+@click.option('--offline', is_flag=True,
+              help="Use only cached package information")
+@click.option('-j', '--jobs', default=1, type=click.IntRange(min=1),
+              help="Number of requirement sets to compile concurrently")
 @click.pass_context
-def main(ctx, verbose, silent, check):
+def main(ctx, verbose, silent, check, offline, jobs):
     """
     Compile requirements from source requirements.
     """
     try:
-        compile(ctx, verbose, silent, check)
+        compile(ctx, verbose, silent, check, offline, jobs)
     except PrequError as error:
         if not check or not silent:
             log.error('{}'.format(error))
         raise SystemExit(1)
 
 
-def compile(ctx, verbose, silent, check):
+def compile(ctx, verbose, silent, check, offline=False, jobs=1):
     info = log.info if not silent else (lambda x: None)
     conf_cls = PrequConfiguration if not check else CheckerPrequConfiguration
     conf = conf_cls.from_directory('.')
 
     compile_opts = dict(conf.get_prequ_compile_options())
     compile_opts.update(verbose=verbose, silent=(not verbose))
+    if offline:
+        compile_opts.update(offline=True)
     if check:
         compile_opts.update(verbose=False, silent=True)
 
+    use_input_digest = conf.uses_input_digest()
+
+    # Compile all the labels with the same repositories and caches
+    ctx.obj = SharedRepositories()
+
+    def compile_label(label):
+        if not check:
+            info('*** Compiling {}'.format(conf.get_output_file_for(label)))
+        label_opts = compile_opts
+        if use_input_digest:
+            # Computed only now, since it depends on the base output
+            label_opts = dict(compile_opts, input_digest=(
+                conf.get_input_digest(label, compile_opts)))
+        do_one_file(ctx, conf, label, label_opts)
+
+    def check_label(label):
+        if isinstance(conf, CheckerPrequConfiguration):
+            conf.check(label, info, verbose)
+
     try:
-        for label in conf.labels:
-            if not check:
-                info('*** Compiling {}'.format(
-                    conf.get_output_file_for(label)))
-            do_one_file(ctx, conf, label, compile_opts)
-            if isinstance(conf, CheckerPrequConfiguration):
-                conf.check(label, info, verbose)
+        compile_labels(conf.labels, compile_label, check_label, jobs)
     finally:
         if isinstance(conf, CheckerPrequConfiguration):
             conf.cleanup()
 
 
+def compile_labels(labels, compile_label, on_compiled, jobs=1):
+    """
+    Compile labels, the base first and then the others concurrently.
+
+    The other labels are constrained only by the output of the base, so
+    they are compiled in a pool of jobs threads once the base is done.
+    The messages logged while compiling a label are buffered and output
+    in the order of the labels, and on_compiled is called for each label
+    in that order too, so the output does not depend on the timing.
+
+    :type labels: list[str]
+    :param compile_label: function to compile a label
+    :param on_compiled: function to call after a label is compiled
+    :type jobs: int
+    """
+    first_labels = labels if jobs <= 1 else [x for x in labels if x == 'base']
+    for label in first_labels:
+        compile_label(label)
+        on_compiled(label)
+    other_labels = [x for x in labels if x not in first_labels]
+    if not other_labels:
+        return
+
+    cancelled = threading.Event()
+
+    def compile_buffered(label):
+        if cancelled.is_set():  # An earlier label failed
+            return ([], None)
+        with log.buffered() as messages:
+            try:
+                compile_label(label)
+            except BaseException:
+                return (messages, sys.exc_info())
+        return (messages, None)
+
+    pool = ThreadPool(
+        min(jobs, len(other_labels)), initializer=init_pip_log_state)
+    try:
+        results = pool.imap(compile_buffered, other_labels)
+        for (label, (messages, exc_info)) in zip(other_labels, results):
+            log.output(messages)
+            if exc_info:
+                reraise(*exc_info)
+            on_compiled(label)
+    finally:
+        cancelled.set()
+        pool.close()
+        pool.join()
+
+
 def do_one_file(ctx, conf, label, compile_opts):
     out_file = conf.get_output_file_for(label)
     content = conf.get_requirements_in_for(label).encode('utf-8')
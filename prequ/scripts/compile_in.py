@@ -2,21 +2,27 @@
 from __future__ import (
     absolute_import, division, print_function, unicode_literals)
 
+import functools
 import os
+import platform
 import sys
 import tempfile
 
 import click
 
-from .._pip_compat import Command, install_req_from_line, parse_requirements
+from .. import __version__
+from .._pip_compat import (
+    Command, install_req_from_line, parse_requirements, pip_version)
+from ..cache import DEPENDENCY_CACHE_BACKENDS
 from ..exceptions import PrequError
 from ..logging import log
 from ..repositories import LocalRequirementsRepository
 from ..resolver import Resolver
+from ..result_cache import ResultCache, get_candidates_digest, get_fingerprint
 from ..utils import (
     UNSAFE_PACKAGES, dedup, is_pinned_requirement, key_from_ireq)
 from ..writer import OutputWriter
-from ._repo import get_pip_options_and_pypi_repository
+from ._repo import SharedRepositories
 
 click.disable_unicode_literals_warning = True
 
@@ -63,11 +69,34 @@ class PipCommand(Command):
               help="Generate pip 8 style hashes in the resulting requirements file.")
 @click.option('--max-rounds', default=10,
               help="Maximum number of rounds before resolving the requirements aborts.")
+@click.option('--fetch-jobs', default=1, type=click.IntRange(min=1),
+              help="Number of index pages to fetch concurrently.")
+@click.option('--build-jobs', default=1, type=click.IntRange(min=1),
+              help="Number of processes to use for getting the dependencies of packages.")
+@click.option('--hash-jobs', default=1, type=click.IntRange(min=1),
+              help="Number of files to download and hash concurrently.")
+@click.option('--cache-backend', default='json', type=click.Choice(sorted(DEPENDENCY_CACHE_BACKENDS)),
+              help="Storage of the dependency cache.")
+@click.option('--candidate-ttl', default=None, type=click.IntRange(min=0),
+              help="Cache the package candidates of the indexes and revalidate them after this many seconds.")
+@click.option('--json-api-url', default=None,
+              help="Get the package information from this JSON API (e.g. https://pypi.org/pypi) when possible.")
+@click.option('--not-found-ttl', default=None, type=click.IntRange(min=0),
+              help="Skip requesting packages from indexes which did not have them within this many seconds.")
+@click.option('--offline', is_flag=True, default=False,
+              help="Use only cached package information and fail if something is missing.")
+@click.option('--result-cache', is_flag=True, default=False,
+              help="Reuse the previous result of the same input while the candidates of its packages are unchanged.")
+@click.option('--input-digest', default=None,
+              help="Add this digest of the input to the header of the generated file.")
 @click.argument('src_files', nargs=-1, type=click.Path())
-def cli(verbose, silent, dry_run, pre, rebuild, find_links, index_url,
+@click.pass_context
+def cli(ctx, verbose, silent, dry_run, pre, rebuild, find_links, index_url,
         extra_index_url, cert, client_cert, trusted_host, header, index,
         emit_trusted_host, annotate, upgrade, upgrade_packages, output_file,
-        allow_unsafe, generate_hashes, src_files, max_rounds):
+        allow_unsafe, generate_hashes, src_files, max_rounds, fetch_jobs,
+        build_jobs, hash_jobs, cache_backend, candidate_ttl, json_api_url,
+        not_found_ttl, offline, result_cache, input_digest):
     """
     INTERNAL: Compile a single in-file.
 
@@ -107,16 +136,22 @@ def cli(verbose, silent, dry_run, pre, rebuild, find_links, index_url,
     # Setup
     ###
 
-    (pip_options, repository) = get_pip_options_and_pypi_repository(
+    # Reuse the repositories of the invoking command, if it has some
+    shared = ctx.obj if isinstance(ctx.obj, SharedRepositories) else SharedRepositories()
+    (pip_options, repository) = shared.get_pip_options_and_pypi_repository(
         index_url=index_url, extra_index_url=extra_index_url,
         find_links=find_links, cert=cert, client_cert=client_cert,
-        pre=pre, trusted_host=trusted_host)
+        pre=pre, trusted_host=trusted_host, fetch_jobs=fetch_jobs,
+        build_jobs=build_jobs, hash_jobs=hash_jobs,
+        candidate_ttl=candidate_ttl, json_api_url=json_api_url,
+        not_found_ttl=not_found_ttl, offline=offline)
+    index_repository = repository
 
     upgrade_install_reqs = {}
+    existing_pins = {}
     # Proxy with a LocalRequirementsRepository if --upgrade is not specified
     # (= default invocation)
     if not upgrade and os.path.exists(dst_file):
-        ireqs = parse_requirements(dst_file, finder=repository.finder, session=repository.session, options=pip_options)
         # Exclude packages from --upgrade-package/-P from the existing pins: We want to upgrade.
         upgrade_reqs_gen = (install_req_from_line(pkg) for pkg in upgrade_packages)
         upgrade_install_reqs = {
@@ -124,9 +159,8 @@ def cli(verbose, silent, dry_run, pre, rebuild, find_links, index_url,
             for install_req in upgrade_reqs_gen
         }
 
-        existing_pins = {key_from_ireq(ireq): ireq
-                         for ireq in ireqs
-                         if is_pinned_requirement(ireq) and key_from_ireq(ireq) not in upgrade_install_reqs}
+        existing_pins = get_existing_pins(
+            dst_file, repository, pip_options, exclude=upgrade_install_reqs)
         repository = LocalRequirementsRepository(existing_pins, repository)
 
     log.debug('Using indexes:')
@@ -174,10 +208,50 @@ def cli(verbose, silent, dry_run, pre, rebuild, find_links, index_url,
     # Check the given base set of constraints first
     Resolver.check_constraints(constraints)
 
+    writer = OutputWriter(src_files, dst_file, dry_run=dry_run,
+                          emit_header=header, emit_index=index,
+                          emit_trusted_host=emit_trusted_host,
+                          annotate=annotate,
+                          generate_hashes=generate_hashes,
+                          default_index_url=repository.DEFAULT_INDEX_URL,
+                          index_urls=repository.finder.index_urls,
+                          trusted_hosts=pip_options.trusted_hosts,
+                          find_links=repository.finder.find_links,
+                          format_control=repository.finder.format_control,
+                          allow_unsafe=allow_unsafe,
+                          silent=silent,
+                          input_digest=input_digest)
+
+    get_input_fingerprint = functools.partial(
+        get_result_fingerprint, src_files, dst_file, constraints,
+        finder=repository.finder, pip_options=pip_options, options=dict(
+            pre=pre, allow_unsafe=allow_unsafe,
+            generate_hashes=generate_hashes, header=header, index=index,
+            emit_trusted_host=emit_trusted_host, annotate=annotate,
+            upgrade=upgrade, upgrade_packages=sorted(upgrade_packages),
+            input_digest=input_digest))
+    fingerprint = None
+    if result_cache and not rebuild:
+        result_cache = ResultCache()
+        fingerprint = get_input_fingerprint(existing_pins)
+    if fingerprint:
+        lines = get_cached_result(result_cache, fingerprint, index_repository)
+        if lines is not None:
+            log.debug('Using the cached result of the same input')
+            writer.write_lines(lines)
+            if dry_run:
+                log.warning('Dry-run, so nothing updated.')
+            return
+
+    dependency_cache = shared.get_dependency_cache(cache_backend)
     try:
-        resolver = Resolver(constraints, repository, prereleases=pre,
-                            clear_caches=rebuild, allow_unsafe=allow_unsafe)
+        resolver = Resolver(constraints, repository, cache=dependency_cache,
+                            prereleases=pre, clear_caches=rebuild,
+                            allow_unsafe=allow_unsafe, incremental=True,
+                            settled_packages=(
+                                shared.settled_packages if not rebuild else None))
         results = resolver.resolve(max_rounds=max_rounds)
+        shared.settled_packages.update(resolver.get_settled_packages())
         if generate_hashes:
             hashes = resolver.resolve_hashes(results)
         else:
@@ -185,6 +259,9 @@ def cli(verbose, silent, dry_run, pre, rebuild, find_links, index_url,
     except PrequError as e:
         log.error(str(e))
         sys.exit(2)
+    finally:
+        # Save the dependencies found so far even if resolving failed
+        dependency_cache.flush()
 
     log.debug('')
 
@@ -217,25 +294,97 @@ def cli(verbose, silent, dry_run, pre, rebuild, find_links, index_url,
     if annotate:
         reverse_dependencies = resolver.reverse_dependencies(results)
 
-    writer = OutputWriter(src_files, dst_file, dry_run=dry_run,
-                          emit_header=header, emit_index=index,
-                          emit_trusted_host=emit_trusted_host,
-                          annotate=annotate,
-                          generate_hashes=generate_hashes,
-                          default_index_url=repository.DEFAULT_INDEX_URL,
-                          index_urls=repository.finder.index_urls,
-                          trusted_hosts=pip_options.trusted_hosts,
-                          find_links=repository.finder.find_links,
-                          format_control=repository.finder.format_control,
-                          allow_unsafe=allow_unsafe,
-                          silent=silent)
-    writer.write(results=results,
-                 unsafe_requirements=resolver.unsafe_constraints,
-                 reverse_dependencies=reverse_dependencies,
-                 primary_packages={key_from_ireq(ireq) for ireq in constraints if not ireq.constraint},
-                 markers={key_from_ireq(ireq): ireq.markers
-                          for ireq in constraints if ireq.markers},
-                 hashes=hashes)
+    lines = writer.write(results=results,
+                         unsafe_requirements=resolver.unsafe_constraints,
+                         reverse_dependencies=reverse_dependencies,
+                         primary_packages={key_from_ireq(ireq) for ireq in constraints if not ireq.constraint},
+                         markers={key_from_ireq(ireq): ireq.markers
+                                  for ireq in constraints if ireq.markers},
+                         hashes=hashes)
+
+    if fingerprint:
+        fingerprints = [fingerprint]
+        if not upgrade and not dry_run:
+            # The next compilation of the same input will have the
+            # written pins as its existing pins
+            fingerprints.append(get_input_fingerprint(get_existing_pins(
+                dst_file, repository, pip_options,
+                exclude=upgrade_install_reqs)))
+        store_result(result_cache, dedup(fingerprints), index_repository,
+                     list(results) + list(resolver.unsafe_constraints), lines)
 
     if dry_run:
         log.warning('Dry-run, so nothing updated.')
+
+
+def get_existing_pins(dst_file, repository, pip_options, exclude=()):
+    """
+    Get the pinned requirements of an existing output file.
+
+    :param exclude: keys of the packages to exclude
+    :rtype: dict[str,InstallRequirement]
+    """
+    ireqs = parse_requirements(dst_file, finder=repository.finder, session=repository.session, options=pip_options)
+    return {key_from_ireq(ireq): ireq
+            for ireq in ireqs
+            if is_pinned_requirement(ireq) and key_from_ireq(ireq) not in exclude}
+
+
+def get_result_fingerprint(src_files, dst_file, constraints, existing_pins,
+                           finder, pip_options, options):
+    """
+    Get fingerprint of the input of a compilation for the result cache.
+
+    The fingerprint covers the parsed requirements, the existing pins,
+    the index options, the output options and the running environment,
+    i.e. everything affecting the result except the contents of the
+    package indexes, which are checked by the result cache.  The names
+    of the input files are not included, since prequ compile passes
+    the requirements in temporary files.
+
+    :return: the fingerprint, or None if the result cannot be cached
+    :rtype: str|None
+    """
+    if any(x == '-' or os.path.basename(x) == 'setup.py' for x in src_files):
+        return None  # Input is not stored in a file
+    if any(ireq.editable or ireq.link for ireq in constraints):
+        return None  # Contents of the linked package may change
+    format_control = finder.format_control
+    return get_fingerprint({
+        'constraints': sorted(
+            [str(ireq.req), bool(ireq.constraint),
+             str(ireq.markers) if ireq.markers else None]
+            for ireq in constraints),
+        'existing_pins': sorted(
+            [str(ireq.req), sorted(
+                hash_value
+                for hash_values in ireq.options.get('hashes', {}).values()
+                for hash_value in hash_values)]
+            for ireq in existing_pins.values()),
+        'output_dir': os.path.dirname(os.path.abspath(dst_file)),
+        'index_urls': list(finder.index_urls),
+        'find_links': list(finder.find_links),
+        'trusted_hosts': list(pip_options.trusted_hosts or []),
+        'no_binary': sorted(format_control.no_binary),
+        'only_binary': sorted(format_control.only_binary),
+        'options': options,
+        'environment': [
+            sys.version, sys.platform, platform.machine(),
+            pip_version, __version__],
+    })
+
+
+def get_cached_result(result_cache, fingerprint, repository):
+    try:
+        return result_cache.get(fingerprint, lambda names: (
+            get_candidates_digest(repository, names)))
+    except PrequError as error:
+        log.debug('Not using the cached result: {}'.format(error))
+        return None
+
+
+def store_result(result_cache, fingerprints, repository, ireqs, lines):
+    names = sorted({key_from_ireq(ireq) for ireq in ireqs})
+    candidates_digest = get_candidates_digest(repository, names)
+    for fingerprint in fingerprints:
+        result_cache.store(fingerprint, names, candidates_digest, lines)
@@ -0,0 +1,138 @@
+# coding: utf-8
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import os
+import sys
+
+import pkg_resources
+
+from .file_replacer import FileReplacer
+from .locations import CACHE_DIR
+
+#: File name extensions of source distribution archives
+SDIST_EXTENSIONS = (
+    '.tar.gz', '.tgz', '.tar.bz2', '.tbz', '.tar.xz', '.txz', '.tar',
+    '.zip')
+
+
+class SdistMetadataCache(object):
+    """
+    Persistent cache of the metadata of source distributions.
+
+    Getting the metadata of an sdist requires running its setup.py, which
+    may take several seconds.  The generated metadata is stored in the
+    core metadata format (with the extras and the environment markers
+    of the requirements) to a file named by the SHA256 hash of the sdist
+    archive in the user cache dir, i.e.
+
+        ~/.cache/prequ/sdist-metadata-pyX.Y-{platform}/{sha256}.METADATA
+
+    Where X.Y indicates the Python version and platform is the value of
+    sys.platform.  A setup.py may choose its requirements by the Python
+    version or the platform, so the metadata generated by one
+    interpreter is not reused by another.
+    """
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            py_version = '.'.join(str(digit) for digit in sys.version_info[:2])
+            cache_dir = os.path.join(CACHE_DIR, 'sdist-metadata-py{}-{}'.format(
+                py_version, sys.platform))
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_dir = cache_dir
+
+    def get(self, sha256):
+        """
+        Get the stored metadata of an sdist.
+
+        :param sha256: hex digest of the SHA256 hash of the sdist archive
+        :rtype: str|None
+        """
+        path = self._get_path(sha256)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as fp:
+            return fp.read().decode('utf-8')
+
+    def store(self, sha256, metadata):
+        """
+        Store the metadata of an sdist.
+
+        :param sha256: hex digest of the SHA256 hash of the sdist archive
+        :type metadata: str
+        """
+        with FileReplacer(self._get_path(sha256)) as fp:
+            fp.write(metadata.encode('utf-8'))
+
+    def _get_path(self, sha256):
+        return os.path.join(self.cache_dir, sha256 + '.METADATA')
+
+
+def get_distribution_metadata(dist):
+    """
+    Get the core metadata of a prepared distribution.
+
+    The metadata of an .egg-info distribution is converted to the core
+    metadata format by adding the requirements from its requires.txt
+    as Requires-Dist and Provides-Extra headers.
+
+    :type dist: pkg_resources.Distribution
+    :rtype: str
+    """
+    if dist.has_metadata('METADATA'):
+        return dist.get_metadata('METADATA')
+    pkg_info = (
+        dist.get_metadata('PKG-INFO') if dist.has_metadata('PKG-INFO') else
+        'Metadata-Version: 1.0\nName: {}\nVersion: {}\n'.format(
+            dist.project_name, dist.version))
+    (headers, separator, body) = pkg_info.partition('\n\n')
+    body = '\n' + body if separator else ''
+    lines = [
+        line for line in headers.splitlines()
+        if not line.startswith(('Requires-Dist:', 'Provides-Extra:'))]
+    requires = (
+        dist.get_metadata_lines('requires.txt')
+        if dist.has_metadata('requires.txt') else [])
+    lines.extend(_get_requirement_headers(requires))
+    return '\n'.join(lines) + '\n' + body
+
+
+def _get_requirement_headers(requires):
+    """
+    Get core metadata headers of the requirements of requires.txt.
+
+    >>> for line in _get_requirement_headers([
+    ...         'six', '[:python_version < "3"]', 'enum34',
+    ...         '[test]', 'pytest>=3; os_name == "posix"']):
+    ...     print(line)
+    Provides-Extra: test
+    Requires-Dist: six
+    Requires-Dist: enum34; (python_version < "3")
+    Requires-Dist: pytest>=3; (os_name == "posix") and (extra == "test")
+
+    :type requires: Iterable[str]
+    :rtype: list[str]
+    """
+    extras = []
+    requirement_headers = []
+    for (section, lines) in pkg_resources.split_sections(requires):
+        (extra, _, section_marker) = (section or '').partition(':')
+        if extra and extra not in extras:
+            extras.append(extra)
+        for req in pkg_resources.parse_requirements(lines):
+            markers = [x for x in [req.marker, section_marker] if x]
+            if extra:
+                markers.append('extra == "{}"'.format(extra))
+            requirement_headers.append('Requires-Dist: {}{}'.format(
+                _format_requirement(req),
+                '; ' + ' and '.join('({})'.format(x) for x in markers)
+                if markers else ''))
+    return ['Provides-Extra: {}'.format(x) for x in extras] + requirement_headers
+
+
+def _format_requirement(req):
+    extras = '[{}]'.format(','.join(req.extras)) if req.extras else ''
+    if getattr(req, 'url', None):
+        return '{}{} @ {}'.format(req.name, extras, req.url)
+    return '{}{}{}'.format(req.name, extras, req.specifier)
@@ -0,0 +1,296 @@
+# coding: utf-8
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+
+import hashlib
+import re
+import struct
+import zlib
+
+from pip._vendor import pkg_resources
+from pip._vendor.six.moves import html_parser
+
+from ._pip_compat import urllib_parse
+
+#: Number of bytes fetched from the end of a wheel by the first request
+TAIL_SIZE = 64 * 1024
+
+_EOCD_SIGNATURE = b'PK\x05\x06'
+_EOCD_STRUCT = struct.Struct(str('<4s4H2LH'))
+_CENTRAL_DIR_SIGNATURE = b'PK\x01\x02'
+_CENTRAL_DIR_STRUCT = struct.Struct(str('<4s6H3L5H2L'))
+_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+_LOCAL_HEADER_STRUCT = struct.Struct(str('<4s5H3L2H'))
+#: Bytes reserved for the extra field when reading a local file header
+_EXTRA_FIELD_ALLOWANCE = 1024
+
+_METADATA_NAME_RX = re.compile(r'^[^/]+\.dist-info/METADATA$')
+
+#: Anchor attributes advertising the core metadata files (PEP 714 and
+#: its predecessor PEP 658) in the preferred order
+METADATA_FILE_ATTRIBUTES = ('data-core-metadata', 'data-dist-info-metadata')
+
+
+class MetadataUnavailable(Exception):
+    """
+    Metadata of a remote distribution cannot be read without the
+    distribution itself.
+    """
+
+
+def get_wheel_requirements(session, url, extras=()):
+    """
+    Get requirements of a remote wheel with HTTP range requests.
+
+    Fetches only the end of the wheel, which contains the central
+    directory of the zip archive, and the METADATA member of the
+    dist-info directory.  Usually that takes one or two requests.
+
+    Environment markers of the requirements are evaluated against the
+    current environment as pip would do.
+
+    :type session: requests.Session
+    :type url: str
+    :param extras: names of the requested extras
+    :rtype: list[pkg_resources.Requirement]
+    :raises MetadataUnavailable:
+      if the server does not support range requests or the wheel has
+      no readable metadata
+    """
+    metadata = read_wheel_metadata(session, url)
+    return get_metadata_requirements(metadata, extras)
+
+
+def get_metadata_file_requirements(session, url, metadata_file_attribute,
+                                   extras=()):
+    """
+    Get requirements of a distribution from its core metadata file.
+
+    The metadata file is the file advertised by the anchor attribute
+    of the distribution in the index page (PEP 658), i.e. URL of the
+    distribution with ".metadata" suffix.  If the attribute value has
+    a hash, the metadata file is checked against it.
+
+    :type session: requests.Session
+    :param url: URL of the distribution without a fragment
+    :param metadata_file_attribute:
+      value of the metadata file attribute, e.g. "true" or
+      "sha256=<hex digest>"
+    :param extras: names of the requested extras
+    :rtype: list[pkg_resources.Requirement]
+    :raises MetadataUnavailable:
+      if the metadata file does not match its hash
+    """
+    response = session.get(url + '.metadata')
+    response.raise_for_status()
+    (hash_name, _, expected_digest) = metadata_file_attribute.partition('=')
+    if expected_digest:
+        try:
+            digest = hashlib.new(hash_name, response.content).hexdigest()
+        except ValueError:
+            raise MetadataUnavailable(
+                'Unsupported hash of metadata file: {}'.format(hash_name))
+        if digest != expected_digest:
+            raise MetadataUnavailable(
+                'Metadata file {}.metadata does not match its hash'.format(url))
+    return get_metadata_requirements(response.content.decode('utf-8'), extras)
+
+
+def get_metadata_requirements(metadata, extras=()):
+    """
+    Get requirements from the contents of a core metadata file.
+
+    :type metadata: str
+    :param extras: names of the requested extras
+    :rtype: list[pkg_resources.Requirement]
+    """
+    dist = pkg_resources.DistInfoDistribution(
+        metadata=_MetadataProvider(metadata))
+    requested_extras = sorted(
+        set(dist.extras) & {pkg_resources.safe_extra(x) for x in extras})
+    return dist.requires(requested_extras)
+
+
+def parse_metadata_file_attributes(html, base_url):
+    """
+    Parse the metadata file attributes of the links in an index page.
+
+    >>> attributes = parse_metadata_file_attributes(
+    ...     '<a href="x-1.0.whl#sha256=ab" data-dist-info-metadata="true">'
+    ...     '<a href="x-1.0.tar.gz">', 'https://example.com/simple/x/')
+    >>> [(str(url), str(value)) for (url, value) in attributes.items()]
+    [('https://example.com/simple/x/x-1.0.whl', 'true')]
+
+    :type html: str
+    :type base_url: str
+    :return: attribute values by link URLs without fragments
+    :rtype: dict[str,str]
+    """
+    parser = _MetadataFileAttributeParser(base_url)
+    parser.feed(html)
+    parser.close()
+    return parser.attributes
+
+
+def read_wheel_metadata(session, url):
+    """
+    Read the METADATA file of a remote wheel with HTTP range requests.
+
+    :rtype: str
+    """
+    remote_file = _RemoteFile(session, url)
+    (entry_count, cd_size, cd_offset) = _parse_eocd(remote_file.tail)
+    central_dir = remote_file.read(cd_offset, cd_size)
+    entry = _find_metadata_entry(central_dir, entry_count)
+    (method, compressed_size, header_offset, name_length) = entry
+    # Read the local header and the data with a single request, if the
+    # extra field of the local header is not too long
+    guessed_length = (
+        _LOCAL_HEADER_STRUCT.size + name_length + _EXTRA_FIELD_ALLOWANCE +
+        compressed_size)
+    chunk = remote_file.read(
+        header_offset, min(guessed_length, remote_file.size - header_offset))
+    fields = _LOCAL_HEADER_STRUCT.unpack(chunk[:_LOCAL_HEADER_STRUCT.size])
+    if fields[0] != _LOCAL_HEADER_SIGNATURE:
+        raise MetadataUnavailable('Invalid local file header')
+    data_start = _LOCAL_HEADER_STRUCT.size + fields[9] + fields[10]
+    if data_start + compressed_size <= len(chunk):
+        data = chunk[data_start:data_start + compressed_size]
+    else:
+        data = remote_file.read(header_offset + data_start, compressed_size)
+    if method == 8:
+        data = zlib.decompress(data, -zlib.MAX_WBITS)
+    elif method != 0:
+        raise MetadataUnavailable(
+            'Unsupported compression method: {}'.format(method))
+    return data.decode('utf-8')
+
+
+class _RemoteFile(object):
+    """
+    Remote file read with HTTP range requests.
+
+    The last TAIL_SIZE bytes of the file are fetched on construction,
+    other parts on demand.
+    """
+    def __init__(self, session, url):
+        self.session = session
+        self.url = url
+        (content, content_range) = self._get_range('bytes=-{}'.format(TAIL_SIZE))
+        match = re.match(r'^bytes (\d+)-(\d+)/(\d+)$', content_range or '')
+        if not match:
+            raise MetadataUnavailable(
+                'Invalid Content-Range: {}'.format(content_range))
+        self.size = int(match.group(3))
+        self.tail_offset = int(match.group(1))
+        self.tail = content
+
+    def read(self, start, length):
+        if start < 0 or start + length > self.size:
+            raise MetadataUnavailable('Read past the end of the file')
+        if start >= self.tail_offset:
+            offset = start - self.tail_offset
+            return self.tail[offset:offset + length]
+        if not length:
+            return b''
+        (content, _) = self._get_range(
+            'bytes={}-{}'.format(start, start + length - 1))
+        if len(content) != length:
+            raise MetadataUnavailable('Truncated range response')
+        return content
+
+    def _get_range(self, byte_range):
+        headers = {'Range': byte_range, 'Accept-Encoding': 'identity'}
+        response = self.session.get(self.url, headers=headers, stream=True)
+        try:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise MetadataUnavailable(
+                    'Range requests not supported by {}'.format(self.url))
+            return (response.raw.read(), response.headers.get('Content-Range'))
+        finally:
+            response.close()
+
+
+def _parse_eocd(tail):
+    """
+    Parse the end of central directory record of a zip file.
+
+    :param tail: bytes from the end of the file
+    :return: number of entries, size and offset of the central directory
+    :rtype: (int, int, int)
+    """
+    position = tail.rfind(_EOCD_SIGNATURE)
+    if position < 0 or position + _EOCD_STRUCT.size > len(tail):
+        raise MetadataUnavailable('End of central directory not found')
+    fields = _EOCD_STRUCT.unpack(tail[position:position + _EOCD_STRUCT.size])
+    (entry_count, cd_size, cd_offset) = fields[4:7]
+    if entry_count == 0xffff or cd_size == 0xffffffff or cd_offset == 0xffffffff:
+        raise MetadataUnavailable('Zip64 archives are not supported')
+    return (entry_count, cd_size, cd_offset)
+
+
+def _find_metadata_entry(central_dir, entry_count):
+    """
+    Find the dist-info/METADATA entry from the central directory.
+
+    :return:
+      compression method, compressed size, local header offset and
+      name length of the entry
+    :rtype: (int, int, int, int)
+    """
+    position = 0
+    found = []
+    for _ in range(entry_count):
+        end = position + _CENTRAL_DIR_STRUCT.size
+        fields = _CENTRAL_DIR_STRUCT.unpack(central_dir[position:end])
+        if fields[0] != _CENTRAL_DIR_SIGNATURE:
+            raise MetadataUnavailable('Invalid central directory')
+        (name_length, extra_length, comment_length) = fields[10:13]
+        name = central_dir[end:end + name_length].decode('utf-8')
+        if _METADATA_NAME_RX.match(name):
+            found.append((fields[4], fields[8], fields[16], name_length))
+        position = end + name_length + extra_length + comment_length
+    if len(found) != 1:
+        raise MetadataUnavailable(
+            'Expected one METADATA file, found {}'.format(len(found)))
+    return found[0]
+
+
+class _MetadataProvider(object):
+    """
+    Minimal pkg_resources metadata provider of a METADATA file.
+    """
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+    def has_metadata(self, name):
+        return name == 'METADATA'
+
+    def get_metadata(self, name):
+        if name != 'METADATA':
+            raise KeyError(name)
+        return self.metadata
+
+    def get_metadata_lines(self, name):
+        return pkg_resources.yield_lines(self.get_metadata(name))
+
+
+class _MetadataFileAttributeParser(html_parser.HTMLParser, object):
+    def __init__(self, base_url):
+        super(_MetadataFileAttributeParser, self).__init__()
+        self.base_url = base_url
+        self.attributes = {}
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'base' and attrs.get('href'):
+            self.base_url = urllib_parse.urljoin(self.base_url, attrs['href'])
+        if tag != 'a' or not attrs.get('href'):
+            return
+        for name in METADATA_FILE_ATTRIBUTES:
+            value = attrs.get(name)
+            if value and value != 'false':
+                url = urllib_parse.urljoin(self.base_url, attrs['href'])
+                self.attributes[urllib_parse.urldefrag(url)[0]] = value
+                break
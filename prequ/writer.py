@@ -1,3 +1,4 @@
+import io
 import os
 from itertools import chain
 
@@ -10,12 +11,16 @@ from .utils import (
     UNSAFE_PACKAGES, comment, dedup, format_requirement, formatted_as,
     key_from_ireq, normalize_req_name)
 
+#: Prefix of the header line with the input digest of a generated file
+INPUT_DIGEST_PREFIX = '# input-digest: '
+
 
 class OutputWriter(object):
     def __init__(self, src_files, dst_file, dry_run, emit_header, emit_index,
                  emit_trusted_host, annotate, generate_hashes,
                  default_index_url, index_urls, trusted_hosts,
-                 find_links, format_control, allow_unsafe, silent=False):
+                 find_links, format_control, allow_unsafe, silent=False,
+                 input_digest=None):
         self.src_files = src_files
         self.dst_file = dst_file
         self.dry_run = dry_run
@@ -31,6 +36,7 @@ class OutputWriter(object):
         self.format_control = format_control
         self.allow_unsafe = allow_unsafe
         self.silent = silent
+        self.input_digest = input_digest
 
     def _sort_key(self, ireq):
         line_format = formatted_as(ireq, self.find_links)
@@ -43,6 +49,8 @@ class OutputWriter(object):
             yield comment('#')
             yield comment('#   prequ update')
             yield comment('#')
+        if self.input_digest:
+            yield comment(INPUT_DIGEST_PREFIX + self.input_digest)
 
     def write_index_options(self):
         if self.emit_index:
@@ -122,13 +130,28 @@ class OutputWriter(object):
 
     def write(self, results, unsafe_requirements, reverse_dependencies,
               primary_packages, markers, hashes):
+        """
+        Write the results and return the written lines.
+
+        :rtype: list[str]
+        """
+        lines = list(self._iter_lines(results, unsafe_requirements, reverse_dependencies,
+                                      primary_packages, markers, hashes))
+        self.write_lines(lines)
+        return lines
+
+    def write_lines(self, lines):
+        """
+        Write lines generated by write, e.g. earlier for the same input.
+
+        :type lines: list[str]
+        """
         with ExitStack() as stack:
             f = None
             if not self.dry_run:
                 f = stack.enter_context(FileReplacer(self.dst_file))
 
-            for line in self._iter_lines(results, unsafe_requirements, reverse_dependencies,
-                                         primary_packages, markers, hashes):
+            for line in lines:
                 if not self.silent:
                     log.info(line)
                 if f:
@@ -158,3 +181,20 @@ class OutputWriter(object):
                 " \\\n    " if ireq_hashes else "  ",
                 comment("# via " + annotation))
         return line
+
+
+def read_input_digest(path):
+    """
+    Read the input digest from the header of a generated file.
+
+    :type path: str
+    :return: the digest, or None if the header has no digest
+    :rtype: str|None
+    """
+    with io.open(path, 'rt', encoding='utf-8') as fp:
+        for line in fp:
+            if not line.startswith('#'):
+                break
+            if line.startswith(INPUT_DIGEST_PREFIX):
+                return line[len(INPUT_DIGEST_PREFIX):].strip()
+    return None
@@ -95,6 +95,30 @@ def depcache(tmpdir):
     return DependencyCache(str(tmpdir))
 
 
+#: Modules of the persistent caches, which default to the user cache dir
+CACHE_MODULES = [
+    'prequ.candidate_cache',
+    'prequ.find_links_index',
+    'prequ.hash_cache',
+    'prequ.not_found_cache',
+    'prequ.result_cache',
+    'prequ.sdist_metadata_cache',
+]
+
+
+@fixture(autouse=True)
+def user_cache_dir(tmpdir_factory, monkeypatch):
+    """
+    Keep the persistent caches of the tests out of the user cache dir.
+
+    The tests would otherwise see the entries stored by previous runs.
+    """
+    cache_dir = str(tmpdir_factory.mktemp('user-cache'))
+    for module in CACHE_MODULES:
+        monkeypatch.setattr(module + '.CACHE_DIR', cache_dir)
+    return cache_dir
+
+
 @fixture
 def resolver(depcache, repository):
     # TODO: It'd be nicer if Resolver instance could be set up and then
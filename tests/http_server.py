@@ -0,0 +1,116 @@
+from __future__ import unicode_literals
+
+import os
+import re
+import threading
+
+from six.moves import BaseHTTPServer, socketserver
+
+
+class FileServer(object):
+    """
+    HTTP server serving files of a directory in a background thread.
+
+    Directories are served as their index.html files or as HTML pages
+    linking to their files.
+    Supports single byte range requests, unless support_ranges is
+    false.  The served requests are recorded to the requests list as
+    (method, path, range header) tuples.
+
+    Use as a context manager:
+
+        with FileServer(directory) as server:
+            session.get(server.url + '/some-file.whl')
+    """
+    def __init__(self, directory, support_ranges=True):
+        self.directory = directory
+        self.support_ranges = support_ranges
+        self.requests = []
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), _make_handler(self))
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type=None, exc_val=None, exc_tb=None):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+def _make_handler(file_server):
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+        def do_HEAD(self):  # noqa: N802
+            self._serve(send_body=False)
+
+        def do_GET(self):  # noqa: N802
+            self._serve(send_body=True)
+
+        def log_message(self, *args):
+            pass
+
+        def _serve(self, send_body):
+            range_header = self.headers.get('Range')
+            file_server.requests.append((self.command, self.path, range_header))
+            path = os.path.join(file_server.directory, self.path.lstrip('/'))
+            if not os.path.exists(path):
+                self.send_error(404)
+                return
+            (content, content_type) = _read_content(path)
+            byte_range = _parse_range(range_header, len(content))
+            if byte_range and file_server.support_ranges:
+                (start, end) = byte_range
+                self.send_response(206)
+                self.send_header('Content-Range', 'bytes {}-{}/{}'.format(
+                    start, end, len(content)))
+                content = content[start:end + 1]
+            else:
+                self.send_response(200)
+            if file_server.support_ranges:
+                self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(content)
+
+    return Handler
+
+
+def _read_content(path):
+    if os.path.isfile(os.path.join(path, 'index.html')):
+        path = os.path.join(path, 'index.html')
+    if os.path.isdir(path):
+        return (_get_listing(path), 'text/html')
+    with open(path, 'rb') as fp:
+        content = fp.read()
+    is_html = path.endswith('.html')
+    return (content, 'text/html' if is_html else 'application/octet-stream')
+
+
+def _get_listing(path):
+    links = ''.join(
+        '<a href="{0}">{0}</a>\n'.format(name)
+        for name in sorted(os.listdir(path)))
+    return '<html><body>\n{}</body></html>\n'.format(links).encode('utf-8')
+
+
+def _parse_range(range_header, size):
+    match = re.match(r'^bytes=(\d*)-(\d*)$', range_header or '')
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    if not match.group(1):  # Suffix range, e.g. bytes=-500
+        return (max(size - int(match.group(2)), 0), size - 1)
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) else size - 1
+    return (start, min(end, size - 1))
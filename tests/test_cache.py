@@ -3,9 +3,13 @@ from os import remove
 from shutil import rmtree
 from tempfile import NamedTemporaryFile
 
+import mock
+import pytest
 from pytest import raises
 
-from prequ.cache import CorruptCacheError, DependencyCache, read_cache_file
+from prequ.cache import (
+    BaseDependencyCache, CorruptCacheError, DependencyCache,
+    ShardedDependencyCache, SqliteDependencyCache, read_cache_file)
 
 
 @contextmanager
@@ -57,12 +61,14 @@ def test_read_cache_file_successful():
         assert "success" == read_cache_file(cache_file_name)
 
 
-def test_reverse_dependencies(from_line, tmpdir):
+@pytest.mark.parametrize('cache_class', [
+    DependencyCache, ShardedDependencyCache, SqliteDependencyCache])
+def test_reverse_dependencies(from_line, tmpdir, cache_class):
     # Since this is a test, make a temporary directory. Converting to str from py.path.
     tmp_dir_path = str(tmpdir)
 
     # Create a cache object. The keys are packages, and the values are lists of packages on which the keys depend.
-    cache = DependencyCache(cache_dir=tmp_dir_path)
+    cache = cache_class(cache_dir=tmp_dir_path)
     cache[from_line("top==1.2")] = ["middle>=0.3", "bottom>=5.1.2"]
     cache[from_line("top[xtra]==1.2")] = ["middle>=0.3", "bottom>=5.1.2", "bonus==0.4"]
     cache[from_line("middle==0.4")] = ["bottom<6"]
@@ -96,3 +102,140 @@ def test_reverse_dependencies(from_line, tmpdir):
 
     # Clean up our temp directory
     rmtree(tmp_dir_path)
+
+
+@pytest.mark.parametrize('cache_class', [
+    DependencyCache, ShardedDependencyCache, SqliteDependencyCache])
+def test_update(from_line, tmpdir, cache_class):
+    cache = cache_class(cache_dir=str(tmpdir))
+    cache[from_line("top==1.2")] = ["middle>=0.3"]
+    cache.update([
+        (from_line("middle==0.4"), ["bottom<6"]),
+        (from_line("bottom==5.3.5"), []),
+    ])
+    cache.flush()
+
+    reloaded = cache_class(cache_dir=str(tmpdir))
+    assert reloaded[from_line("top==1.2")] == ["middle>=0.3"]
+    assert reloaded[from_line("middle==0.4")] == ["bottom<6"]
+    assert reloaded[from_line("bottom==5.3.5")] == []
+
+
+def test_writes_are_batched(from_line, tmpdir):
+    cache = DependencyCache(cache_dir=str(tmpdir), batch_size=3)
+    cache[from_line("first==1.0")] = []
+    cache[from_line("second==1.0")] = []
+    assert not tmpdir.listdir()
+
+    cache[from_line("third==1.0")] = []
+    assert from_line("third==1.0") in DependencyCache(str(tmpdir))
+
+    cache[from_line("fourth==1.0")] = []
+    assert from_line("fourth==1.0") not in DependencyCache(str(tmpdir))
+
+    cache.flush()
+    assert from_line("fourth==1.0") in DependencyCache(str(tmpdir))
+
+
+def test_writes_are_flushed_after_interval(from_line, tmpdir):
+    cache = DependencyCache(cache_dir=str(tmpdir), flush_interval=10)
+    with mock.patch('time.time', return_value=100.0):
+        cache[from_line("first==1.0")] = []
+    with mock.patch('time.time', return_value=109.0):
+        cache[from_line("second==1.0")] = []
+    assert not tmpdir.listdir()
+
+    with mock.patch('time.time', return_value=110.0):
+        cache[from_line("third==1.0")] = []
+    reloaded = DependencyCache(str(tmpdir))
+    assert from_line("first==1.0") in reloaded
+    assert from_line("third==1.0") in reloaded
+
+
+def test_flush_without_pending_entries_does_not_write(tmpdir):
+    cache = DependencyCache(cache_dir=str(tmpdir))
+    cache.flush()
+    assert not tmpdir.listdir()
+
+
+def test_sqlite_cache_writes_entries_immediately(from_line, tmpdir):
+    cache = SqliteDependencyCache(cache_dir=str(tmpdir))
+    cache[from_line("top==1.2")] = ["middle>=0.3"]
+    cache[from_line("top==1.2")] = ["middle>=0.4"]
+
+    other = SqliteDependencyCache(cache_dir=str(tmpdir))
+    assert other[from_line("top==1.2")] == ["middle>=0.4"]
+    assert from_line("top==1.3") not in other
+    assert other.get(from_line("top==1.3"), "missing") == "missing"
+    with raises(KeyError):
+        other[from_line("top==1.3")]
+
+
+def test_sqlite_cache_keeps_editables_in_memory(from_editable, tmpdir):
+    ireq = from_editable('git+https://github.com/django/django.git#egg=django')
+    cache = SqliteDependencyCache(cache_dir=str(tmpdir))
+    cache[ireq] = ["pytz"]
+    assert cache[ireq] == ["pytz"]
+    assert ireq not in SqliteDependencyCache(cache_dir=str(tmpdir))
+
+
+def test_sqlite_cache_imports_json_cache_once(from_line, tmpdir):
+    json_cache = DependencyCache(cache_dir=str(tmpdir))
+    json_cache[from_line("top==1.2")] = ["middle>=0.3"]
+    json_cache.flush()
+
+    cache = SqliteDependencyCache(cache_dir=str(tmpdir))
+    assert cache[from_line("top==1.2")] == ["middle>=0.3"]
+    cache.clear()
+
+    json_cache[from_line("middle==0.4")] = []
+    json_cache.flush()
+    cache = SqliteDependencyCache(cache_dir=str(tmpdir))
+    assert from_line("top==1.2") not in cache
+    assert from_line("middle==0.4") not in cache
+
+
+def test_sharded_cache_writes_file_per_package(from_line, tmpdir):
+    cache = ShardedDependencyCache(cache_dir=str(tmpdir))
+    cache[from_line("Top_Pkg==1.2")] = ["middle>=0.3"]
+    cache[from_line("top_pkg[xtra]==1.2")] = ["middle>=0.3", "bonus"]
+    cache[from_line("middle==0.4")] = []
+    cache.flush()
+
+    shard_dir = tmpdir.listdir()[0]
+    assert sorted(x.basename for x in shard_dir.listdir()) == [
+        'middle.json', 'top-pkg.json']
+    assert read_cache_file(str(shard_dir.join('top-pkg.json'))) == {
+        'top-pkg': {'1.2': ['middle>=0.3'], '1.2[xtra]': ['middle>=0.3', 'bonus']}}
+
+
+def test_sharded_cache_loads_only_used_packages(from_line, tmpdir):
+    cache = ShardedDependencyCache(cache_dir=str(tmpdir))
+    cache[from_line("top==1.2")] = ["middle>=0.3"]
+    cache[from_line("middle==0.4")] = []
+    cache.flush()
+
+    cache = ShardedDependencyCache(cache_dir=str(tmpdir))
+    assert cache[from_line("middle==0.4")] == []
+    assert from_line("other==1.0") not in cache
+    assert set(cache.cache) == {'middle'}
+
+    cache[from_line("other==1.0")] = []
+    cache.flush()
+    cache = ShardedDependencyCache(cache_dir=str(tmpdir))
+    assert cache[from_line("top==1.2")] == ["middle>=0.3"]
+    assert cache[from_line("other==1.0")] == []
+
+
+def test_sharded_cache_clear(from_line, tmpdir):
+    cache = ShardedDependencyCache(cache_dir=str(tmpdir))
+    cache[from_line("top==1.2")] = ["middle>=0.3"]
+    cache.flush()
+    cache.clear()
+    assert from_line("top==1.2") not in cache
+    assert from_line("top==1.2") not in ShardedDependencyCache(str(tmpdir))
+
+
+def test_base_dependency_cache_is_abstract():
+    with raises(TypeError):
+        BaseDependencyCache()
@@ -0,0 +1,180 @@
+import hashlib
+import json
+
+import mock
+import pytest
+
+from prequ._pip_compat import PIP_9_OR_NEWER, InstallationCandidate, Link
+from prequ.candidate_cache import CandidateCache, _load_candidates
+
+INDEX_URL = 'https://index.example.com/simple/'
+PAGE_URL = 'https://index.example.com/simple/foo-bar/'
+
+
+def make_candidate(version, requires_python=None):
+    url = 'https://files.example.com/foo_bar-{}.tar.gz#sha256=abc{}'.format(
+        version, version)
+    link_kwargs = {'requires_python': requires_python} if requires_python else {}
+    link = Link(url, **link_kwargs)
+    return InstallationCandidate('foo_bar', version, link)
+
+
+def make_response(content=b'page', etag=None):
+    headers = {'Content-Type': 'text/html'}
+    if etag:
+        headers['ETag'] = etag
+    return mock.Mock(
+        status_code=200, content=content, headers=headers, url=PAGE_URL)
+
+
+class Fetcher(object):
+    """
+    Fake finder, which fetches the index page with the session.
+    """
+    def __init__(self, session, candidates):
+        self.session = session
+        self.candidates = candidates
+        self.response = make_response()
+        self.calls = []
+
+    def __call__(self, project_name):
+        self.calls.append(project_name)
+        for hook in self.session.hooks['response']:
+            hook(self.response)
+        return self.candidates
+
+
+@pytest.fixture
+def session():
+    return mock.Mock(hooks={'response': []})
+
+
+@pytest.fixture
+def candidate_cache(session, tmpdir):
+    return CandidateCache(session, cache_dir=str(tmpdir))
+
+
+def get_candidate_data(candidates):
+    return [
+        (x.project, str(x.version), x.link.url,
+         getattr(x.link, 'requires_python', None))
+        for x in candidates]
+
+
+def read_entry(tmpdir):
+    (path,) = tmpdir.listdir()
+    return json.loads(path.read())['entry']
+
+
+def test_stores_candidates(session, tmpdir):
+    candidate_cache = CandidateCache(session, ttl=60, cache_dir=str(tmpdir))
+    requires_python = '>=3.5' if PIP_9_OR_NEWER else None
+    candidates = [make_candidate('1.0'), make_candidate('1.1', requires_python)]
+    fetch = Fetcher(session, candidates)
+
+    result1 = candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch)
+    result2 = candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch)
+
+    assert result1 == candidates
+    assert get_candidate_data(result2) == get_candidate_data(candidates)
+    assert fetch.calls == ['foo_bar']
+    assert not session.get.called
+
+
+def test_records_page_state_from_finder_response(
+        candidate_cache, session, tmpdir):
+    fetch = Fetcher(session, [make_candidate('1.0')])
+    fetch.response = make_response(etag='"v1"')
+
+    candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch)
+
+    entry = read_entry(tmpdir)
+    assert entry['etag'] == '"v1"'
+    assert entry['digest'] == hashlib.sha256(b'page').hexdigest()
+    assert not session.get.called
+
+
+def test_keeps_stored_candidates_when_page_is_unchanged(
+        candidate_cache, session):
+    fetch = Fetcher(session, [make_candidate('1.0')])
+    fetch.response = make_response(etag='"v1"')
+    candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch)
+
+    fetch.candidates = []
+    result = candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch)
+
+    assert fetch.calls == ['foo_bar', 'foo_bar']
+    assert [str(x.version) for x in result] == ['1.0']
+    assert not session.get.called
+
+
+def test_stores_new_candidates_when_page_changes(
+        candidate_cache, session, tmpdir):
+    fetch = Fetcher(session, [make_candidate('1.0')])
+    fetch.response = make_response(etag='"v1"')
+    candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch)
+
+    fetch.candidates = [make_candidate('1.0'), make_candidate('2.0')]
+    fetch.response = make_response(content=b'new', etag='"v2"')
+    result = candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch)
+
+    assert fetch.calls == ['foo_bar', 'foo_bar']
+    assert [str(x.version) for x in result] == ['1.0', '2.0']
+    assert read_entry(tmpdir)['etag'] == '"v2"'
+    assert not session.get.called
+
+
+def test_does_not_revalidate_within_ttl(session, tmpdir):
+    candidate_cache = CandidateCache(session, ttl=60, cache_dir=str(tmpdir))
+    fetch = Fetcher(session, [make_candidate('1.0')])
+    with mock.patch('time.time', return_value=1000.0):
+        candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch)
+    with mock.patch('time.time', return_value=1059.0):
+        candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch)
+    assert fetch.calls == ['foo_bar']
+
+    with mock.patch('time.time', return_value=1060.0):
+        candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch)
+    assert fetch.calls == ['foo_bar', 'foo_bar']
+
+
+def test_indexes_are_cached_separately(candidate_cache, session):
+    fetch1 = Fetcher(session, [make_candidate('1.0')])
+    fetch2 = Fetcher(session, [make_candidate('2.0')])
+
+    candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch1)
+    result = candidate_cache.get_candidates(
+        'https://other.example.com/simple/', 'foo_bar', fetch2)
+
+    assert fetch2.calls == ['foo_bar']
+    assert [str(x.version) for x in result] == ['2.0']
+
+
+def test_stores_metadata_file_attribute(candidate_cache, session):
+    candidate = make_candidate('1.0')
+    candidate.link.dist_info_metadata = 'sha256=abc'
+    fetch = Fetcher(session, [candidate, make_candidate('1.1')])
+
+    candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch)
+    result = candidate_cache.get_candidates(INDEX_URL, 'foo_bar', fetch)
+
+    assert [getattr(x.link, 'dist_info_metadata', None) for x in result] == [
+        'sha256=abc', None]
+
+
+def test_loads_entries_of_newer_pip_versions():
+    data = {
+        'version': '1.0', 'filename': 'foo_bar-1.0.tar.gz',
+        'url': 'https://files.example.com/foo_bar-1.0.tar.gz',
+        'requires_python': '>=3.5', 'yanked_reason': 'Broken'}
+
+    def make_old_link(url, comes_from=None):
+        return Link(url)
+
+    with mock.patch('prequ.candidate_cache.PIP_9_OR_NEWER', False), \
+            mock.patch('prequ.candidate_cache.PIP_192_OR_NEWER', False), \
+            mock.patch('prequ.candidate_cache.Link', make_old_link):
+        result = _load_candidates('foo_bar', [data])
+
+    assert [x.link.url for x in result] == [
+        'https://files.example.com/foo_bar-1.0.tar.gz']
@@ -0,0 +1,64 @@
+import pytest
+from pip._vendor.packaging.specifiers import SpecifierSet
+
+from prequ._pip_compat import InstallationCandidate, Link
+from prequ.candidate_index import CandidateIndex
+
+VERSIONS = ['0.9', '1.0', '1.1b1', '1.1', '1.1', '2.0rc1', '2.0.post1']
+
+
+def make_candidates(versions, extension='.tar.gz'):
+    return [
+        InstallationCandidate('foo', version, Link(
+            'https://example.com/foo-{}-{}{}'.format(version, n, extension)))
+        for (n, version) in enumerate(versions)]
+
+
+def sort_key(candidate):
+    return candidate.version
+
+
+def get_best_candidate_by_filtering(candidates, specifier, prereleases):
+    by_version = {candidate.version: candidate for candidate in candidates}
+    matching_versions = specifier.filter(
+        (candidate.version for candidate in candidates),
+        prereleases=prereleases)
+    matching_candidates = [by_version[ver] for ver in matching_versions]
+    return max(matching_candidates, key=sort_key) if matching_candidates else None
+
+
+@pytest.mark.parametrize('versions', [
+    VERSIONS, ['1.0b1', '1.0rc1'], ['3.0.dev0'], []])
+@pytest.mark.parametrize('specifier', [
+    '', '>=1.0', '<2', '==1.1', '==1.1b1', '>=1.1b1', '>=2.0rc1', '~=1.0',
+    '!=1.1', '>5'])
+@pytest.mark.parametrize('prereleases', [None, False, True])
+def test_get_best_candidate_matches_filtering(versions, specifier, prereleases):
+    candidates = make_candidates(versions)
+    specifier = SpecifierSet(specifier)
+    candidate_index = CandidateIndex(candidates, sort_key)
+
+    best_candidate = candidate_index.get_best_candidate(specifier, prereleases)
+
+    assert best_candidate is get_best_candidate_by_filtering(
+        candidates, specifier, prereleases)
+
+
+def test_get_best_candidate_uses_sort_key():
+    candidates = make_candidates(['1.0', '2.0'], '.whl') + make_candidates(['3.0'])
+    candidate_index = CandidateIndex(
+        candidates, lambda c: (c.link.ext == '.whl', c.version))
+
+    best_candidate = candidate_index.get_best_candidate(SpecifierSet(''))
+
+    assert str(best_candidate.version) == '2.0'
+
+
+def test_versions_and_candidates_by_version():
+    candidates = make_candidates(VERSIONS)
+    candidate_index = CandidateIndex(candidates, sort_key)
+
+    assert [str(x) for x in candidate_index.versions] == [
+        '0.9', '1.0', '1.1b1', '1.1', '2.0rc1', '2.0.post1']
+    assert candidate_index.candidates_by_version[candidates[3].version] == [
+        candidates[3], candidates[4]]
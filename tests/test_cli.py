@@ -10,6 +10,7 @@ from click.testing import CliRunner
 
 from prequ._pip_compat import PIP_9_OR_NEWER, path_to_url
 from prequ.repositories.pypi import PyPIRepository
+from prequ.result_cache import ResultCache
 from prequ.scripts.compile_in import cli
 from prequ.scripts.sync import cli as sync_cli
 
@@ -513,3 +514,46 @@ def test_no_candidates_pre():
 
         assert out.exit_code == 2
         assert 'Tried pre-versions:' in out.output
+
+
+def test_offline_reports_missing_cache_entries():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open('requirements.in', 'w') as req_in:
+            req_in.write('small-fake-a')
+
+        out = runner.invoke(cli, [
+            '--offline', '-i', 'https://offline.example.com/simple/'])
+
+        assert out.exit_code == 2
+        assert (
+            'Cannot work offline, since these are not cached:\n'
+            '  - candidates of small-fake-a from'
+            ' https://offline.example.com/simple/') in out.output
+
+
+def test_result_cache(minimal_wheels_dir, tmpdir):
+    cache_dir = str(tmpdir.join('results'))
+    runner = CliRunner()
+    with runner.isolated_filesystem(), mock.patch(
+            'prequ.scripts.compile_in.ResultCache',
+            new=lambda: ResultCache(cache_dir)):
+        with open('requirements.in', 'w') as req_in:
+            req_in.write('small-fake-a')
+        args = ['--result-cache', '-f', minimal_wheels_dir]
+
+        out = runner.invoke(cli, args)
+        check_successful_exit(out)
+        assert 'small-fake-a==0.2' in out.output
+
+        with mock.patch('prequ.scripts.compile_in.Resolver') as resolver:
+            out = runner.invoke(cli, args)
+        check_successful_exit(out)
+        assert 'small-fake-a==0.2' in out.output
+        assert not resolver.called
+
+        with open('requirements.in', 'w') as req_in:
+            req_in.write('small-fake-a<0.2')
+        out = runner.invoke(cli, args)
+        check_successful_exit(out)
+        assert 'small-fake-a==0.1' in out.output
@@ -135,7 +135,9 @@ def test_unknown_wheel_source():
 @pytest.mark.parametrize('enabled', [
     '', 'annotate', 'generate_hashes', 'header',
     'index_url', 'extra_index_urls',
-    'trusted_hosts', 'find_links'])
+    'trusted_hosts', 'find_links', 'build_jobs', 'fetch_jobs',
+    'hash_jobs', 'cache_backend', 'candidate_ttl', 'json_api_url',
+    'not_found_ttl', 'result_cache'])
 def test_get_prequ_compile_options(enabled):
     conf_data = {'requirements': {'base': ''}, 'options': {}}
     expected_opts = {
@@ -155,6 +157,18 @@ def test_get_prequ_compile_options(enabled):
     elif enabled == 'find_links':
         conf_data['options']['wheel_dir'] = 'some_dir'
         expected_opts[enabled] = ['some_dir']
+    elif enabled == 'cache_backend':
+        conf_data['options'][enabled] = 'sqlite'
+        expected_opts[enabled] = 'sqlite'
+    elif enabled == 'json_api_url':
+        conf_data['options'][enabled] = 'https://pypi.org/pypi'
+        expected_opts[enabled] = 'https://pypi.org/pypi'
+    elif enabled in ('candidate_ttl', 'not_found_ttl'):
+        conf_data['options'][enabled] = 0
+        expected_opts[enabled] = 0
+    elif enabled in ('build_jobs', 'fetch_jobs', 'hash_jobs'):
+        conf_data['options'][enabled] = 8
+        expected_opts[enabled] = 8
     elif enabled:
         conf_data['options'][enabled] = True
         expected_opts[enabled] = True
@@ -187,6 +201,45 @@ def test_requirements_in_generation():
         'pytest')
 
 
+def test_input_digest():
+    data = {'requirements': {'base': 'framework', 'dev': 'ipython'}}
+    with in_temporary_directory():
+        conf = PrequConfiguration.from_dict(data)
+        options = {'annotate': True, 'fetch_jobs': 4}
+        digest = conf.get_input_digest('dev', options)
+        assert digest.startswith('sha256:')
+        assert conf.get_input_digest('dev', dict(options, fetch_jobs=2)) == (
+            digest)
+        assert conf.get_input_digest('dev', dict(options, annotate=False)) != (
+            digest)
+        assert conf.get_input_digest('base', options) != digest
+
+        with io.open('requirements.txt', 'wt', encoding='utf-8') as fp:
+            fp.write('framework==1.0\n')
+        base_digest = conf.get_input_digest('base', options)
+        digest_with_base = conf.get_input_digest('dev', options)
+        assert digest_with_base != digest
+
+        with io.open('requirements.txt', 'wt', encoding='utf-8') as fp:
+            fp.write('framework==1.1\n')
+        assert conf.get_input_digest('base', options) == base_digest
+        assert conf.get_input_digest('dev', options) != digest_with_base
+
+
+@pytest.mark.parametrize('content,expected', [
+    (None, False),
+    ('# input-digest: sha256:abc\nframework==1.0\n', True),
+    ('framework==1.0\n', False),
+])
+def test_uses_input_digest(content, expected):
+    with in_temporary_directory():
+        if content is not None:
+            with io.open('requirements.txt', 'wt', encoding='utf-8') as fp:
+                fp.write(content)
+        conf = PrequConfiguration.from_dict({'requirements': {'base': 'x'}})
+        assert conf.uses_input_digest() is expected
+
+
 def test_from_dir():
     with in_temporary_directory():
         create_configuration(
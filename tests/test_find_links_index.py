@@ -0,0 +1,82 @@
+import os
+import time
+
+import mock
+import pytest
+
+from prequ._pip_compat import path_to_url
+from prequ.find_links_index import FindLinksIndex, get_local_directory
+
+FILENAMES = [
+    'foo_bar-1.0-py2.py3-none-any.whl',
+    'foo-bar-1.1.tar.gz',
+    'foo-2.0.zip',
+    'other-1.0-py2.py3-none-any.whl',
+]
+
+
+@pytest.fixture
+def wheel_dir(tmpdir):
+    directory = tmpdir.ensure_dir('wheels')
+    for filename in FILENAMES:
+        directory.ensure(filename)
+    set_mtime(directory, time.time() - 60)
+    return directory
+
+
+def set_mtime(directory, mtime):
+    os.utime(str(directory), (mtime, mtime))
+
+
+def get_filenames(paths):
+    return [os.path.basename(path) for path in paths]
+
+
+def test_get_paths(wheel_dir, tmpdir):
+    index = FindLinksIndex(cache_dir=str(tmpdir.join('cache')))
+
+    assert get_filenames(index.get_paths(str(wheel_dir), 'Foo_Bar')) == [
+        'foo-bar-1.1.tar.gz', 'foo_bar-1.0-py2.py3-none-any.whl']
+    assert get_filenames(index.get_paths(str(wheel_dir), 'foo')) == [
+        'foo-2.0.zip', 'foo-bar-1.1.tar.gz']
+    assert index.get_paths(str(wheel_dir), 'missing') == []
+    assert all(os.path.isabs(x) for x in index.get_paths(str(wheel_dir), 'other'))
+
+
+def test_index_is_stored(wheel_dir, tmpdir):
+    cache_dir = str(tmpdir.join('cache'))
+    FindLinksIndex(cache_dir=cache_dir).get_paths(str(wheel_dir), 'other')
+
+    with mock.patch('os.listdir') as listdir:
+        paths = FindLinksIndex(cache_dir=cache_dir).get_paths(
+            str(wheel_dir), 'other')
+
+    assert not listdir.called
+    assert get_filenames(paths) == ['other-1.0-py2.py3-none-any.whl']
+
+
+def test_index_is_rebuilt_when_directory_changes(wheel_dir, tmpdir):
+    index = FindLinksIndex(cache_dir=str(tmpdir.join('cache')))
+    index.get_paths(str(wheel_dir), 'other')
+
+    wheel_dir.ensure('other-2.0-py2.py3-none-any.whl')
+    set_mtime(wheel_dir, time.time() - 30)
+
+    assert get_filenames(index.get_paths(str(wheel_dir), 'other')) == [
+        'other-1.0-py2.py3-none-any.whl', 'other-2.0-py2.py3-none-any.whl']
+
+
+def test_fresh_directory_is_not_stored(wheel_dir, tmpdir):
+    cache_dir = tmpdir.join('cache')
+    set_mtime(wheel_dir, time.time())
+
+    FindLinksIndex(cache_dir=str(cache_dir)).get_paths(str(wheel_dir), 'foo')
+
+    assert cache_dir.listdir() == []
+
+
+def test_get_local_directory(wheel_dir):
+    assert get_local_directory(str(wheel_dir)) == str(wheel_dir)
+    assert get_local_directory(path_to_url(str(wheel_dir))) == str(wheel_dir)
+    assert get_local_directory(str(wheel_dir.join('foo-2.0.zip'))) is None
+    assert get_local_directory('https://example.com/wheels/') is None
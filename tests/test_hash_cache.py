@@ -0,0 +1,80 @@
+import mock
+import pytest
+
+from prequ._pip_compat import Link, path_to_url
+from prequ.hash_cache import HashCache
+
+URL = 'https://files.example.com/foo-1.0.tar.gz'
+
+
+def make_head_response(size='123', etag='"abc"'):
+    headers = {}
+    if size:
+        headers['Content-Length'] = size
+    if etag:
+        headers['ETag'] = etag
+    return mock.Mock(headers=headers)
+
+
+class Hasher(object):
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, link):
+        self.calls.append(link.url)
+        return 'sha256:hash{}'.format(len(self.calls))
+
+
+@pytest.fixture
+def session():
+    return mock.Mock(head=mock.Mock(return_value=make_head_response()))
+
+
+def test_hash_is_reused_by_other_instances(session, tmpdir):
+    hasher = Hasher()
+    hash_cache = HashCache(session, cache_dir=str(tmpdir))
+    assert hash_cache.get_hash(Link(URL), hasher) == 'sha256:hash1'
+    assert hash_cache.get_hash(Link(URL + '#egg=foo'), hasher) == 'sha256:hash1'
+    hash_cache.flush()
+
+    hash_cache = HashCache(session, cache_dir=str(tmpdir))
+    assert hash_cache.get_hash(Link(URL), hasher) == 'sha256:hash1'
+    assert hasher.calls == [URL]
+
+
+@pytest.mark.parametrize('changed', ['size', 'etag'])
+def test_hash_is_recomputed_if_file_changes(session, tmpdir, changed):
+    hasher = Hasher()
+    hash_cache = HashCache(session, cache_dir=str(tmpdir))
+    hash_cache.get_hash(Link(URL), hasher)
+
+    session.head.return_value = (
+        make_head_response(size='124') if changed == 'size' else
+        make_head_response(etag='"def"'))
+    assert hash_cache.get_hash(Link(URL), hasher) == 'sha256:hash2'
+
+
+def test_hash_is_not_cached_without_etag(session, tmpdir):
+    hasher = Hasher()
+    session.head.return_value = make_head_response(etag=None)
+    hash_cache = HashCache(session, cache_dir=str(tmpdir))
+    hash_cache.get_hash(Link(URL), hasher)
+    hash_cache.get_hash(Link(URL), hasher)
+    hash_cache.flush()
+
+    assert hasher.calls == [URL, URL]
+    assert not tmpdir.listdir()
+
+
+def test_hash_of_local_file_is_validated_by_stat(session, tmpdir):
+    hasher = Hasher()
+    local_file = tmpdir.join('foo-1.0.tar.gz')
+    local_file.write('content')
+    link = Link(path_to_url(str(local_file)))
+    hash_cache = HashCache(session, cache_dir=str(tmpdir.join('cache')))
+
+    assert hash_cache.get_hash(link, hasher) == 'sha256:hash1'
+    assert hash_cache.get_hash(link, hasher) == 'sha256:hash1'
+    local_file.write('changed content')
+    assert hash_cache.get_hash(link, hasher) == 'sha256:hash2'
+    assert not session.head.called
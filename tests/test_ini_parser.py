@@ -100,6 +100,25 @@ def test_parse_text():
         assert parsed[name] == string_val
 
 
+def test_parse_int():
+    data = [
+        ('v1', int, '0', 0),
+        ('v2', int, '42', 42),
+        ('v3', int, '-1', -1),
+    ]
+    parsed = parse_variables([x[0:3] for x in data])
+    for (name, spec, string_val, expected) in data:
+        assert parsed[name] == expected
+
+
+@pytest.mark.parametrize('val', ['foobar', '', '1.5'])
+def test_parse_int_invalids(val):
+    with pytest.raises(ParseError) as excinfo:
+        parse_variables([('int_variable', int, val)])
+    assert '{}'.format(excinfo.value) == (
+        "Unknown int value for option \"int_variable\": {!r}".format(val))
+
+
 def test_parse_list():
     data = [
         ('empty', [text], ''),
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from prequ.not_found_cache import NotFoundCache
+
+INDEX_URL = 'https://index.example.com/simple/'
+
+
+@pytest.fixture
+def cache_dir(tmpdir):
+    return str(tmpdir.join('cache'))
+
+
+def test_is_missing(cache_dir):
+    cache = NotFoundCache(ttl=60, cache_dir=cache_dir)
+    assert not cache.is_missing(INDEX_URL, 'Foo_Bar')
+
+    cache.add(INDEX_URL + 'foo-bar/')
+
+    assert cache.is_missing(INDEX_URL, 'Foo_Bar')
+    assert not cache.is_missing(INDEX_URL, 'foo')
+    assert not cache.is_missing('https://other.example.com/simple/', 'foo-bar')
+    assert cache.skipped_count == 1
+
+
+def test_entries_are_stored_by_flush(cache_dir):
+    cache = NotFoundCache(ttl=60, cache_dir=cache_dir)
+    cache.add(INDEX_URL + 'Foo_Bar')
+    assert not NotFoundCache(ttl=60, cache_dir=cache_dir).is_missing(
+        INDEX_URL, 'foo-bar')
+
+    cache.flush()
+
+    assert NotFoundCache(ttl=60, cache_dir=cache_dir).is_missing(
+        INDEX_URL, 'foo-bar')
+
+
+def test_entries_expire(cache_dir, monkeypatch):
+    cache = NotFoundCache(ttl=60, cache_dir=cache_dir)
+    cache.add(INDEX_URL + 'old/')
+    cache.flush()
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+
+    assert not cache.is_missing(INDEX_URL, 'old')
+
+    cache.add(INDEX_URL + 'new/')
+    cache.flush()
+
+    assert list(NotFoundCache(ttl=60, cache_dir=cache_dir).cache) == [
+        INDEX_URL + 'new/']
@@ -1,11 +1,18 @@
 from __future__ import unicode_literals
 
+import io
+
+import mock
 import pytest
+from click.testing import CliRunner
 
+from prequ.result_cache import ResultCache
 from prequ.scripts.check import main as check_main
+from prequ.scripts.update import main as update_main
+from prequ.writer import read_input_digest
 
 from .dirs import FAKE_PYPI_WHEELS_DIR
-from .utils import check_successful_exit, make_cli_runner
+from .utils import check_successful_exit, create_configuration, make_cli_runner
 
 run_check = make_cli_runner(check_main, [])
 
@@ -72,3 +79,70 @@ def run_check(pip_conf, txt_content, mode='default'):
     }
     with runner(pip_conf, **conf) as out:
         return out
+
+
+def test_fast_check(pip_conf):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        options = {'wheel_dir': FAKE_PYPI_WHEELS_DIR, 'input_digest': 'true'}
+        requirements = {'base': ['tiny-depender'], 'dev': ['tiny-dependee']}
+        create_configuration(options, requirements)
+        check_successful_exit(runner.invoke(update_main, []))
+        assert read_input_digest('requirements.txt').startswith('sha256:')
+        assert read_input_digest('requirements-dev.txt').startswith('sha256:')
+
+        out = runner.invoke(check_main, ['--fast'])
+        check_successful_exit(out)
+        assert out.output == (
+            'requirements.txt is OK\n'
+            'requirements-dev.txt is OK\n')
+
+        create_configuration(options, dict(
+            requirements, dev=['tiny-dependee', 'tiny-depender']))
+        out = runner.invoke(check_main, ['--fast'])
+        assert out.exit_code == 1
+        assert out.output == (
+            'requirements.txt is OK\n'
+            'requirements-dev.txt is outdated\n')
+
+        # The input digest is kept when the input is unchanged
+        check_successful_exit(runner.invoke(update_main, []))
+        check_successful_exit(runner.invoke(check_main, ['--fast']))
+        check_successful_exit(runner.invoke(check_main, []))
+
+
+def test_fast_check_without_digest(pip_conf):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        create_configuration(
+            {'wheel_dir': FAKE_PYPI_WHEELS_DIR}, ['tiny-depender'])
+        with io.open('requirements.txt', 'wt') as fp:
+            fp.write(UP_TO_DATE_REQ_TXT)
+
+        out = runner.invoke(check_main, ['--fast'])
+        assert out.exit_code == 1
+        assert 'requirements.txt has no input digest' in out.output
+
+
+def test_check_uses_result_cache(pip_conf, tmpdir):
+    cache_dir = str(tmpdir.join('results'))
+    runner = CliRunner()
+    with runner.isolated_filesystem(), mock.patch(
+            'prequ.scripts.compile_in.ResultCache',
+            new=lambda: ResultCache(cache_dir)):
+        create_configuration(
+            {'wheel_dir': FAKE_PYPI_WHEELS_DIR, 'result_cache': 'true'},
+            {'base': ['tiny-depender'], 'dev': ['tiny-dependee']})
+        check_successful_exit(runner.invoke(update_main, []))
+
+        for _ in range(2):
+            with mock.patch('prequ.scripts.compile_in.Resolver') as resolver:
+                out = runner.invoke(check_main, [])
+            check_successful_exit(out)
+            assert out.output == (
+                'requirements.txt is OK\n'
+                'requirements-dev.txt is OK\n')
+            assert not resolver.called
+
+        # One result per label and existing pins, not per run
+        assert len(tmpdir.join('results').listdir()) <= 4
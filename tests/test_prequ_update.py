@@ -4,11 +4,15 @@ from __future__ import unicode_literals
 
 import io
 import os
+import re
 
+import mock
 import pytest
 
 from prequ.configuration import (
     InvalidPrequConfiguration, NoPrequConfigurationFound)
+from prequ.scripts import _repo
+from prequ.scripts.compile import main as compile_main
 from prequ.scripts.update import main as update_main
 
 from .dirs import FAKE_PYPI_WHEELS_DIR
@@ -166,6 +170,58 @@ def test_conf_merging(pip_conf):
             txt_prelude + 'tiny-dependee==1.0\n')
 
 
+def test_labels_share_repository(pip_conf):
+    conf = {
+        'options': {'wheel_dir': FAKE_PYPI_WHEELS_DIR},
+        'requirements': {
+            'base': ['small-fake-a'],
+            'dev': ['small-fake-b'],
+            'test': ['tiny-depender'],
+        },
+    }
+    repository_class = mock.Mock(wraps=_repo.PyPIRepository)
+    with mock.patch.object(_repo, 'PyPIRepository', new=repository_class):
+        with run_check(pip_conf, **conf) as result:
+            check_successful_exit(result)
+            assert _read_text_file('requirements-test.txt').endswith(
+                '\ntiny-dependee==1.0\ntiny-depender==1.1\n')
+    assert repository_class.call_count == 1
+
+
+@pytest.mark.parametrize('jobs', ['1', '3'])
+def test_compile_jobs(pip_conf, jobs):
+    conf = {
+        'options': {'wheel_dir': FAKE_PYPI_WHEELS_DIR},
+        'requirements': {
+            'base': ['small-fake-a'],
+            'dev': ['small-fake-b'],
+            'docs': ['small-fake-a', 'tiny-dependee'],
+            'test': ['tiny-depender'],
+        },
+    }
+    txt_prelude = HEADER + '--trusted-host localhost\n\n'
+    run = make_cli_runner(compile_main, ['-v', '--jobs', jobs])
+    with run(pip_conf, **conf) as result:
+        check_successful_exit(result)
+        assert [
+            line for line in result.output.splitlines()
+            if line.startswith('***') or re.match(r'^[\w-]+==[\d.]+$', line)] == [
+                '*** Compiling requirements.txt',
+                'small-fake-a==0.2',
+                '*** Compiling requirements-dev.txt',
+                'small-fake-b==0.3',
+                '*** Compiling requirements-docs.txt',
+                'small-fake-a==0.2',
+                'tiny-dependee==1.0',
+                '*** Compiling requirements-test.txt',
+                'tiny-dependee==1.0',
+                'tiny-depender==1.1']
+        assert _read_text_file('requirements-docs.txt') == (
+            txt_prelude + 'small-fake-a==0.2\ntiny-dependee==1.0\n')
+        assert _read_text_file('requirements-test.txt') == (
+            txt_prelude + 'tiny-dependee==1.0\ntiny-depender==1.1\n')
+
+
 def test_only_in_files(pip_conf_with_wheeldir):
     conf = {
         'no_setup_cfg': True,
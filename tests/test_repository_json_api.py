@@ -0,0 +1,167 @@
+import hashlib
+import json
+
+import pytest
+
+from prequ.repositories import JsonApiRepository
+
+from .http_server import FileServer
+from .test_repository_pypi import get_repository
+
+
+def get_fake_digest(filename):
+    return hashlib.sha256(filename.encode('utf-8')).hexdigest()
+
+
+def make_file(server, filename, packagetype='bdist_wheel', **kwargs):
+    file_info = {
+        'filename': filename,
+        'url': '{}/files/{}'.format(server.url, filename),
+        'packagetype': packagetype,
+        'digests': {'sha256': get_fake_digest(filename)},
+        'requires_python': None,
+        'yanked': False,
+    }
+    file_info.update(kwargs)
+    return file_info
+
+
+def write_json(api_dir, path, doc):
+    api_dir.ensure(*path.split('/')).write(json.dumps(doc))
+
+
+@pytest.fixture
+def server(tmpdir):
+    with FileServer(str(tmpdir)) as server:
+        api_dir = tmpdir.join('pypi')
+        write_json(api_dir, 'extra-fake/json', {'releases': {
+            '1.0': [
+                make_file(server, 'extra_fake-1.0-py2.py3-none-any.whl'),
+                make_file(server, 'extra_fake-1.0.tar.gz', 'sdist'),
+            ],
+            '1.1': [
+                make_file(server, 'extra_fake-1.1-py2.py3-none-any.whl'),
+            ],
+            '2.0': [
+                make_file(server, 'extra_fake-2.0-py2.py3-none-any.whl',
+                          requires_python='<2'),
+            ],
+            '3.0': [
+                make_file(server, 'extra_fake-3.0-py2.py3-none-any.whl',
+                          yanked=True),
+            ],
+            '4.0': [
+                make_file(server, 'extra_fake-4.0-cp99-cp99-win_amd64.whl'),
+            ],
+            '5.0b1': [
+                make_file(server, 'extra_fake-5.0b1-py2.py3-none-any.whl'),
+            ],
+        }})
+        write_json(api_dir, 'extra-fake/1.1/json', {'info': {
+            'requires_dist': [
+                'always', 'never ; python_version < "1.0"',
+                'for-tests ; extra == "test"'],
+            'provides_extra': ['test'],
+        }})
+        write_json(api_dir, 'extra-fake/1.0/json', {'info': {
+            'requires_dist': None,
+        }})
+        server.api_dir = api_dir
+        yield server
+
+
+@pytest.fixture
+def repository(server, minimal_wheels_dir):
+    return JsonApiRepository(server.url + '/pypi/', get_repository(
+        ['--no-index', '--find-links', minimal_wheels_dir]))
+
+
+@pytest.mark.parametrize('line,expected', [
+    ('extra-fake', 'extra-fake==1.1'),
+    ('extra-fake<1.1', 'extra-fake==1.0'),
+    ('extra-fake>=5.0b1', 'extra-fake==5.0b1'),
+    ('tiny-depender', 'tiny-depender==1.1'),  # Not in the JSON API
+])
+def test_find_best_match(repository, from_line, line, expected):
+    assert str(repository.find_best_match(from_line(line)).req) == expected
+
+
+def test_find_all_candidates_skips_unusable_files(repository):
+    candidates = repository.find_all_candidates('extra_fake')
+
+    assert [x.link.filename for x in candidates] == [
+        'extra_fake-1.0-py2.py3-none-any.whl',
+        'extra_fake-1.0.tar.gz',
+        'extra_fake-1.1-py2.py3-none-any.whl',
+        'extra_fake-5.0b1-py2.py3-none-any.whl',
+    ]
+
+
+@pytest.mark.parametrize('line,expected', [
+    ('extra-fake==1.1', ['always']),
+    ('extra-fake[test]==1.1', ['always', 'for-tests']),
+])
+def test_get_dependencies_from_requires_dist(
+        repository, server, from_line, line, expected):
+    dependencies = repository.get_dependencies(from_line(line))
+
+    assert sorted(str(dep.req) for dep in dependencies) == expected
+    assert not [path for (_, path, _) in server.requests
+                if path.startswith('/files/')]
+
+
+def test_get_dependencies_falls_back_without_requires_dist(
+        repository, server, from_line):
+    write_json(server.api_dir, 'tiny-depender/1.1/json', {'info': {}})
+
+    dependencies = repository.get_many_dependencies([
+        from_line('tiny-depender==1.1'),
+        from_line('extra-fake==1.1'),
+    ])
+
+    assert [sorted(str(dep.req) for dep in x) for x in dependencies] == [
+        ['tiny-dependee'], ['always']]
+
+
+def test_get_hashes_from_digests(repository, from_line):
+    hashes = repository.get_hashes(from_line('extra-fake==1.0'))
+
+    assert hashes == {
+        'sha256:' + get_fake_digest('extra_fake-1.0-py2.py3-none-any.whl'),
+        'sha256:' + get_fake_digest('extra_fake-1.0.tar.gz')}
+
+
+def test_get_hashes_of_project_not_in_json_api(repository, from_line):
+    hashes = repository.get_hashes(from_line('small-fake-a==0.1'))
+
+    assert len(hashes) == 1
+    assert next(iter(hashes)).startswith('sha256:')
+
+
+def test_prefetch_candidates_concurrently(repository, server, from_line):
+    repository.repository.fetch_jobs = 2
+
+    repository.prefetch_candidates([
+        from_line('extra-fake'), from_line('tiny-depender')])
+
+    assert sorted(path for (_, path, _) in server.requests) == [
+        '/pypi/extra-fake/json', '/pypi/tiny-depender/json']
+
+
+def test_find_all_candidates_includes_find_links(server, tmpdir, from_line):
+    wheel_dir = tmpdir.ensure_dir('wheels')
+    wheel_dir.ensure('extra_fake-9.0-py2.py3-none-any.whl')
+    repository = JsonApiRepository(server.url + '/pypi/', get_repository(
+        ['--no-index', '--find-links', str(wheel_dir)]))
+
+    candidates = repository.find_all_candidates('extra-fake')
+
+    assert [x.link.filename for x in candidates] == [
+        'extra_fake-9.0-py2.py3-none-any.whl',
+        'extra_fake-1.0-py2.py3-none-any.whl',
+        'extra_fake-1.0.tar.gz',
+        'extra_fake-1.1-py2.py3-none-any.whl',
+        'extra_fake-5.0b1-py2.py3-none-any.whl',
+    ]
+    best_match = repository.find_best_match(from_line('extra-fake'))
+    assert str(best_match.req) == 'extra-fake==9.0'
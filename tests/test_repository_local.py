@@ -83,6 +83,19 @@ def test_get_hashes_local_repository_cache_hit(from_line, repository):
     assert hashes
 
 
+def test_get_many_hashes_local_repository(from_line, repository):
+    options = {'hashes': {'sha256': ['0123abcd']}}
+    req = from_line('cffi==1.9.1', options=options)
+    local_repository = LocalRequirementsRepository({'cffi': req}, repository)
+
+    cffi = from_line('cffi==1.9.1')
+    six = from_line('six==1.10.0')
+    hashes = local_repository.get_many_hashes([cffi, six])
+
+    assert hashes[cffi] == {'sha256:0123abcd'}
+    assert hashes[six] == repository.get_hashes(six)
+
+
 def ireq(line, extras=None):
     sorted_extras = ','.join(sorted((extras or '').split(',')))
     extras_str = '[{}]'.format(sorted_extras) if sorted_extras else ''
@@ -120,6 +133,16 @@ def test_find_best_match(existing_pin, to_find, pin_matches,
         assert result == 'fallback_result'
 
 
+def test_prefetch_candidates_skips_satisfied_pins():
+    fallback_repo = mock.create_autospec(PyPIRepository)
+    pin = ireq('foobar==1.2.4')
+    repo = LocalRequirementsRepository({key_from_ireq(pin): pin}, fallback_repo)
+    satisfied = ireq('foobar>=1.2')
+    unsatisfied = ireq('baz>=1.0')
+    repo.prefetch_candidates([satisfied, unsatisfied])
+    fallback_repo.prefetch_candidates.assert_called_once_with([unsatisfied])
+
+
 def test_find_best_match_preserves_period():
     fallback_repo = mock.create_autospec(PyPIRepository)
     pin = ireq('foo.bar==42.0')
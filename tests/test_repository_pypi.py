@@ -1,13 +1,24 @@
+import collections
+import hashlib
 import os
+import shutil
+import tarfile
+import threading
+import time
 
 import mock
 import pytest
 
-from prequ._pip_compat import PIP_10_OR_NEWER, PIP_192_OR_NEWER, path_to_url
-from prequ.exceptions import DependencyResolutionFailed
+from prequ._pip_compat import (
+    PIP_10_OR_NEWER, PIP_192_OR_NEWER, InstallationCandidate, Link,
+    parse_requirements, path_to_url)
+from prequ.candidate_index import CandidateIndex
+from prequ.exceptions import DependencyResolutionFailed, OfflineCacheMiss
 from prequ.repositories.pypi import PyPIRepository
 from prequ.scripts._repo import get_pip_command
 
+from .http_server import FileServer
+
 PY27_LINUX64_TAGS = [
     ('cp27', 'cp27mu', 'manylinux1_x86_64'),
     ('cp27', 'cp27mu', 'linux_x86_64'),
@@ -119,6 +130,81 @@ def test_generate_hashes_without_interfering_with_each_other(from_line):
     repository.get_hashes(from_line('matplotlib==2.0.2'))
 
 
+def test_get_hashes_uses_hash_fragments(from_line):
+    repository = get_repository()
+    repository._available_candidates_cache['foo'] = [
+        InstallationCandidate('foo', version, Link(url))
+        for (version, url) in [
+            ('1.0', 'https://example.com/foo-1.0.tar.gz#sha256=0123abcd'),
+            ('1.0', 'https://example.com/foo-1.0-py2-none-any.whl#md5=4567'),
+            ('1.0', 'https://example.com/foo-1.0-py3-none-any.whl'),
+            ('1.1', 'https://example.com/foo-1.1.tar.gz'),
+        ]]
+    downloaded = []
+
+    def get_file_hash(link):
+        downloaded.append(link.url)
+        return 'sha256:downloaded'
+
+    repository._get_file_hash = get_file_hash
+    # Make the HEAD requests of the hash cache return no ETag
+    repository.hash_cache.session = mock.Mock(
+        head=mock.Mock(return_value=mock.Mock(headers={})))
+    hashes = repository.get_hashes(from_line('foo==1.0'))
+
+    assert hashes == {'sha256:0123abcd', 'sha256:downloaded'}
+    assert sorted(downloaded) == [
+        'https://example.com/foo-1.0-py2-none-any.whl#md5=4567',
+        'https://example.com/foo-1.0-py3-none-any.whl']
+
+
+def test_get_many_hashes_limits_downloads_per_host(from_line):
+    repository = get_repository()
+    repository.hash_jobs = 4
+    repository.max_downloads_per_host = 1
+    repository.hash_cache.session = mock.Mock(
+        head=mock.Mock(return_value=mock.Mock(headers={})))
+    for name in ['foo', 'bar']:
+        repository._available_candidates_cache[name] = [
+            InstallationCandidate(name, '1.0', Link(
+                'https://{}.example.com/{}-1.0-{}.whl'.format(host, name, n)))
+            for host in ['one', 'two'] for n in range(3)]
+    lock = threading.Lock()
+    active = collections.Counter()
+    max_active = collections.Counter()
+
+    def get_file_hash(link):
+        host = link.url.split('/')[2]
+        with lock:
+            active[host] += 1
+            max_active[host] = max(max_active[host], active[host])
+        time.sleep(0.01)
+        with lock:
+            active[host] -= 1
+        return 'sha256:' + link.filename
+
+    repository._get_file_hash = get_file_hash
+    foo = from_line('foo==1.0')
+    bar = from_line('bar==1.0')
+    hashes = repository.get_many_hashes([foo, bar])
+
+    assert hashes[foo] == {
+        'sha256:foo-1.0-{}.whl'.format(n) for n in range(3)}
+    assert len(hashes[bar]) == 3
+    assert max_active == {'one.example.com': 1, 'two.example.com': 1}
+
+
+@pytest.mark.parametrize('content', [b'', b'content of the file'])
+def test_get_file_hash_of_local_file(tmpdir, content):
+    path = tmpdir.join('foo-1.0.tar.gz')
+    path.write_binary(content)
+    repository = get_repository()
+
+    file_hash = repository._get_file_hash(Link(path_to_url(str(path))))
+
+    assert file_hash == 'sha256:' + hashlib.sha256(content).hexdigest()
+
+
 def test_get_hashes_non_pinned(from_line):
     repository = get_repository()
     with pytest.raises(ValueError):
@@ -161,13 +247,152 @@ def test_failing_setup_script(from_editable):
     assert (import_error in error_message) or (import_error2 in error_message)
 
 
-def get_repository():
-    pip_command = get_pip_command()
-    pip_options, _ = pip_command.parse_args([
-        '--index-url', PyPIRepository.DEFAULT_INDEX_URL
+def test_prefetch_candidates_concurrently(from_line, from_editable):
+    repository = get_repository()
+    repository.fetch_jobs = 4
+    fetched = []
+
+    def find_all_candidates(name):
+        fetched.append(name)
+        return ['candidates of ' + name]
+
+    repository.finder = mock.Mock(
+        find_all_candidates=find_all_candidates, find_links=[],
+        index_urls=[PyPIRepository.DEFAULT_INDEX_URL])
+    repository._available_candidates_cache['cached'] = ['cached candidates']
+    repository.prefetch_candidates([
+        from_line('first>=1.0'),
+        from_line('second'),
+        from_line('first<2.0'),
+        from_line('cached'),
+        from_editable('git+https://github.com/django/django.git#egg=django'),
     ])
+
+    assert sorted(fetched) == ['first', 'second']
+    assert repository.find_all_candidates('first') == ['candidates of first']
+    assert repository.find_all_candidates('second') == ['candidates of second']
+    assert repository.find_all_candidates('cached') == ['cached candidates']
+
+
+def test_prefetch_candidates_does_nothing_with_one_job(from_line):
+    repository = get_repository()
+    repository.finder = mock.Mock()
+    repository.prefetch_candidates([from_line('first'), from_line('second')])
+    assert not repository.finder.find_all_candidates.called
+
+
+def test_get_many_dependencies_in_processes(from_line, minimal_wheels_dir):
+    repository = get_repository(
+        ['--no-index', '--find-links', minimal_wheels_dir], build_jobs=2)
+
+    dependency_sets = repository.get_many_dependencies([
+        from_line('tiny-depender==1.1'),
+        from_line('small-fake-a==0.1'),
+        from_line('tiny-dependee==1.0'),
+    ])
+
+    assert [sorted(str(dep.req) for dep in dependencies)
+            for dependencies in dependency_sets] == [
+                ['tiny-dependee'], [], []]
+
+
+def test_get_many_dependencies_in_processes_uses_finder_indexes(
+        tmpdir, minimal_wheels_dir):
+    wheels = {
+        'tiny-depender': 'tiny_depender-1.1-py2.py3-none-any.whl',
+        'tiny-dependee': 'tiny_dependee-1.0-py2.py3-none-any.whl',
+        'small-fake-a': 'small_fake_a-0.1-py2.py3-none-any.whl',
+    }
+    for (project, wheel) in wheels.items():
+        project_dir = tmpdir.ensure_dir('index', 'simple', project)
+        shutil.copy(os.path.join(minimal_wheels_dir, wheel), str(project_dir))
+    with FileServer(str(tmpdir.join('index'))) as server:
+        requirements_file = tmpdir.join('requirements.in')
+        requirements_file.write(
+            '-i {}/simple/\ntiny-depender==1.1\nsmall-fake-a==0.1\n'.format(
+                server.url))
+        repository = get_repository(['--no-index'], build_jobs=2)
+        ireqs = list(parse_requirements(
+            str(requirements_file), finder=repository.finder,
+            session=repository.session, options=repository.pip_options))
+        repository._find_dependencies = mock.Mock(
+            side_effect=AssertionError('Not prepared in a worker'))
+
+        dependency_sets = repository.get_many_dependencies(ireqs)
+
+    assert [sorted(str(dep.req) for dep in dependencies)
+            for dependencies in dependency_sets] == [['tiny-dependee'], []]
+    page_requests = [x[1] for x in server.requests if x[1].endswith('/')]
+    assert sorted(page_requests) == [
+        '/simple/small-fake-a/', '/simple/tiny-depender/']
+
+
+def test_get_many_dependencies_reports_failure(from_line, minimal_wheels_dir):
+    repository = get_repository(
+        ['--no-index', '--find-links', minimal_wheels_dir], build_jobs=2)
+
+    with pytest.raises(DependencyResolutionFailed):
+        repository.get_many_dependencies([
+            from_line('small-fake-a==0.1'),
+            from_line('small-fake-a==9.9'),
+        ])
+
+
+def test_candidate_cache_with_find_links(minimal_wheels_dir):
+    repository = get_repository(
+        ['--no-index', '--find-links', minimal_wheels_dir], candidate_ttl=0)
+
+    candidates = repository.find_all_candidates('small-fake-b')
+
+    assert sorted(str(x.version) for x in candidates) == ['0.1', '0.2', '0.3']
+
+
+def test_candidate_cache_requests_each_page_once(tmpdir, minimal_wheels_dir):
+    project_dir = tmpdir.ensure_dir('index', 'simple', 'small-fake-a')
+    shutil.copy(os.path.join(
+        minimal_wheels_dir, 'small_fake_a-0.1-py2.py3-none-any.whl'),
+        str(project_dir))
+    with FileServer(str(tmpdir.join('index'))) as server:
+        for _ in range(2):  # Cold and revalidated lookup
+            repository = get_repository(
+                ['-i', server.url + '/simple/'], candidate_ttl=0)
+            candidates = repository.find_all_candidates('small-fake-a')
+            assert [str(x.version) for x in candidates] == ['0.1']
+
+    page_requests = [
+        x for x in server.requests if x[1] == '/simple/small-fake-a/']
+    assert len(page_requests) == 2
+
+
+def test_candidate_cache_caches_each_index():
+    repository = get_repository([
+        '--index-url', 'https://first.example.com/simple/',
+        '--extra-index-url', 'https://second.example.com/simple/'],
+        candidate_ttl=0)
+    cached = []
+
+    def get_candidates(index_url, project_name, find_all_candidates):
+        cached.append((index_url, project_name))
+        return ['candidate from ' + index_url]
+
+    repository.candidate_cache = mock.Mock(get_candidates=get_candidates)
+    candidates = repository.find_all_candidates('foo')
+
+    assert cached == [
+        ('https://first.example.com/simple/', 'foo'),
+        ('https://second.example.com/simple/', 'foo')]
+    assert candidates == [
+        'candidate from https://first.example.com/simple/',
+        'candidate from https://second.example.com/simple/']
+
+
+def get_repository(args=None, **kwargs):
+    if args is None:
+        args = ['--index-url', PyPIRepository.DEFAULT_INDEX_URL]
+    pip_command = get_pip_command()
+    pip_options, _ = pip_command.parse_args(args)
     session = pip_command._build_session(pip_options)
-    return PyPIRepository(pip_options, session)
+    return PyPIRepository(pip_options, session, **kwargs)
 
 
 def test_get_hashes_editable_empty_set(from_editable):
@@ -179,3 +404,222 @@ def test_get_hashes_editable_empty_set(from_editable):
     repository = PyPIRepository(pip_options, session)
     ireq = from_editable('git+https://github.com/django/django.git#egg=django')
     assert repository.get_hashes(ireq) == set()
+
+
+def test_fetches_candidates_from_indexes_concurrently(
+        tmpdir, minimal_wheels_dir):
+    servers = []
+    for (n, version) in enumerate(['0.1', '0.2']):
+        project_dir = tmpdir.ensure_dir('index{}'.format(n), 'simple', 'small-fake-a')
+        shutil.copy(os.path.join(
+            minimal_wheels_dir, 'small_fake_a-{}-py2.py3-none-any.whl'.format(version)),
+            str(project_dir))
+        servers.append(FileServer(str(tmpdir.join('index{}'.format(n)))))
+    with servers[0], servers[1]:
+        repository = get_repository([
+            '--index-url', servers[1].url + '/simple/',
+            '--extra-index-url', servers[0].url + '/simple/',
+            '--find-links', minimal_wheels_dir], fetch_jobs=3)
+        lock = threading.Lock()
+        active = [0, 0]
+        find_candidates_with = repository._find_candidates_with
+
+        def find_candidates_tracking_activity(finder, req_name):
+            with lock:
+                active[0] += 1
+                active[1] = max(active)
+            time.sleep(0.05)
+            try:
+                return find_candidates_with(finder, req_name)
+            finally:
+                with lock:
+                    active[0] -= 1
+
+        repository._find_candidates_with = find_candidates_tracking_activity
+        candidates = repository.find_all_candidates('small-fake-a')
+
+    # Find links first, then the indexes in the configured order
+    assert [(x.link.netloc, str(x.version)) for x in candidates][2:] == [
+        (servers[1].url.split('/')[2], '0.2'),
+        (servers[0].url.split('/')[2], '0.1')]
+    assert sorted(str(x.version) for x in candidates[:2]) == ['0.1', '0.2']
+    assert active[1] == 3
+
+
+def test_connection_pools_fit_concurrent_requests():
+    repository = get_repository([
+        '--index-url', 'https://first.example.com/simple/',
+        '--extra-index-url', 'https://second.example.com/simple/'],
+        fetch_jobs=8)
+
+    assert repository.session.adapters['https://']._pool_maxsize == 24
+
+
+def test_offline_uses_stored_candidates(tmpdir, minimal_wheels_dir, from_line):
+    project_dir = tmpdir.ensure_dir('index', 'simple', 'small-fake-a')
+    shutil.copy(os.path.join(
+        minimal_wheels_dir, 'small_fake_a-0.1-py2.py3-none-any.whl'),
+        str(project_dir))
+    with FileServer(str(tmpdir.join('index'))) as server:
+        index_url = server.url + '/simple/'
+        online_repository = get_repository(['-i', index_url], candidate_ttl=0)
+        online_repository.find_all_candidates('small-fake-a')
+
+    repository = get_repository(['-i', index_url], offline=True)
+
+    candidates = repository.find_all_candidates('small-fake-a')
+    assert [str(x.version) for x in candidates] == ['0.1']
+    with pytest.raises(OfflineCacheMiss) as excinfo:
+        repository.prefetch_candidates([
+            from_line('small-fake-b'), from_line('small-fake-c')])
+    assert excinfo.value.missing == [
+        'candidates of small-fake-b from ' + index_url,
+        'candidates of small-fake-c from ' + index_url]
+    with pytest.raises(OfflineCacheMiss) as excinfo:
+        repository.get_dependencies(from_line('small-fake-a==0.1'))
+    assert excinfo.value.missing == ['dependencies of small-fake-a==0.1']
+    with pytest.raises(OfflineCacheMiss) as excinfo:
+        repository.get_hashes(from_line('small-fake-a==0.1'))
+    assert excinfo.value.missing == [
+        'hash of {}small-fake-a/small_fake_a-0.1-py2.py3-none-any.whl'.format(
+            index_url)]
+
+
+def test_offline_reads_local_index(tmpdir, minimal_wheels_dir, from_line):
+    project_dir = tmpdir.ensure_dir('index', 'small-fake-a')
+    shutil.copy(os.path.join(
+        minimal_wheels_dir, 'small_fake_a-0.1-py2.py3-none-any.whl'),
+        str(project_dir))
+    project_dir.join('index.html').write(
+        '<a href="small_fake_a-0.1-py2.py3-none-any.whl">'
+        'small_fake_a-0.1-py2.py3-none-any.whl</a>')
+    index_url = path_to_url(str(tmpdir.join('index'))) + '/'
+    repository = get_repository(['-i', index_url], offline=True)
+
+    best_match = repository.find_best_match(from_line('small-fake-a'))
+
+    assert str(best_match.req) == 'small-fake-a==0.1'
+    assert len(repository.get_hashes(best_match)) == 1
+
+
+def test_offline_reports_remote_find_links(minimal_wheels_dir):
+    repository = get_repository([
+        '--no-index', '--find-links', minimal_wheels_dir,
+        '--find-links', 'https://example.com/wheels/'], offline=True)
+
+    with pytest.raises(OfflineCacheMiss) as excinfo:
+        repository.find_all_candidates('small-fake-a')
+    assert excinfo.value.missing == [
+        'candidates of small-fake-a from https://example.com/wheels/']
+
+
+def test_offline_with_local_find_links(minimal_wheels_dir, from_line):
+    repository = get_repository([
+        '--no-index', '--find-links', minimal_wheels_dir], offline=True)
+    repository.build_jobs = 2
+
+    dependencies = repository.get_many_dependencies([
+        from_line('tiny-depender==1.1'), from_line('small-fake-a==0.1')])
+    assert [sorted(str(x.req) for x in deps) for deps in dependencies] == [
+        ['tiny-dependee'], []]
+    assert len(repository.get_hashes(from_line('small-fake-a==0.1'))) == 1
+
+
+def test_find_links_directories_are_indexed(minimal_wheels_dir):
+    repository = get_repository(
+        ['--no-index', '--find-links', minimal_wheels_dir])
+    get_paths = mock.Mock(wraps=repository.find_links_index.get_paths)
+    repository.find_links_index.get_paths = get_paths
+
+    candidates = repository.find_all_candidates('small-fake-b')
+
+    get_paths.assert_called_once_with(minimal_wheels_dir, 'small-fake-b')
+    assert sorted(str(x.version) for x in candidates) == ['0.1', '0.2', '0.3']
+    assert len(set(x.link.url for x in candidates)) == 3
+
+
+def test_not_found_cache_skips_missing_projects(tmpdir, minimal_wheels_dir):
+    tmpdir.ensure_dir('private', 'simple')
+    project_dir = tmpdir.ensure_dir('public', 'simple', 'small-fake-a')
+    shutil.copy(os.path.join(
+        minimal_wheels_dir, 'small_fake_a-0.1-py2.py3-none-any.whl'),
+        str(project_dir))
+    public_server = FileServer(str(tmpdir.join('public')))
+    private_server = FileServer(str(tmpdir.join('private')))
+    with public_server, private_server:
+        for _ in range(2):
+            repository = get_repository([
+                '--index-url', public_server.url + '/simple/',
+                '--extra-index-url', private_server.url + '/simple/'],
+                not_found_ttl=60)
+            candidates = repository.find_all_candidates('small-fake-a')
+            assert [str(x.version) for x in candidates] == ['0.1']
+
+    assert [path for (_, path, _) in private_server.requests] == [
+        '/simple/small-fake-a/']
+    assert [path for (_, path, _) in public_server.requests].count(
+        '/simple/small-fake-a/') == 2
+
+
+def test_candidate_index_is_built_once_per_project(minimal_wheels_dir, from_line):
+    repository = get_repository(
+        ['--no-index', '--find-links', minimal_wheels_dir])
+
+    with mock.patch('prequ.repositories.pypi.CandidateIndex', wraps=CandidateIndex) as index_class:
+        best_matches = [
+            repository.find_best_match(from_line(line))
+            for line in ['small-fake-b', 'small-fake-b<0.3', 'small-fake-b==0.1']]
+
+    assert [str(x.req) for x in best_matches] == [
+        'small-fake-b==0.3', 'small-fake-b==0.2', 'small-fake-b==0.1']
+    assert index_class.call_count == 1
+
+
+def test_requirements_are_prepared_once(minimal_wheels_dir, from_line):
+    repository = get_repository(
+        ['--no-index', '--find-links', minimal_wheels_dir])
+    repository._find_dependencies = mock.Mock(
+        wraps=repository._find_dependencies)
+    ireq = from_line('tiny-depender==1.1')
+
+    dependencies = [
+        repository.get_dependencies(ireq),
+        repository.get_dependencies(ireq),
+        repository.get_dependencies(from_line('tiny-depender==1.1'))]
+
+    assert repository._find_dependencies.call_count == 1
+    assert [sorted(str(x.req) for x in deps) for deps in dependencies] == [
+        ['tiny-dependee']] * 3
+
+
+def test_build_dirs_are_separate_for_each_version(from_line):
+    repository = get_repository()
+    build_dirs = [
+        repository._get_build_dirs(from_line(line))
+        for line in ['foo==1.0', 'foo==2.0', 'foo[bar]==1.0', 'Foo==1.0']]
+
+    assert len(set(build_dirs)) == 3
+    assert build_dirs[0] == build_dirs[3]
+    assert all(
+        os.path.dirname(build_dir) == repository.build_dir and
+        os.path.dirname(source_dir) == repository.source_dir
+        for (build_dir, source_dir) in build_dirs)
+
+
+def test_sdist_metadata_is_reused(tmpdir, from_line):
+    dists_dir = tmpdir.ensure_dir('dists')
+    with tarfile.open(str(dists_dir.join('small_fake_with_deps-0.1.tar.gz')), 'w:gz') as tar:
+        tar.add(os.path.join(os.path.dirname(__file__), 'test_data', 'small_fake_package'),
+                arcname='small_fake_with_deps-0.1')
+
+    def get_dependencies():
+        repository = get_repository(['--no-index', '--find-links', str(dists_dir)])
+        repository._get_dependencies_with_wheel_cache = mock.Mock(
+            wraps=repository._get_dependencies_with_wheel_cache)
+        dependencies = repository.get_dependencies(
+            from_line('small_fake_with_deps==0.1'))
+        prepare_count = repository._get_dependencies_with_wheel_cache.call_count
+        return (sorted(str(x.req) for x in dependencies), prepare_count)
+
+    assert get_dependencies() == (['six==1.10.0'], 1)
+    assert get_dependencies() == (['six==1.10.0'], 0)
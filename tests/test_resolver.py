@@ -1,5 +1,7 @@
 import pytest
 
+from prequ.cache import DependencyCache
+
 
 @pytest.mark.parametrize(
     ('input', 'expected', 'prereleases'),
@@ -115,7 +117,8 @@ import pytest
          ),
     ])
 )
-def test_resolver(resolver, from_line, input, expected, prereleases):
+@pytest.mark.parametrize('incremental', [False, True])
+def test_resolver(resolver, from_line, input, expected, prereleases, incremental):
     input_tuples = (
         line if isinstance(line, tuple) else (line, False)
         for line in input)
@@ -125,7 +128,8 @@ def test_resolver(resolver, from_line, input, expected, prereleases):
     (expected_results, expected_unsafe) = (
         expected if isinstance(expected, tuple) else (expected, []))
 
-    resolver_obj = resolver(input_ireqs, prereleases=prereleases)
+    resolver_obj = resolver(input_ireqs, prereleases=prereleases,
+                            incremental=incremental)
     result = resolver_obj.resolve()
 
     result_output = {str(line) for line in result}
@@ -157,3 +161,68 @@ def test_resolver__allows_unsafe_deps(resolver, from_line, input, expected, prer
     output = resolver(input, prereleases=prereleases, allow_unsafe=True).resolve()
     output = {str(line) for line in output}
     assert output == {str(line) for line in expected}
+
+
+def test_resolver__incremental_skips_unchanged_packages(resolver, from_line):
+    resolver_obj = resolver([from_line('Flask')], incremental=True)
+    result = resolver_obj.resolve()
+
+    assert {str(x) for x in result} == {
+        'flask==0.10.1', 'itsdangerous==0.24', 'markupsafe==0.23',
+        'jinja2==2.7.3', 'werkzeug==0.10.4'}
+    # Round 1 evaluates flask, round 2 its three dependencies and round
+    # 3 markupsafe (required by jinja2).  Flask is reused in rounds 2
+    # and 3 and its dependencies in round 3.
+    assert resolver_obj.evaluation_count == 5
+    assert resolver_obj.skipped_evaluation_count == 5
+
+
+def test_resolver__non_incremental_does_not_skip(resolver, from_line):
+    resolver_obj = resolver([from_line('Flask')])
+    resolver_obj.resolve()
+
+    assert resolver_obj.evaluation_count == 0
+    assert resolver_obj.skipped_evaluation_count == 0
+
+
+def test_resolver__gets_uncached_dependencies_in_batches(resolver, from_line, repository):
+    batches = []
+    get_many_dependencies = repository.get_many_dependencies
+
+    def record_batch(ireqs):
+        batches.append(sorted(str(ireq) for ireq in ireqs))
+        return get_many_dependencies(ireqs)
+
+    repository.get_many_dependencies = record_batch
+    resolver_obj = resolver([from_line('Flask')], incremental=True)
+    resolver_obj.resolve()
+
+    # Flask alone is fetched without a batch and markupsafe of round 3
+    # too, but the dependencies of Flask are fetched in one batch
+    assert batches == [
+        ['itsdangerous==0.24', 'jinja2==2.7.3', 'werkzeug==0.10.4']]
+    assert resolver_obj.dependency_cache[from_line('jinja2==2.7.3')] == [
+        'markupsafe']
+
+
+@pytest.mark.parametrize('incremental', [False, True])
+def test_resolver__reuses_settled_packages(
+        resolver, from_line, repository, tmpdir, incremental):
+    base_resolver = resolver([from_line('Flask')], incremental=incremental)
+    base_result = base_resolver.resolve()
+    settled_packages = base_resolver.get_settled_packages()
+    limiters = [from_line(str(ireq), constraint=True) for ireq in base_result]
+    repository.get_dependencies = None  # Should not be used
+
+    resolver_obj = resolver(
+        limiters + [from_line('jinja2')], incremental=incremental,
+        cache=DependencyCache(str(tmpdir.join('other'))),
+        settled_packages=settled_packages)
+    result = resolver_obj.resolve()
+
+    assert {str(x) for x in result} == {'jinja2==2.7.3', 'markupsafe==0.23'}
+    assert resolver_obj.reverse_dependencies(result) == {
+        'markupsafe': {'jinja2'}}
+    assert set(settled_packages) == {
+        'flask', 'itsdangerous', 'markupsafe', 'jinja2', 'werkzeug'}
+    assert settled_packages['jinja2'] == (('2.7.3', False, []), ['markupsafe'])
@@ -0,0 +1,58 @@
+import os
+import time
+
+from prequ.result_cache import ResultCache, get_fingerprint
+
+LINES = ['six==1.12.0', 'jinja2==2.10.1']
+
+
+def test_store_and_get(tmpdir):
+    cache_dir = str(tmpdir.join('results'))
+    fingerprint = get_fingerprint({'constraints': ['six']})
+    ResultCache(cache_dir).store(
+        fingerprint, ['six', 'jinja2'], 'digest', LINES)
+
+    requested = []
+
+    def get_candidates_digest(names):
+        requested.append(names)
+        return 'digest'
+
+    result_cache = ResultCache(cache_dir)
+    assert result_cache.get(fingerprint, get_candidates_digest) == LINES
+    assert requested == [['jinja2', 'six']]
+    assert result_cache.get(get_fingerprint({}), get_candidates_digest) is None
+
+
+def test_changed_candidates_are_not_used(tmpdir):
+    result_cache = ResultCache(str(tmpdir))
+    fingerprint = get_fingerprint({'constraints': ['six']})
+    result_cache.store(fingerprint, ['six'], 'digest', LINES)
+
+    assert result_cache.get(fingerprint, lambda names: 'new-digest') is None
+
+
+def test_corrupted_entry_is_not_used(tmpdir):
+    result_cache = ResultCache(str(tmpdir))
+    fingerprint = get_fingerprint({'constraints': ['six']})
+    tmpdir.join(fingerprint + '.json').write('{')
+
+    assert result_cache.get(fingerprint, lambda names: 'digest') is None
+
+
+def test_unused_results_are_pruned(tmpdir):
+    result_cache = ResultCache(str(tmpdir), max_age=60)
+    old = get_fingerprint({'constraints': ['old']})
+    used = get_fingerprint({'constraints': ['used']})
+    result_cache.store(old, ['six'], 'digest', LINES)
+    result_cache.store(used, ['six'], 'digest', LINES)
+    an_hour_ago = time.time() - 3600
+    for fingerprint in [old, used]:
+        os.utime(str(tmpdir.join(fingerprint + '.json')),
+                 (an_hour_ago, an_hour_ago))
+
+    assert result_cache.get(used, lambda names: 'digest') == LINES
+    result_cache.store(get_fingerprint({}), ['six'], 'digest', LINES)
+
+    assert not tmpdir.join(old + '.json').exists()
+    assert result_cache.get(used, lambda names: 'digest') == LINES
@@ -0,0 +1,85 @@
+import mock
+import pkg_resources
+
+from prequ.sdist_metadata_cache import (
+    SdistMetadataCache, get_distribution_metadata)
+from prequ.wheel_metadata import get_metadata_requirements
+
+PKG_INFO = """\
+Metadata-Version: 1.1
+Name: foo
+Version: 1.0
+Summary: Foo
+
+Long description
+"""
+
+REQUIRES_TXT = """\
+six>=1.10
+
+[:python_version < "3"]
+enum34
+
+[bar]
+pytest>=3
+"""
+
+
+def make_egg_info_dist(tmpdir):
+    egg_info = tmpdir.ensure_dir('foo.egg-info')
+    egg_info.join('PKG-INFO').write(PKG_INFO)
+    egg_info.join('requires.txt').write(REQUIRES_TXT)
+    return pkg_resources.Distribution(
+        str(tmpdir), pkg_resources.PathMetadata(str(tmpdir), str(egg_info)),
+        project_name='foo', version='1.0')
+
+
+def test_metadata_is_stored_by_hash(tmpdir):
+    cache = SdistMetadataCache(cache_dir=str(tmpdir.join('cache')))
+    assert cache.get('abc') is None
+
+    cache.store('abc', 'Name: foo\n')
+
+    other_cache = SdistMetadataCache(cache_dir=str(tmpdir.join('cache')))
+    assert other_cache.get('abc') == 'Name: foo\n'
+    assert other_cache.get('def') is None
+
+
+def test_egg_info_metadata_has_requirements(tmpdir):
+    metadata = get_distribution_metadata(make_egg_info_dist(tmpdir))
+
+    assert metadata == (
+        'Metadata-Version: 1.1\n'
+        'Name: foo\n'
+        'Version: 1.0\n'
+        'Summary: Foo\n'
+        'Provides-Extra: bar\n'
+        'Requires-Dist: six>=1.10\n'
+        'Requires-Dist: enum34; (python_version < "3")\n'
+        'Requires-Dist: pytest>=3; (extra == "bar")\n'
+        '\n'
+        'Long description\n')
+
+
+def test_egg_info_metadata_gives_same_requirements(tmpdir):
+    dist = make_egg_info_dist(tmpdir)
+    metadata = get_distribution_metadata(dist)
+
+    for extras in [(), ('bar',)]:
+        assert (
+            sorted(format_req(x) for x in get_metadata_requirements(metadata, extras)) ==
+            sorted(format_req(x) for x in dist.requires(extras)))
+
+
+def format_req(req):
+    return req.name + str(req.specifier)
+
+
+def test_metadata_is_not_shared_between_interpreters():
+    SdistMetadataCache().store('abc', 'Name: foo\n')
+
+    with mock.patch('sys.version_info', (2, 7, 18, 'final', 0)):
+        assert SdistMetadataCache().get('abc') is None
+    with mock.patch('sys.platform', 'win32'):
+        assert SdistMetadataCache().get('abc') is None
+    assert SdistMetadataCache().get('abc') == 'Name: foo\n'
@@ -0,0 +1,212 @@
+import hashlib
+import os
+import shutil
+import zipfile
+
+import pytest
+
+from prequ.scripts._repo import get_pip_command
+from prequ.wheel_metadata import (
+    TAIL_SIZE, MetadataUnavailable, get_wheel_requirements)
+
+from .http_server import FileServer
+from .test_repository_pypi import get_repository
+
+METADATA = '''\
+Metadata-Version: 2.1
+Name: extra-fake
+Version: 1.0
+Requires-Dist: always
+Requires-Dist: never ; python_version < "1.0"
+Provides-Extra: test
+Requires-Dist: for-tests ; extra == "test"
+
+Description
+'''
+
+
+@pytest.fixture
+def session():
+    pip_command = get_pip_command()
+    pip_options, _ = pip_command.parse_args([])
+    return pip_command._build_session(pip_options)
+
+
+def get_project_names(requirements):
+    return sorted(req.project_name for req in requirements)
+
+
+def get_wheel_requests(server):
+    return [x for x in server.requests if x[1].endswith('.whl')]
+
+
+@pytest.mark.parametrize('filename,expected', [
+    ('tiny_depender-1.1-py2.py3-none-any.whl', ['tiny-dependee']),
+    ('small_fake_a-0.1-py2.py3-none-any.whl', []),
+])
+def test_reads_requirements_with_ranges(
+        session, minimal_wheels_dir, filename, expected):
+    with FileServer(minimal_wheels_dir) as server:
+        requirements = get_wheel_requirements(
+            session, server.url + '/' + filename)
+
+    assert get_project_names(requirements) == expected
+    assert all(range_header for (_, _, range_header) in server.requests)
+
+
+@pytest.mark.parametrize('extras,expected', [
+    ((), ['always']),
+    (('test',), ['always', 'for-tests']),
+    (('unknown',), ['always']),
+])
+@pytest.mark.parametrize('padding', [0, 2 * TAIL_SIZE])
+def test_reads_extras_and_markers(session, tmpdir, extras, expected, padding):
+    wheel_path = tmpdir.join('extra_fake-1.0-py2.py3-none-any.whl')
+    with zipfile.ZipFile(str(wheel_path), 'w', zipfile.ZIP_DEFLATED) as wheel:
+        wheel.writestr('extra_fake-1.0.dist-info/METADATA', METADATA)
+        wheel.writestr(
+            zipfile.ZipInfo('extra_fake/data.bin'), os.urandom(padding))
+        wheel.writestr('extra_fake-1.0.dist-info/RECORD', '')
+
+    with FileServer(str(tmpdir)) as server:
+        requirements = get_wheel_requirements(
+            session, server.url + '/' + wheel_path.basename, extras)
+
+    assert get_project_names(requirements) == expected
+    expected_request_count = 2 if padding else 1
+    assert len(server.requests) == expected_request_count
+
+
+def test_fails_without_range_support(session, minimal_wheels_dir):
+    with FileServer(minimal_wheels_dir, support_ranges=False) as server:
+        with pytest.raises(MetadataUnavailable):
+            get_wheel_requirements(
+                session, server.url + '/tiny_depender-1.1-py2.py3-none-any.whl')
+
+
+def get_find_links_repository(server, **kwargs):
+    return get_repository(
+        ['--no-index', '--find-links', server.url + '/'], **kwargs)
+
+
+def test_repository_reads_wheel_dependencies_with_ranges(
+        from_line, minimal_wheels_dir):
+    with FileServer(minimal_wheels_dir) as server:
+        repository = get_find_links_repository(server)
+        dependencies = repository.get_dependencies(
+            from_line('tiny-depender==1.1'))
+
+    assert [str(dep.req) for dep in dependencies] == ['tiny-dependee']
+    assert get_wheel_requests(server)
+    assert all(range_header for (_, _, range_header) in get_wheel_requests(server))
+
+
+def test_repository_falls_back_without_range_support(
+        from_line, minimal_wheels_dir):
+    with FileServer(minimal_wheels_dir, support_ranges=False) as server:
+        repository = get_find_links_repository(server)
+        dependencies = repository.get_dependencies(
+            from_line('tiny-depender==1.1'))
+
+    assert [str(dep.req) for dep in dependencies] == ['tiny-dependee']
+    # The range request was tried, but pip got the dependencies
+    assert [range_header for (_, _, range_header) in get_wheel_requests(server)
+            ][:1] == ['bytes=-{}'.format(TAIL_SIZE)]
+
+
+def test_dependency_workers_read_wheel_dependencies_with_ranges(
+        from_line, minimal_wheels_dir):
+    with FileServer(minimal_wheels_dir) as server:
+        repository = get_find_links_repository(server, build_jobs=2)
+        dependency_sets = repository.get_many_dependencies([
+            from_line('tiny-depender==1.1'), from_line('small-fake-a==0.1')])
+
+    assert [sorted(str(dep.req) for dep in dependencies)
+            for dependencies in dependency_sets] == [['tiny-dependee'], []]
+    assert get_wheel_requests(server)
+    assert all(range_header for (_, _, range_header) in get_wheel_requests(server))
+
+
+def write_project_page(index_dir, project, filename, attributes=''):
+    page = '<html><body><a href="../../files/{}" {}>{}</a></body></html>'.format(
+        filename, attributes, filename)
+    index_dir.ensure('simple', project, 'index.html').write(page)
+
+
+def write_metadata_file(index_dir, filename, metadata):
+    index_dir.ensure('files', filename + '.metadata').write_binary(metadata)
+    return hashlib.sha256(metadata).hexdigest()
+
+
+@pytest.fixture
+def metadata_index(tmpdir, minimal_wheels_dir):
+    wheel = 'tiny_depender-1.1-py2.py3-none-any.whl'
+    tmpdir.ensure_dir('files')
+    shutil.copy(os.path.join(minimal_wheels_dir, wheel), str(tmpdir.join('files')))
+    with zipfile.ZipFile(os.path.join(minimal_wheels_dir, wheel)) as zip_file:
+        metadata = zip_file.read('tiny_depender-1.1.dist-info/METADATA')
+    digest = write_metadata_file(tmpdir, wheel, metadata)
+    write_project_page(tmpdir, 'tiny-depender', wheel,
+                       'data-dist-info-metadata="sha256={}"'.format(digest))
+
+    sdist = 'sdist_only-1.0.tar.gz'
+    tmpdir.ensure('files', sdist).write('not an archive')
+    write_metadata_file(tmpdir, sdist, SDIST_METADATA)
+    write_project_page(tmpdir, 'sdist-only', sdist, 'data-core-metadata="true"')
+    return tmpdir
+
+
+SDIST_METADATA = b'''\
+Metadata-Version: 2.2
+Name: sdist-only
+Version: 1.0
+Requires-Dist: tiny-depender
+Requires-Dist: windows-only ; sys_platform == "never"
+'''
+
+
+def get_index_repository(server, **kwargs):
+    return get_repository(['--index-url', server.url + '/simple/'], **kwargs)
+
+
+@pytest.mark.parametrize('line,filename,expected', [
+    ('tiny-depender==1.1', 'tiny_depender-1.1-py2.py3-none-any.whl',
+     ['tiny-dependee']),
+    ('sdist-only==1.0', 'sdist_only-1.0.tar.gz', ['tiny-depender']),
+])
+def test_repository_reads_dependencies_from_metadata_files(
+        from_line, metadata_index, line, filename, expected):
+    with FileServer(str(metadata_index)) as server:
+        repository = get_index_repository(server)
+        dependencies = repository.get_dependencies(from_line(line))
+
+    assert sorted(str(dep.req) for dep in dependencies) == expected
+    paths = [path for (_, path, _) in server.requests]
+    assert [path for path in paths if path.startswith('/files/')] == [
+        '/files/' + filename + '.metadata']
+
+
+def test_repository_checks_hash_of_metadata_file(from_line, metadata_index):
+    write_metadata_file(
+        metadata_index, 'tiny_depender-1.1-py2.py3-none-any.whl', b'Changed')
+
+    with FileServer(str(metadata_index)) as server:
+        repository = get_index_repository(server)
+        dependencies = repository.get_dependencies(
+            from_line('tiny-depender==1.1'))
+
+    # Falls back to reading the wheel with range requests
+    assert [str(dep.req) for dep in dependencies] == ['tiny-dependee']
+    assert get_wheel_requests(server)
+
+
+def test_metadata_file_attributes_are_cached(from_line, metadata_index):
+    with FileServer(str(metadata_index)) as server:
+        get_index_repository(server, candidate_ttl=3600).find_all_candidates('sdist-only')
+        repository = get_index_repository(server, candidate_ttl=3600)
+        del server.requests[:]
+        dependencies = repository.get_dependencies(from_line('sdist-only==1.0'))
+
+    assert [str(dep.req) for dep in dependencies] == ['tiny-depender']
+    assert [path for (_, path, _) in server.requests] == [
+        '/files/sdist_only-1.0.tar.gz.metadata']
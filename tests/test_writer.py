@@ -1,8 +1,9 @@
+from click import unstyle
 from pytest import fixture, mark
 
 from prequ._pip_compat import FormatControl
 from prequ.utils import comment
-from prequ.writer import OutputWriter
+from prequ.writer import OutputWriter, read_input_digest
 
 
 @fixture
@@ -125,3 +126,20 @@ def test_iter_lines__unsafe_dependencies(from_line, allow_unsafe):
     else:
         assert comment('# setuptools') in str_lines
     assert 'test==1.2' in str_lines
+
+
+def test_input_digest_in_header(writer, tmpdir):
+    writer.input_digest = 'sha256:abc'
+    header = list(writer.write_header())
+    assert header[-1] == comment('# input-digest: sha256:abc')
+
+    path = tmpdir.join('requirements.txt')
+    path.write('\n'.join(
+        [unstyle(line) for line in header] + ['test==1.2', '']))
+    assert read_input_digest(str(path)) == 'sha256:abc'
+
+
+def test_read_input_digest_without_digest(tmpdir):
+    path = tmpdir.join('requirements.txt')
+    path.write('test==1.2\n# input-digest: sha256:abc\n')
+    assert read_input_digest(str(path)) is None